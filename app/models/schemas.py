@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Dict
 from datetime import date, datetime
 from enum import Enum
 
@@ -68,6 +68,12 @@ class Copia(CopiaBase):
         from_attributes = True
 
 
+class DisponibilidadLibro(BaseModel):
+    libro_id: int
+    total: int
+    por_estado: Dict[EstadoCopia, int]
+
+
 # Lector
 class LectorBase(BaseModel):
     nombre: str
@@ -81,6 +87,7 @@ class LectorCreate(LectorBase):
 class Lector(LectorBase):
     id: int
     dias_sancion: int = 0
+    sancionado_hasta: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -92,6 +99,15 @@ class PrestamoCreate(BaseModel):
     copia_id: int
 
 
+class PrestamoLoteCreate(BaseModel):
+    lector_id: int
+    copia_ids: List[int] = Field(min_length=1)
+
+
+class DevolucionLote(BaseModel):
+    prestamo_ids: List[int] = Field(min_length=1)
+
+
 class Prestamo(BaseModel):
     id: int
     lector_id: int
@@ -108,6 +124,8 @@ class Prestamo(BaseModel):
 class SuscripcionCreate(BaseModel):
     lector_id: int
     libro_id: int
+    # Avisar solo la próxima vez que el libro esté disponible y luego darse de baja
+    una_vez: bool = False
 
 
 class Suscripcion(BaseModel):
@@ -115,6 +133,34 @@ class Suscripcion(BaseModel):
     lector_id: int
     libro_id: int
     fecha_suscripcion: datetime
+    una_vez: bool = False
 
     class Config:
         from_attributes = True
+
+
+# Reservas
+class EstadoReserva(str, Enum):
+    EN_ESPERA = "en_espera"
+    LISTA = "lista"
+
+
+class ReservaCreate(BaseModel):
+    lector_id: int
+    libro_id: int
+
+
+class Reserva(BaseModel):
+    lector_id: int
+    libro_id: int
+    estado: EstadoReserva
+    # Solo en una reserva lista: la copia apartada y el plazo para retirarla
+    copia_id: Optional[int] = None
+    fecha_limite: Optional[datetime] = None
+
+
+# Importación masiva
+class ResultadoImportacion(BaseModel):
+    creados: int
+    primer_id: Optional[int] = None
+    ultimo_id: Optional[int] = None
@@ -0,0 +1,79 @@
+"""Serialización a JSON de filas que produce la propia base, sin revalidarlas.
+
+Cada esquema de `schemas.py` se compila una vez a un TypeAdapter sobre un
+TypedDict con sus mismos campos, que vuelca a bytes sin construir modelos.
+Las filas se copian a dicts con solo esos campos y en el orden del esquema,
+así que el JSON es idéntico al de response_model.
+"""
+from operator import attrgetter, itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from typing_extensions import TypedDict
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from app.services.registros import Fila
+
+_diccionarios: Dict[type, type] = {}
+_lectores: Dict[Tuple[type, type], Callable] = {}
+_adaptadores: Dict[type, TypeAdapter] = {}
+_adaptadores_lista: Dict[type, TypeAdapter] = {}
+
+
+def _diccionario(modelo: type) -> type:
+    """TypedDict con los campos (y tipos) del modelo; los submodelos también se convierten"""
+    tipo = _diccionarios.get(modelo)
+    if tipo is None:
+        campos = {}
+        for nombre, campo in modelo.model_fields.items():
+            anotacion = campo.annotation
+            if isinstance(anotacion, type) and issubclass(anotacion, BaseModel):
+                anotacion = _diccionario(anotacion)
+            campos[nombre] = anotacion
+        tipo = _diccionarios[modelo] = TypedDict(f"{modelo.__name__}Fila", campos)
+    return tipo
+
+
+def _adaptador(modelo: type, lista: bool) -> TypeAdapter:
+    cache = _adaptadores_lista if lista else _adaptadores
+    adaptador = cache.get(modelo)
+    if adaptador is None:
+        tipo = _diccionario(modelo)
+        adaptador = cache[modelo] = TypeAdapter(List[tipo] if lista else tipo)
+    return adaptador
+
+
+def _lector(modelo: type, tipo: type) -> Callable:
+    """Convierte una fila de `tipo` (Fila* o dict) en un dict con los campos de `modelo`"""
+    lector = _lectores.get((modelo, tipo))
+    if lector is None:
+        nombres = tuple(modelo.model_fields)
+        leer = (attrgetter if issubclass(tipo, Fila) else itemgetter)(*nombres)
+        lector = _lectores[(modelo, tipo)] = lambda fila: dict(zip(nombres, leer(fila)))
+    return lector
+
+
+def volcar(modelo: type, filas: Iterable) -> bytes:
+    """Arreglo JSON de `filas` con los campos de `modelo`, sin validarlas"""
+    lector, tipo = None, None
+    dicts = []
+    for fila in filas:
+        if type(fila) is not tipo:
+            tipo = type(fila)
+            lector = _lector(modelo, tipo)
+        dicts.append(lector(fila))
+    return _adaptador(modelo, True).dump_json(dicts)
+
+
+def volcar_uno(modelo: type, fila) -> bytes:
+    return _adaptador(modelo, False).dump_json(_lector(modelo, type(fila))(fila))
+
+
+def respuesta_lista(modelo: type, filas: Iterable, encabezados: Optional[Dict[str, str]] = None) -> Response:
+    """Reemplaza a response_model=List[modelo] para filas que ya vienen de la base"""
+    return Response(volcar(modelo, filas), media_type="application/json", headers=encabezados)
+
+
+def precompilar(*modelos: type):
+    """Compila de antemano los adaptadores (al importar los routers, no en el primer request)"""
+    for modelo in modelos:
+        _adaptador(modelo, True)
+        _adaptador(modelo, False)
@@ -0,0 +1,38 @@
+import functools
+import os
+from fastapi.concurrency import run_in_threadpool
+from app.services.database import db
+from app.services.bioalert import bioalert
+from app.services.perfilado import perfilador
+
+# BIBLIOTECA_EN_HILOS=1 vuelve al modelo de los handlers síncronos: cada request en el pool de hilos
+EN_HILOS = os.environ.get("BIBLIOTECA_EN_HILOS", "0") == "1"
+
+
+def en_event_loop() -> bool:
+    """Si un handler puede correr en el event loop sin bloquearlo"""
+    return not (EN_HILOS or db.bloqueante or bioalert.saturada())
+
+
+def asincrono(handler):
+    """Convierte un handler síncrono en `async def` con la misma firma.
+
+    Con MemoryDB el cuerpo corre directamente en el event loop: son
+    búsquedas en dicts y locks que se sueltan sin esperar E/S, así que el
+    salto al pool de hilos cuesta más que la operación y limita la
+    concurrencia al tamaño del pool. Si el almacenamiento puede esperar
+    al disco (SQLite, WAL con fsync en cada escritura) o encolar en
+    BioAlert tendría que esperar lugar, se corre en el pool como antes.
+    Si la cola de BioAlert se llena mientras el handler corre en el event
+    loop, sus envíos se encolan al terminar, esperando en el pool.
+    """
+    @functools.wraps(handler)
+    async def envoltura(*args, **kwargs):
+        if en_event_loop():
+            diferidas = bioalert.diferir()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                await bioalert.encolar_diferidas(diferidas)
+        return await run_in_threadpool(perfilador.en_hilo(handler), *args, **kwargs)
+    return envoltura
@@ -1,23 +1,51 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from typing import List
-from app.models.schemas import Autor, AutorCreate
+from app.models.schemas import Autor, AutorCreate, ResultadoImportacion
 from app.services.database import db
+from app.services.importacion import leer_filas, validar_filas, resultado
+from app.routers.paginacion import Pagina, parametros_pagina
+from app.routers.condicional import etag, respuesta_condicional
+from app.routers.asincrono import asincrono
+from app.models.serializacion import precompilar, volcar
+from app.services.catalogo import vista_libros
 
 router = APIRouter(prefix="/autores", tags=["autores"])
+precompilar(Autor)
 
 
 @router.post("/", response_model=Autor, status_code=201)
+@asincrono
 def create_autor(autor: AutorCreate):
     nuevo_autor = db.create_autor(autor.nombre, autor.fecha_nacimiento)
+    vista_libros.agregar_autor(nuevo_autor)
     return nuevo_autor
 
 
+@router.post("/lote", response_model=ResultadoImportacion, status_code=201)
+async def importar_autores(request: Request):
+    """Alta masiva desde un arreglo JSON, NDJSON o CSV: se crean todas las filas o ninguna"""
+    filas = await leer_filas(request)
+    return await run_in_threadpool(_importar_autores, filas)
+
+
+def _importar_autores(filas: list) -> ResultadoImportacion:
+    autores = validar_filas(filas, AutorCreate)
+    return resultado(db.create_autores([(a.nombre, a.fecha_nacimiento) for a in autores]))
+
+
 @router.get("/", response_model=List[Autor])
-def get_autores():
-    return db.get_all_autores()
+@asincrono
+def get_autores(request: Request, pagina: Pagina = Depends(parametros_pagina)):
+    """Con ETag: mientras no cambien los autores responde 304 o el cuerpo ya serializado"""
+    def construir():
+        autores = db.get_all_autores(pagina.after_id, pagina.limit)
+        return volcar(Autor, autores), pagina.encabezados(autores)
+    return respuesta_condicional(request, etag(db.version("autores")), construir)
 
 
 @router.get("/{autor_id}", response_model=Autor)
+@asincrono
 def get_autor(autor_id: int):
     autor = db.get_autor(autor_id)
     if not autor:
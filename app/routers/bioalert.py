@@ -1,13 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import List, Optional
 from app.models.schemas import Suscripcion, SuscripcionCreate
 from app.services.database import db
 from app.services.bioalert import bioalert
+from app.routers.paginacion import Pagina, parametros_pagina
+from app.routers.asincrono import asincrono
+from app.models.serializacion import precompilar, respuesta_lista
 
 router = APIRouter(prefix="/bioalert", tags=["bioalert"])
+precompilar(Suscripcion)
 
 
 @router.post("/suscribir", response_model=Suscripcion, status_code=201)
+@asincrono
 def suscribir_a_libro(suscripcion: SuscripcionCreate):
     """Suscribe a un lector para recibir notificaciones cuando un libro esté disponible"""
 
@@ -22,7 +28,9 @@ def suscribir_a_libro(suscripcion: SuscripcionCreate):
         raise HTTPException(status_code=404, detail="Libro no encontrado")
 
     # Crear suscripción
-    nueva_suscripcion = db.create_suscripcion(suscripcion.lector_id, suscripcion.libro_id)
+    nueva_suscripcion = db.create_suscripcion(suscripcion.lector_id, suscripcion.libro_id, suscripcion.una_vez)
+    if nueva_suscripcion is None:
+        raise HTTPException(status_code=409, detail="El lector ya está suscrito a este libro")
 
     # Enviar confirmación
     bioalert.notificar(
@@ -35,15 +43,44 @@ def suscribir_a_libro(suscripcion: SuscripcionCreate):
 
 
 @router.get("/notificaciones")
-def get_notificaciones():
+async def get_notificaciones(
+    response: Response,
+    pagina: Pagina = Depends(parametros_pagina),
+    email: Optional[str] = Query(None, description="Solo las enviadas a este email"),
+    libro: Optional[str] = Query(None, description="Solo las de este libro (por nombre)"),
+    since: Optional[datetime] = Query(None, description="Solo las enviadas desde esta fecha")
+):
     """Obtiene el historial de notificaciones enviadas por BioAlert"""
-    return {"notificaciones": bioalert.get_notificaciones()}
+    # Incluye los envíos ya encolados (p. ej. los de una devolución recién hecha)
+    await bioalert.esperar_async()
+    if since is not None and since.tzinfo is not None:
+        # Las fechas del historial son locales y sin zona
+        since = since.astimezone().replace(tzinfo=None)
+    notificaciones = bioalert.get_notificaciones(pagina.after_id, pagina.limit, email, libro, since)
+    pagina.marcar_siguiente(response, notificaciones)
+    return {"notificaciones": notificaciones}
 
 
 @router.get("/suscripciones/libro/{libro_id}", response_model=List[Suscripcion])
+@asincrono
 def get_suscripciones_by_libro(libro_id: int):
     """Obtiene todas las suscripciones para un libro específico"""
     libro = db.get_libro(libro_id)
     if not libro:
         raise HTTPException(status_code=404, detail="Libro no encontrado")
-    return db.get_suscripciones_by_libro(libro_id)
+    return respuesta_lista(Suscripcion, db.get_suscripciones_by_libro(libro_id))
+
+
+@router.delete("/suscripciones/{suscripcion_id}", status_code=204)
+@asincrono
+def cancelar_suscripcion(suscripcion_id: int):
+    """Da de baja una suscripción"""
+    if not db.delete_suscripcion(suscripcion_id):
+        raise HTTPException(status_code=404, detail="Suscripción no encontrada")
+
+
+@router.get("/metricas")
+@asincrono
+def get_metricas():
+    """Estado de la cola de envíos: profundidad, esperas por cola llena y latencia"""
+    return bioalert.metricas()
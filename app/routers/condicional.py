@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+from fastapi import Request, Response
+
+# Distingue los ETags de este proceso de los de uno anterior, cuyas versiones empezaban igual
+_ARRANQUE = format(time.time_ns(), "x")
+
+# (cuerpo JSON, encabezados extra como X-Next-Cursor)
+Cuerpo = Tuple[bytes, Dict[str, str]]
+
+
+class CacheRespuestas:
+    """Cuerpos ya serializados por (URL, ETag), con desalojo LRU.
+
+    Una versión nueva cambia el ETag, así que las entradas viejas no se
+    invalidan: dejan de pedirse y salen por el extremo menos usado.
+    """
+
+    def __init__(self, capacidad: int):
+        self.capacidad = capacidad
+        self._entradas: "OrderedDict[Tuple[str, str], Cuerpo]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: Tuple[str, str]) -> Optional[Cuerpo]:
+        with self._lock:
+            cuerpo = self._entradas.get(clave)
+            if cuerpo is not None:
+                self._entradas.move_to_end(clave)
+            return cuerpo
+
+    def guardar(self, clave: Tuple[str, str], cuerpo: Cuerpo):
+        with self._lock:
+            self._entradas[clave] = cuerpo
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+
+    def vaciar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+# Instancia global: CATALOGO_CACHE_RESPUESTAS fija cuántos cuerpos se conservan
+cache_respuestas = CacheRespuestas(int(os.environ.get("CATALOGO_CACHE_RESPUESTAS", "1024")))
+
+
+def etag(*versiones: int) -> str:
+    return '"' + ".".join([_ARRANQUE, *map(str, versiones)]) + '"'
+
+
+def _coincide(if_none_match: Optional[str], etiqueta: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidata in if_none_match.split(","):
+        candidata = candidata.strip()
+        if candidata == "*" or candidata.removeprefix("W/") == etiqueta:
+            return True
+    return False
+
+
+def respuesta_condicional(request: Request, etiqueta: str, construir: Callable[[], Cuerpo]) -> Response:
+    """304 si el cliente ya tiene `etiqueta`; si no, el cuerpo cacheado de esta URL y versión o uno nuevo.
+
+    `etiqueta` debe calcularse antes de leer los datos: así el cuerpo
+    guardado bajo una versión incluye al menos los cambios de esa versión.
+    """
+    if _coincide(request.headers.get("if-none-match"), etiqueta):
+        return Response(status_code=304, headers={"ETag": etiqueta})
+    clave = (str(request.url), etiqueta)
+    guardado = cache_respuestas.obtener(clave)
+    if guardado is None:
+        guardado = construir()
+        cache_respuestas.guardar(clave, guardado)
+    cuerpo, encabezados = guardado
+    return Response(cuerpo, media_type="application/json", headers={**encabezados, "ETag": etiqueta})
@@ -1,12 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from typing import List
-from app.models.schemas import Copia, CopiaCreate, EstadoCopia
+from app.models.schemas import Copia, CopiaCreate, EstadoCopia, ResultadoImportacion
 from app.services.database import db
+from app.services.importacion import leer_filas, validar_filas, verificar_referencias, resultado
+from app.routers.paginacion import Pagina, parametros_pagina
+from app.services.concurrencia import locks_copias
+from app.routers.condicional import etag, respuesta_condicional
+from app.routers.asincrono import asincrono
+from app.models.serializacion import precompilar, respuesta_lista, volcar
 
 router = APIRouter(prefix="/copias", tags=["copias"])
+precompilar(Copia)
 
 
 @router.post("/", response_model=Copia, status_code=201)
+@asincrono
 def create_copia(copia: CopiaCreate):
     # Verificar que el libro existe
     libro = db.get_libro(copia.libro_id)
@@ -17,12 +26,28 @@ def create_copia(copia: CopiaCreate):
     return nueva_copia
 
 
+@router.post("/lote", response_model=ResultadoImportacion, status_code=201)
+async def importar_copias(request: Request):
+    """Alta masiva desde un arreglo JSON, NDJSON o CSV: se crean todas las filas o ninguna"""
+    filas = await leer_filas(request)
+    return await run_in_threadpool(_importar_copias, filas)
+
+
+def _importar_copias(filas: list) -> ResultadoImportacion:
+    copias = validar_filas(filas, CopiaCreate)
+    verificar_referencias(copias, "libro_id", db.get_libro, "Libro no encontrado")
+    return resultado(db.create_copias([c.libro_id for c in copias]))
+
+
 @router.get("/", response_model=List[Copia])
-def get_copias():
-    return db.get_all_copias()
+@asincrono
+def get_copias(pagina: Pagina = Depends(parametros_pagina)):
+    copias = db.get_all_copias(pagina.after_id, pagina.limit)
+    return respuesta_lista(Copia, copias, pagina.encabezados(copias))
 
 
 @router.get("/{copia_id}", response_model=Copia)
+@asincrono
 def get_copia(copia_id: int):
     copia = db.get_copia(copia_id)
     if not copia:
@@ -31,18 +56,25 @@ def get_copia(copia_id: int):
 
 
 @router.get("/libro/{libro_id}", response_model=List[Copia])
-def get_copias_by_libro(libro_id: int):
-    """Obtiene todas las copias de un libro específico"""
+@asincrono
+def get_copias_by_libro(libro_id: int, request: Request):
+    """Obtiene todas las copias de un libro específico (con ETag por libro)"""
     libro = db.get_libro(libro_id)
     if not libro:
         raise HTTPException(status_code=404, detail="Libro no encontrado")
-    return db.get_copias_by_libro(libro_id)
+    return respuesta_condicional(
+        request,
+        etag(db.version("copias", libro_id)),
+        lambda: (volcar(Copia, db.get_copias_by_libro(libro_id)), {})
+    )
 
 
 @router.put("/{copia_id}/estado", response_model=Copia)
+@asincrono
 def update_estado_copia(copia_id: int, estado: EstadoCopia):
     """Actualiza el estado de una copia manualmente"""
-    copia = db.update_estado_copia(copia_id, estado)
+    with locks_copias.bloquear(copia_id):
+        copia = db.update_estado_copia(copia_id, estado)
     if not copia:
         raise HTTPException(status_code=404, detail="Copia no encontrada")
     return copia
@@ -0,0 +1,40 @@
+from enum import Enum
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from app.models.schemas import Autor, Libro, Copia, Lector, Prestamo
+from app.services.database import db
+from app.routers.asincrono import asincrono
+from app.models.serializacion import precompilar, volcar_uno
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+
+class ColeccionExportable(str, Enum):
+    AUTORES = "autores"
+    LIBROS = "libros"
+    COPIAS = "copias"
+    LECTORES = "lectores"
+    PRESTAMOS = "prestamos"
+
+
+MODELOS = {
+    ColeccionExportable.AUTORES: Autor,
+    ColeccionExportable.LIBROS: Libro,
+    ColeccionExportable.COPIAS: Copia,
+    ColeccionExportable.LECTORES: Lector,
+    ColeccionExportable.PRESTAMOS: Prestamo,
+}
+precompilar(*MODELOS.values())
+
+
+def _ndjson(modelo, lotes):
+    for lote in lotes:
+        yield b"".join(volcar_uno(modelo, fila) + b"\n" for fila in lote)
+
+
+@router.get("/{coleccion}")
+@asincrono
+def exportar(coleccion: ColeccionExportable):
+    """Exporta una colección completa como NDJSON (una fila por línea) sin armarla en memoria"""
+    lotes = db.exportar(coleccion.value)
+    return StreamingResponse(_ndjson(MODELOS[coleccion], lotes), media_type="application/x-ndjson")
@@ -1,23 +1,52 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from typing import List
-from app.models.schemas import Lector, LectorCreate
+from app.models.schemas import Lector, LectorCreate, ResultadoImportacion
 from app.services.database import db
+from app.services.importacion import leer_filas, validar_filas, resultado
+from app.routers.paginacion import Pagina, parametros_pagina
+from app.routers.asincrono import asincrono
+from app.models.serializacion import precompilar, respuesta_lista
 
 router = APIRouter(prefix="/lectores", tags=["lectores"])
+precompilar(Lector)
 
 
 @router.post("/", response_model=Lector, status_code=201)
+@asincrono
 def create_lector(lector: LectorCreate):
     nuevo_lector = db.create_lector(lector.nombre, lector.email)
     return nuevo_lector
 
 
+@router.post("/lote", response_model=ResultadoImportacion, status_code=201)
+async def importar_lectores(request: Request):
+    """Alta masiva desde un arreglo JSON, NDJSON o CSV: se crean todas las filas o ninguna"""
+    filas = await leer_filas(request)
+    return await run_in_threadpool(_importar_lectores, filas)
+
+
+def _importar_lectores(filas: list) -> ResultadoImportacion:
+    lectores = validar_filas(filas, LectorCreate)
+    return resultado(db.create_lectores([(lector.nombre, lector.email) for lector in lectores]))
+
+
 @router.get("/", response_model=List[Lector])
-def get_lectores():
-    return db.get_all_lectores()
+@asincrono
+def get_lectores(pagina: Pagina = Depends(parametros_pagina)):
+    lectores = db.get_all_lectores(pagina.after_id, pagina.limit)
+    return respuesta_lista(Lector, lectores, pagina.encabezados(lectores))
+
+
+@router.get("/sancionados", response_model=List[Lector])
+@asincrono
+def get_lectores_sancionados():
+    """Lectores con sanción vigente, ordenados por fin de la sanción"""
+    return respuesta_lista(Lector, db.get_lectores_sancionados())
 
 
 @router.get("/{lector_id}", response_model=Lector)
+@asincrono
 def get_lector(lector_id: int):
     lector = db.get_lector(lector_id)
     if not lector:
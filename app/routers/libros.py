@@ -1,12 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from typing import List
-from app.models.schemas import Libro, LibroCreate, LibroConAutor
+from app.models.schemas import Libro, LibroCreate, LibroConAutor, DisponibilidadLibro, ResultadoImportacion
 from app.services.database import db
+from app.services.importacion import leer_filas, validar_filas, verificar_referencias, resultado
+from app.routers.paginacion import Pagina, parametros_pagina
+from app.routers.condicional import Cuerpo, etag, respuesta_condicional
+from app.routers.asincrono import asincrono
+from app.services.catalogo import vista_libros
 
 router = APIRouter(prefix="/libros", tags=["libros"])
 
 
 @router.post("/", response_model=Libro, status_code=201)
+@asincrono
 def create_libro(libro: LibroCreate):
     # Verificar que el autor existe
     autor = db.get_autor(libro.autor_id)
@@ -14,34 +21,58 @@ def create_libro(libro: LibroCreate):
         raise HTTPException(status_code=404, detail="Autor no encontrado")
 
     nuevo_libro = db.create_libro(libro.nombre, libro.anio, libro.autor_id)
+    vista_libros.agregar_libro(nuevo_libro)
     return nuevo_libro
 
 
+@router.post("/lote", response_model=ResultadoImportacion, status_code=201)
+async def importar_libros(request: Request):
+    """Alta masiva desde un arreglo JSON, NDJSON o CSV: se crean todas las filas o ninguna"""
+    filas = await leer_filas(request)
+    return await run_in_threadpool(_importar_libros, filas)
+
+
+def _importar_libros(filas: list) -> ResultadoImportacion:
+    libros = validar_filas(filas, LibroCreate)
+    verificar_referencias(libros, "autor_id", db.get_autor, "Autor no encontrado")
+    return resultado(db.create_libros([(libro.nombre, libro.anio, libro.autor_id) for libro in libros]))
+
+
 @router.get("/", response_model=List[LibroConAutor])
-def get_libros():
-    libros = db.get_all_libros()
-    libros_con_autor = []
-    for libro in libros:
-        autor = db.get_autor(libro["autor_id"])
-        libros_con_autor.append({**libro, "autor": autor})
-    return libros_con_autor
+@asincrono
+def get_libros(request: Request, pagina: Pagina = Depends(parametros_pagina)):
+    """Catálogo con ETag: mientras no cambien libros ni autores responde 304 o el cuerpo ya serializado"""
+    etiqueta = etag(db.version("libros"), db.version("autores"))
+    return respuesta_condicional(request, etiqueta, lambda: _catalogo(pagina))
+
+
+def _catalogo(pagina: Pagina) -> Cuerpo:
+    libros = db.get_all_libros(pagina.after_id, pagina.limit)
+    return vista_libros.listar(libros), pagina.encabezados(libros)
 
 
 @router.get("/{libro_id}", response_model=LibroConAutor)
+@asincrono
 def get_libro(libro_id: int):
+    fragmento = vista_libros.obtener(libro_id)
+    if fragmento is None:
+        raise HTTPException(status_code=404, detail="Libro no encontrado")
+    return Response(fragmento, media_type="application/json")
+
+
+@router.get("/{libro_id}/disponibilidad", response_model=DisponibilidadLibro)
+@asincrono
+def get_disponibilidad(libro_id: int):
+    """Cantidad de copias del libro en cada estado"""
     libro = db.get_libro(libro_id)
     if not libro:
         raise HTTPException(status_code=404, detail="Libro no encontrado")
-    autor = db.get_autor(libro["autor_id"])
-    return {**libro, "autor": autor}
+    por_estado = db.get_disponibilidad_libro(libro_id)
+    return {"libro_id": libro_id, "total": sum(por_estado.values()), "por_estado": por_estado}
 
 
 @router.get("/buscar/{nombre_autor}", response_model=List[LibroConAutor])
+@asincrono
 def buscar_libros_por_autor(nombre_autor: str):
     """Busca libros por nombre de autor (ej: 'Somerville')"""
-    libros = db.get_libros_by_autor(nombre_autor)
-    libros_con_autor = []
-    for libro in libros:
-        autor = db.get_autor(libro["autor_id"])
-        libros_con_autor.append({**libro, "autor": autor})
-    return libros_con_autor
+    return Response(vista_libros.listar(db.get_libros_by_autor(nombre_autor)), media_type="application/json")
@@ -0,0 +1,56 @@
+import time
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services.database import db
+from app.services.bioalert import bioalert
+from app.services.metricas import Medidor, exponer, latencia_requests, rechazos
+from app.routers.asincrono import asincrono
+
+router = APIRouter(tags=["metricas"])
+
+
+class MedirLatencia:
+    """Middleware ASGI que registra la duración de cada request bajo la plantilla de su ruta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # El router deja en el scope la ruta que atendió el request (p. ej. /libros/{libro_id})
+            ruta = scope.get("route")
+            latencia_requests.observar(
+                time.perf_counter() - inicio, scope["method"], ruta.path if ruta is not None else "(sin ruta)"
+            )
+
+
+def _bioalert() -> dict:
+    metricas = bioalert.metricas()
+    return {
+        ("en_cola",): metricas["en_cola"],
+        ("sin_publicar",): metricas["encoladas"] - metricas["completadas"],
+    }
+
+
+tamanios = Medidor(
+    "biblioteca_coleccion_filas", "Filas de cada colección del almacenamiento", ("coleccion",),
+    lambda: {(coleccion,): filas for coleccion, filas in db.tamanios().items()}
+)
+pendientes_bioalert = Medidor(
+    "biblioteca_bioalert_pendientes", "Envíos de BioAlert en la cola o en curso", ("estado",), _bioalert
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+@asincrono
+def get_metrics():
+    """Métricas en el formato de texto de Prometheus"""
+    return PlainTextResponse(
+        exponer([latencia_requests, rechazos, tamanios, pendientes_bioalert]),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,28 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+from fastapi import Query, Response
+
+LIMITE_MAXIMO = 1000
+
+
+@dataclass
+class Pagina:
+    after_id: int
+    limit: Optional[int]
+
+    def marcar_siguiente(self, response: Response, filas: Sequence) -> None:
+        """Publica en X-Next-Cursor el cursor de la próxima página, si puede haberla"""
+        response.headers.update(self.encabezados(filas))
+
+    def encabezados(self, filas: Sequence) -> Dict[str, str]:
+        if self.limit is not None and len(filas) == self.limit:
+            return {"X-Next-Cursor": str(filas[-1]["id"])}
+        return {}
+
+
+# async: FastAPI corre las dependencias síncronas en el pool de hilos
+async def parametros_pagina(
+    after_id: int = Query(0, ge=0, description="Devuelve solo filas con id mayor a este cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO, description="Tamaño de página; sin él se devuelve todo")
+) -> Pagina:
+    return Pagina(after_id, limit)
@@ -0,0 +1,44 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.services.perfilado import perfilador
+
+router = APIRouter(prefix="/admin/perfiles", tags=["admin"])
+
+
+class Perfilar:
+    """Middleware ASGI que perfila los requests elegidos por `perfilador` y los agrega por ruta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not perfilador.activo or scope["type"] != "http" or not perfilador.elegir(scope):
+            return await self.app(scope, receive, send)
+        token = perfilador.iniciar()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ruta = scope.get("route")
+            perfilador.terminar(token, f"{scope['method']} {ruta.path if ruta is not None else '(sin ruta)'}")
+
+
+@router.get("/")
+async def get_perfiles():
+    """Rutas perfiladas: requests muestreados, pilas distintas y tiempo total"""
+    return {"activo": perfilador.activo, "muestreo": perfilador.muestreo, "rutas": perfilador.resumen()}
+
+
+@router.get("/colapsadas", response_class=PlainTextResponse)
+async def get_pilas_colapsadas(
+    ruta: Optional[str] = Query(None, description='Solo esta ruta, p. ej. "POST /prestamos/"')
+):
+    """Pilas colapsadas ("a;b;c microsegundos") para flamegraph.pl o speedscope"""
+    if ruta is not None and ruta not in perfilador.resumen():
+        raise HTTPException(status_code=404, detail="Ruta sin perfiles")
+    return PlainTextResponse(perfilador.colapsadas(ruta))
+
+
+@router.delete("/", status_code=204)
+async def borrar_perfiles():
+    perfilador.reset()
@@ -1,25 +1,47 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from typing import List
-from app.models.schemas import Prestamo, PrestamoCreate
+from app.models.schemas import Prestamo, PrestamoCreate, PrestamoLoteCreate, DevolucionLote
 from app.services.database import db
-from app.services.prestamo_service import realizar_prestamo, devolver_libro
+from app.routers.paginacion import Pagina, parametros_pagina
+from app.routers.asincrono import asincrono
+from app.models.serializacion import precompilar, respuesta_lista
+from app.services.prestamo_service import realizar_prestamo, realizar_prestamos, devolver_libro, devolver_libros
 
 router = APIRouter(prefix="/prestamos", tags=["prestamos"])
+precompilar(Prestamo)
 
 
 @router.post("/", response_model=Prestamo, status_code=201)
+@asincrono
 def create_prestamo(prestamo: PrestamoCreate):
     """Crear un préstamo (verificando todas las reglas de negocio)"""
     nuevo_prestamo = realizar_prestamo(prestamo.lector_id, prestamo.copia_id)
     return nuevo_prestamo
 
 
+@router.post("/lote", response_model=List[Prestamo], status_code=201)
+@asincrono
+def create_prestamos(lote: PrestamoLoteCreate):
+    """Presta varias copias a un lector en una sola operación: todas o ninguna"""
+    return realizar_prestamos(lote.lector_id, lote.copia_ids)
+
+
+@router.post("/lote/devolver")
+@asincrono
+def devolver_prestamos(lote: DevolucionLote):
+    """Devuelve varios préstamos a la vez con un resultado por préstamo"""
+    return devolver_libros(lote.prestamo_ids)
+
+
 @router.get("/", response_model=List[Prestamo])
-def get_prestamos():
-    return db.get_all_prestamos()
+@asincrono
+def get_prestamos(pagina: Pagina = Depends(parametros_pagina)):
+    prestamos = db.get_all_prestamos(pagina.after_id, pagina.limit)
+    return respuesta_lista(Prestamo, prestamos, pagina.encabezados(prestamos))
 
 
 @router.get("/{prestamo_id}", response_model=Prestamo)
+@asincrono
 def get_prestamo(prestamo_id: int):
     prestamo = db.get_prestamo(prestamo_id)
     if not prestamo:
@@ -28,15 +50,17 @@ def get_prestamo(prestamo_id: int):
 
 
 @router.get("/lector/{lector_id}", response_model=List[Prestamo])
+@asincrono
 def get_prestamos_by_lector(lector_id: int):
     """Obtiene todos los préstamos activos de un lector"""
     lector = db.get_lector(lector_id)
     if not lector:
         raise HTTPException(status_code=404, detail="Lector no encontrado")
-    return db.get_prestamos_activos_by_lector(lector_id)
+    return respuesta_lista(Prestamo, db.get_prestamos_activos_by_lector(lector_id))
 
 
 @router.post("/{prestamo_id}/devolver")
+@asincrono
 def devolver_prestamo(prestamo_id: int):
     """Devuelve un libro y calcula multas si aplica"""
     resultado = devolver_libro(prestamo_id)
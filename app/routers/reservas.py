@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException
+from typing import List
+from app.models.schemas import Reserva, ReservaCreate
+from app.services.database import db
+from app.services.reservas import reservas
+from app.models.serializacion import precompilar, respuesta_lista
+from app.routers.asincrono import asincrono
+
+router = APIRouter(prefix="/reservas", tags=["reservas"])
+precompilar(Reserva)
+
+
+@router.post("/", response_model=Reserva, status_code=201)
+@asincrono
+def create_reserva(reserva: ReservaCreate):
+    """Pone al lector en la lista de espera del libro (o le aparta una copia si hay)"""
+    return reservas.reservar(reserva.lector_id, reserva.libro_id)
+
+
+@router.get("/libro/{libro_id}", response_model=List[Reserva])
+@asincrono
+def get_reservas_by_libro(libro_id: int):
+    """Reservas listas para retirar y después la lista de espera en orden"""
+    libro = db.get_libro(libro_id)
+    if not libro:
+        raise HTTPException(status_code=404, detail="Libro no encontrado")
+    return respuesta_lista(Reserva, reservas.get_reservas_by_libro(libro_id))
+
+
+@router.delete("/libro/{libro_id}/lector/{lector_id}", status_code=204)
+@asincrono
+def cancelar_reserva(libro_id: int, lector_id: int):
+    """Cancela la reserva; si tenía una copia apartada pasa al siguiente en espera"""
+    if not reservas.cancelar(lector_id, libro_id):
+        raise HTTPException(status_code=404, detail="Reserva no encontrada")
@@ -1,7 +1,158 @@
-from typing import List
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# (email, libro, mensaje)
+Envio = Tuple[str, str, str]
+
+# Tareas que un handler en el event loop no pudo encolar sin esperar (ver BioAlert.diferir)
+_diferidas: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("bioalert_diferidas", default=None)
+
+
+class _IdsCrecientes:
+    """Ids en orden creciente; los más antiguos se descartan por el frente sin mover la lista cada vez"""
+    __slots__ = ("ids", "inicio")
+
+    def __init__(self):
+        self.ids: List[int] = []
+        self.inicio = 0
+
+    def __len__(self):
+        return len(self.ids) - self.inicio
+
+    def agregar(self, fila_id: int):
+        self.ids.append(fila_id)
+
+    def descartar_primero(self):
+        self.inicio += 1
+        if self.inicio >= 64 and self.inicio * 2 >= len(self.ids):
+            del self.ids[:self.inicio]
+            self.inicio = 0
+
+    def desde(self, fila_id: int) -> Iterable[int]:
+        """Ids >= fila_id en orden"""
+        for posicion in range(bisect_left(self.ids, fila_id, self.inicio), len(self.ids)):
+            yield self.ids[posicion]
+
+
+class HistorialNotificaciones:
+    """Últimas `capacidad` notificaciones en un buffer circular, indexadas por email y por libro.
+
+    Los ids son crecientes y la notificación n ocupa la posición
+    n % capacidad. Con el buffer lleno cada alta desplaza a la más antigua,
+    que sale de los índices y, si se indicó `archivo`, se escribe como
+    una línea JSON en un log rotativo.
+    """
+
+    def __init__(self, capacidad: int, archivo: Optional[str] = None,
+                 max_bytes: int = 10 * 1024 * 1024, respaldos: int = 5):
+        self.capacidad = capacidad
+        self._derrame = None
+        if archivo:
+            self._derrame = RotatingFileHandler(archivo, maxBytes=max_bytes, backupCount=respaldos, encoding="utf-8")
+            self._derrame.setFormatter(logging.Formatter("%(message)s"))
+        self.vaciar()
+
+    def vaciar(self):
+        """Descarta todo (sin derramarlo a disco) y vuelve a numerar desde 1"""
+        self._filas: List[Optional[dict]] = [None] * self.capacidad
+        self._primer_id = 1
+        self._siguiente_id = 1
+        self._por_email: Dict[str, _IdsCrecientes] = {}
+        self._por_libro: Dict[str, _IdsCrecientes] = {}
+
+    def __len__(self):
+        return self._siguiente_id - self._primer_id
+
+    def _fila(self, fila_id: int) -> dict:
+        return self._filas[fila_id % self.capacidad]
+
+    def agregar(self, email: str, libro: str, mensaje: str) -> dict:
+        if len(self) == self.capacidad:
+            self._desalojar()
+        fila_id = self._siguiente_id
+        notificacion = {"id": fila_id, "email": email, "libro": libro, "mensaje": mensaje, "fecha": datetime.now()}
+        self._filas[fila_id % self.capacidad] = notificacion
+        self._por_email.setdefault(email, _IdsCrecientes()).agregar(fila_id)
+        self._por_libro.setdefault(libro, _IdsCrecientes()).agregar(fila_id)
+        self._siguiente_id += 1
+        return notificacion
+
+    def _desalojar(self):
+        notificacion = self._fila(self._primer_id)
+        self._filas[self._primer_id % self.capacidad] = None
+        self._primer_id += 1
+        for indice, clave in ((self._por_email, notificacion["email"]), (self._por_libro, notificacion["libro"])):
+            ids = indice[clave]
+            ids.descartar_primero()
+            if not ids:
+                del indice[clave]
+        if self._derrame is not None:
+            linea = json.dumps(notificacion, default=str, ensure_ascii=False)
+            self._derrame.handle(logging.makeLogRecord({"msg": linea}))
+
+    def consultar(self, after_id: int = 0, limit: Optional[int] = None, email: Optional[str] = None,
+                  libro: Optional[str] = None, since: Optional[datetime] = None) -> List[dict]:
+        """Notificaciones con id > after_id en orden, filtradas por email, libro y fecha mínima.
+
+        Con filtro de email o libro se recorre solo el índice más chico;
+        `since` y `after_id` se resuelven por búsqueda binaria.
+        """
+        desde_id = max(after_id + 1, self._primer_id)
+        if since is not None:
+            ids = range(desde_id, self._siguiente_id)
+            desde_id += bisect_left(ids, since, key=lambda fila_id: self._fila(fila_id)["fecha"])
+
+        indices = []
+        for indice, clave in ((self._por_email, email), (self._por_libro, libro)):
+            if clave is not None:
+                if clave not in indice:
+                    return []
+                indices.append(indice[clave])
+        candidatos = min(indices, key=len).desde(desde_id) if indices else range(desde_id, self._siguiente_id)
+
+        resultado = []
+        for fila_id in candidatos:
+            if limit is not None and len(resultado) >= limit:
+                break
+            notificacion = self._fila(fila_id)
+            if (email is None or notificacion["email"] == email) and (libro is None or notificacion["libro"] == libro):
+                resultado.append(notificacion)
+        return resultado
+
+    def cerrar(self):
+        if self._derrame is not None:
+            self._derrame.close()
 
 
 class BioAlert:
+    """Envío de notificaciones en segundo plano.
+
+    `notificar` y `encolar_envios` solo encolan: una cola acotada alimenta
+    a un grupo de hilos que hacen los envíos, así que el costo para quien
+    notifica no depende de cuántos destinatarios haya. Con la cola llena
+    quien encola espera a que se libere lugar (backpressure).
+
+    Cada tarea encolada recibe un número de secuencia y sus envíos se
+    publican en el historial en ese orden aunque los hilos terminen en otro.
+
+    Encolar desde un handler en el event loop nunca lo bloquea: con la
+    cola llena la tarea queda diferida y el handler, al terminar, espera
+    lugar en un hilo del pool (`diferir` y `encolar_diferidas`) antes de
+    responder. Para esperar la publicación desde un handler async está
+    `esperar_async`.
+    """
     _instance = None
 
     def __new__(cls):
@@ -14,21 +165,173 @@ class BioAlert:
         if self._initialized:
             return
         self._initialized = True
-        self.notificaciones: List[dict] = []
+        self.historial = HistorialNotificaciones(
+            int(os.environ.get("BIOALERT_HISTORIAL_CAPACIDAD", "100000")),
+            os.environ.get("BIOALERT_HISTORIAL_ARCHIVO")
+        )
+        self.trabajadores = int(os.environ.get("BIOALERT_TRABAJADORES", "4"))
+        self.capacidad = int(os.environ.get("BIOALERT_CAPACIDAD_COLA", "10000"))
+        self._cola: queue.Queue = queue.Queue(self.capacidad)
+        self._hilos: List[threading.Thread] = []
+        self._activo = True
+        # Protege secuencia, publicación, historial y métricas
+        self._estado = threading.Condition()
+        self._encoladas = 0
+        self._publicadas = 0
+        self._terminadas: Dict[int, List[Envio]] = {}
+        self._esperas_cola_llena = 0
+        self._latencia_total = 0.0
+        self._latencia_maxima = 0.0
 
     def notificar(self, email: str, libro_nombre: str, mensaje: str):
-        """Simula envío de notificación por email"""
-        notificacion = {
-            "email": email,
-            "libro": libro_nombre,
-            "mensaje": mensaje
-        }
-        self.notificaciones.append(notificacion)
-        print(f"📧 BioAlert: Email enviado a {email} sobre '{libro_nombre}': {mensaje}")
-
-    def get_notificaciones(self) -> List[dict]:
-        """Obtiene historial de notificaciones"""
-        return self.notificaciones
+        """Encola el envío de una notificación por email (simulado)"""
+        self._encolar(lambda: [(email, libro_nombre, mensaje)])
+
+    def encolar_envios(self, generar: Callable[..., Iterable[Envio]], *args):
+        """Encola una tarea que calcula sus destinatarios en segundo plano.
+
+        `generar(*args)` corre en un hilo de envío y devuelve los
+        (email, libro, mensaje) a notificar.
+        """
+        self._encolar(lambda: generar(*args))
+
+    def _encolar(self, tarea: Callable[[], Iterable[Envio]]):
+        with self._estado:
+            self._encoladas += 1
+            secuencia = self._encoladas
+            activo = self._activo
+            if activo and not self._hilos:
+                self._iniciar_hilos()
+        item = (secuencia, tarea, time.perf_counter())
+        if not activo:
+            # Ya no hay hilos de envío (cierre de la aplicación): se envía en línea
+            self._procesar(*item)
+            return
+        try:
+            self._cola.put_nowait(item)
+        except queue.Full:
+            with self._estado:
+                self._esperas_cola_llena += 1
+            diferidas = _diferidas.get()
+            if diferidas is not None:
+                # Esperar aquí frenaría el event loop: el handler la encola al terminar
+                diferidas.append(item)
+            else:
+                self._cola.put(item)
+
+    def diferir(self) -> contextvars.Token:
+        """Desde aquí, en este contexto, lo que encuentre la cola llena queda para `encolar_diferidas`"""
+        return _diferidas.set([])
+
+    async def encolar_diferidas(self, token: contextvars.Token):
+        """Encola lo diferido desde `diferir`, esperando lugar en un hilo del pool"""
+        diferidas = _diferidas.get()
+        _diferidas.reset(token)
+        for item in diferidas:
+            await run_in_threadpool(self._cola.put, item)
+
+    def saturada(self) -> bool:
+        """Si encolar ahora tendría que esperar lugar en la cola"""
+        return self._cola.full()
+
+    def _iniciar_hilos(self):
+        for numero in range(self.trabajadores):
+            hilo = threading.Thread(target=self._trabajar, name=f"bioalert-{numero}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def _trabajar(self):
+        while True:
+            item = self._cola.get()
+            try:
+                if item is None:
+                    return
+                self._procesar(*item)
+            finally:
+                self._cola.task_done()
+
+    def _procesar(self, secuencia: int, tarea: Callable[[], Iterable[Envio]], encolada: float):
+        enviadas = []
+        try:
+            for email, libro_nombre, mensaje in tarea():
+                logger.info("BioAlert: email enviado a %s sobre '%s': %s", email, libro_nombre, mensaje)
+                enviadas.append((email, libro_nombre, mensaje))
+        except Exception:
+            logger.exception("BioAlert: falló la tarea de envío %d", secuencia)
+
+        latencia = time.perf_counter() - encolada
+        with self._estado:
+            self._latencia_total += latencia
+            self._latencia_maxima = max(self._latencia_maxima, latencia)
+            self._terminadas[secuencia] = enviadas
+            while self._publicadas + 1 in self._terminadas:
+                self._publicadas += 1
+                for envio in self._terminadas.pop(self._publicadas):
+                    self.historial.agregar(*envio)
+            self._estado.notify_all()
+
+    def esperar(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que se publique todo lo encolado hasta ahora; False si vence el timeout"""
+        with self._estado:
+            objetivo = self._encoladas
+            return self._estado.wait_for(lambda: self._publicadas >= objetivo, timeout)
+
+    async def esperar_async(self, timeout: Optional[float] = None) -> bool:
+        """Como `esperar`, sin bloquear el event loop: solo si hay envíos pendientes se espera en un hilo"""
+        with self._estado:
+            if self._publicadas >= self._encoladas:
+                return True
+        return await run_in_threadpool(self.esperar, timeout)
+
+    def cerrar(self, timeout: Optional[float] = None):
+        """Termina de enviar lo pendiente y detiene los hilos; lo que llegue después se envía en línea"""
+        with self._estado:
+            self._activo = False
+            hilos, self._hilos = self._hilos, []
+        for _ in hilos:
+            self._cola.put(None)
+        for hilo in hilos:
+            hilo.join(timeout)
+        # Lo que se encoló mientras se cerraba queda detrás de los centinelas
+        while True:
+            try:
+                item = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._procesar(*item)
+        self.historial.cerrar()
+
+    def reset(self):
+        """Espera los envíos pendientes y vacía el historial"""
+        self.esperar()
+        with self._estado:
+            self.historial.vaciar()
+
+    def metricas(self) -> dict:
+        with self._estado:
+            completadas = self._publicadas + len(self._terminadas)
+            return {
+                "trabajadores": len(self._hilos),
+                "capacidad_cola": self.capacidad,
+                "en_cola": self._cola.qsize(),
+                "encoladas": self._encoladas,
+                "completadas": completadas,
+                "esperas_cola_llena": self._esperas_cola_llena,
+                "latencia_promedio_ms": 1000 * self._latencia_total / completadas if completadas else 0.0,
+                "latencia_maxima_ms": 1000 * self._latencia_maxima
+            }
+
+    @property
+    def notificaciones(self) -> List[dict]:
+        """Todas las notificaciones que conserva el historial"""
+        return self.get_notificaciones()
+
+    def get_notificaciones(self, after_id: int = 0, limit: Optional[int] = None, email: Optional[str] = None,
+                           libro: Optional[str] = None, since: Optional[datetime] = None) -> List[dict]:
+        """Obtiene historial de notificaciones (ver HistorialNotificaciones.consultar)"""
+        with self._estado:
+            return self.historial.consultar(after_id, limit, email, libro, since)
 
 
 # Instancia global singleton
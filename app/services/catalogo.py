@@ -0,0 +1,72 @@
+import threading
+from typing import Dict, Iterable, Optional, Set
+from app.models.schemas import Autor, Libro
+from app.models.serializacion import precompilar, volcar_uno
+from app.services.database import db
+
+precompilar(Autor, Libro)
+
+
+class VistaLibros:
+    """Vista desnormalizada de LibroConAutor: un fragmento JSON ya serializado por libro.
+
+    Cada autor se serializa una vez y su fragmento se empalma en el de cada
+    uno de sus libros, así que listar el catálogo es concatenar bytes sin
+    armar dicts ni validar modelos. Los fragmentos se calculan al crear el
+    libro o el autor (o la primera vez que se piden, p. ej. tras una
+    importación masiva) y `invalidar_autor` los descarta si el autor cambia.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Olvida todos los fragmentos (p. ej. tras vaciar la base)"""
+        with self._lock:
+            self._autores: Dict[int, bytes] = {}
+            self._libros: Dict[int, bytes] = {}
+            self._libros_por_autor: Dict[int, Set[int]] = {}
+
+    def agregar_autor(self, autor) -> bytes:
+        fragmento = volcar_uno(Autor, autor)
+        with self._lock:
+            self._autores[autor["id"]] = fragmento
+        return fragmento
+
+    def agregar_libro(self, libro) -> bytes:
+        autor = self._autores.get(libro["autor_id"])
+        if autor is None:
+            autor = self.agregar_autor(db.get_autor(libro["autor_id"]))
+        propio = volcar_uno(Libro, libro)
+        # LibroConAutor es Libro más "autor" al final: se cierra el objeto después de empalmarlo
+        fragmento = propio[:-1] + b',"autor":' + autor + b"}"
+        with self._lock:
+            # Si el autor se invalidó mientras tanto, el fragmento no se guarda
+            if self._autores.get(libro["autor_id"]) is autor:
+                self._libros[libro["id"]] = fragmento
+                self._libros_por_autor.setdefault(libro["autor_id"], set()).add(libro["id"])
+        return fragmento
+
+    def invalidar_autor(self, autor_id: int):
+        """Descarta el autor y los libros que lo incluyen; se recalculan al volver a pedirse"""
+        with self._lock:
+            self._autores.pop(autor_id, None)
+            for libro_id in self._libros_por_autor.pop(autor_id, ()):
+                self._libros.pop(libro_id, None)
+
+    def fragmento(self, libro) -> bytes:
+        fragmento = self._libros.get(libro["id"])
+        return fragmento if fragmento is not None else self.agregar_libro(libro)
+
+    def listar(self, libros: Iterable) -> bytes:
+        """Arreglo JSON de LibroConAutor para las filas dadas"""
+        return b"[" + b",".join([self.fragmento(libro) for libro in libros]) + b"]"
+
+    def obtener(self, libro_id: int) -> Optional[bytes]:
+        libro = db.get_libro(libro_id)
+        return self.fragmento(libro) if libro else None
+
+
+# Instancia global
+vista_libros = VistaLibros()
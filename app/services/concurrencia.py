@@ -0,0 +1,35 @@
+import threading
+from contextlib import contextmanager
+
+
+class LocksRayados:
+    """Conjunto fijo de locks repartidos por id (lock striping).
+
+    Dos operaciones sobre ids distintos rara vez comparten lock, así que no
+    se serializan entre sí como lo harían con un único lock global.
+    """
+
+    def __init__(self, cantidad: int = 256):
+        self._locks = [threading.Lock() for _ in range(cantidad)]
+
+    def lock(self, clave: int) -> threading.Lock:
+        return self._locks[hash(clave) % len(self._locks)]
+
+    @contextmanager
+    def bloquear(self, *claves: int):
+        """Toma los locks de todas las claves, siempre en el mismo orden para no interbloquearse"""
+        indices = sorted({hash(clave) % len(self._locks) for clave in claves})
+        tomados = []
+        try:
+            for indice in indices:
+                self._locks[indice].acquire()
+                tomados.append(self._locks[indice])
+            yield
+        finally:
+            for lock in reversed(tomados):
+                lock.release()
+
+
+# Orden de adquisición: primero lectores, después copias
+locks_lectores = LocksRayados()
+locks_copias = LocksRayados()
@@ -1,16 +1,65 @@
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+import os
+import threading
+import weakref
+from bisect import bisect_right, insort
+from collections import Counter
+from copy import copy
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from datetime import date, datetime
 from app.models.schemas import EstadoCopia
+from app.services.storage import Storage
+from app.services.concurrencia import LocksRayados
+from app.services.versiones import Versiones
+from app.services.registros import (
+    Fila, FilaAutor, FilaLibro, FilaCopia, FilaLector, FilaPrestamo, FilaSuscripcion,
+    ColumnaEstados, ESTADOS, CODIGOS, PLAZO_PRESTAMO, extender_sancion, reducir_sancion
+)
+
+# Colección -> atributo con el próximo id a asignar
+CONTADORES = {
+    "autores": "autor_counter",
+    "libros": "libro_counter",
+    "copias": "copia_counter",
+    "lectores": "lector_counter",
+    "prestamos": "prestamo_counter",
+    "suscripciones": "suscripcion_counter",
+}
+
+
+class _Exportacion:
+    """Recorrido de `MemoryDB.exportar` en curso"""
+    __slots__ = ("tope", "hasta", "originales")
+
+    def __init__(self, tope: int):
+        self.tope = tope
+        # Último id ya entregado
+        self.hasta = 0
+        # id -> copia de la fila como estaba al empezar, si se modificó o borró después
+        self.originales: Dict[int, Fila] = {}
 
 
 class MemoryDB:
+    # Sin E/S: los handlers async la usan directamente desde el event loop
+    bloqueante = False
+
     def __init__(self):
-        self.autores: Dict[int, dict] = {}
-        self.libros: Dict[int, dict] = {}
-        self.copias: Dict[int, dict] = {}
-        self.lectores: Dict[int, dict] = {}
-        self.prestamos: Dict[int, dict] = {}
-        self.suscripciones: Dict[int, dict] = {}
+        # Sobrevive a reset(): las versiones nunca retroceden
+        self.versiones = Versiones()
+        self.al_cambiar_vencimiento: Optional[Callable[[FilaPrestamo], None]] = None
+        self.reset()
+
+    def reset(self):
+        """Vacía colecciones, índices y contadores"""
+        self.versiones.reiniciar()
+        self.autores: Dict[int, FilaAutor] = {}
+        self.libros: Dict[int, FilaLibro] = {}
+        self.copias: Dict[int, FilaCopia] = {}
+        self.lectores: Dict[int, FilaLector] = {}
+        self.prestamos: Dict[int, FilaPrestamo] = {}
+        self.suscripciones: Dict[int, FilaSuscripcion] = {}
+        # Colección -> exportaciones en curso (ver exportar)
+        self._exportaciones: Dict[str, List[_Exportacion]] = {coleccion: [] for coleccion in CONTADORES}
+        self._lock_exportaciones = threading.Lock()
 
         self.autor_counter = 1
         self.libro_counter = 1
@@ -18,146 +67,482 @@ class MemoryDB:
         self.lector_counter = 1
         self.prestamo_counter = 1
         self.suscripcion_counter = 1
+        self._locks_contadores = {contador: threading.Lock() for contador in CONTADORES.values()}
+        # Protege los contadores de disponibilidad de cada libro
+        self._locks_libros = LocksRayados()
+
+        # Índices secundarios: evitan recorrer colecciones completas
+        self._copias_por_libro: Dict[int, List[int]] = {}
+        # Estado de cada copia (un byte) y cantidad de copias por libro y estado
+        self._estados = ColumnaEstados()
+        self._disponibilidad: Dict[int, List[int]] = {}
+        self._prestamos_activos_por_lector: Dict[int, Dict[int, None]] = {}
+        # libro_id -> {lector_id: suscripcion_id}, en orden de suscripción
+        self._suscripciones_por_libro: Dict[int, Dict[int, int]] = {}
+        self._libros_por_autor: Dict[int, List[int]] = {}
+        # Índice invertido de trigramas sobre el nombre del autor en minúsculas
+        self._trigramas_autor: Dict[str, Set[int]] = {}
+        # (sancionado_hasta, lector_id) ordenado: los sancionados son un sufijo
+        self._sancionados: List[Tuple[datetime, int]] = []
+        self._lock_sancionados = threading.Lock()
+
+    def _reconstruir_indices(self):
+        """Recalcula los índices secundarios a partir de las colecciones"""
+        self._copias_por_libro = {}
+        self._estados = ColumnaEstados()
+        self._disponibilidad = {}
+        self._prestamos_activos_por_lector = {}
+        self._suscripciones_por_libro = {}
+        self._libros_por_autor = {}
+        self._trigramas_autor = {}
+        ahora = datetime.now()
+        self._sancionados = sorted(
+            (lector.sancionado_hasta, lector.id) for lector in self.lectores.values()
+            if lector.sancionado_hasta is not None and lector.sancionado_hasta > ahora
+        )
+        for autor in self.autores.values():
+            self._indexar_autor(autor)
+        for libro in self.libros.values():
+            self._indexar_libro(libro)
+        for copia in self.copias.values():
+            self._indexar_copia(copia)
+        for prestamo in self.prestamos.values():
+            self._indexar_prestamo(prestamo)
+        for suscripcion in self.suscripciones.values():
+            self._indexar_suscripcion(suscripcion)
+
+    def _reservar_ids(self, contador: str, cantidad: int = 1) -> int:
+        """Reserva de forma atómica un bloque de `cantidad` ids consecutivos y devuelve el primero"""
+        with self._locks_contadores[contador]:
+            valor = getattr(self, contador)
+            setattr(self, contador, valor + cantidad)
+        return valor
+
+    def _pagina(self, filas: Dict[int, Fila], contador: str, after_id: int, limit: Optional[int]) -> List:
+        """Filas con id > after_id en orden de id, como máximo `limit`.
+
+        Los ids son consecutivos, así que se recorren a partir de after_id
+        en lugar de toda la colección: el costo es O(limit).
+        """
+        if after_id <= 0 and limit is None:
+            return list(filas.values())
+        fin = getattr(self, contador)
+        pagina = []
+        fila_id = max(after_id, 0) + 1
+        while fila_id < fin and (limit is None or len(pagina) < limit):
+            fila = filas.get(fila_id)
+            if fila is not None:
+                pagina.append(fila)
+            fila_id += 1
+        return pagina
+
+    def tamanios(self) -> Dict[str, int]:
+        """Cantidad de filas de cada colección"""
+        return {coleccion: len(getattr(self, coleccion)) for coleccion in CONTADORES}
+
+    def exportar(self, coleccion: str, lote: int = 1000) -> Iterator[List[Fila]]:
+        """Recorre una colección en lotes de hasta `lote` filas, tal como estaba al llamar.
+
+        Los ids posteriores se ignoran y las filas se entregan como copias.
+        Mientras dure el recorrido, quien modifica o borra una fila que aún
+        no se exportó guarda antes una copia de cómo estaba (ver
+        `_preservar`), así que el resultado no mezcla estados de antes y
+        después de una escritura. Las filas ya exportadas no se guardan.
+        """
+        filas = getattr(self, coleccion)
+        exportacion = _Exportacion(getattr(self, CONTADORES[coleccion]) - 1)
+        with self._lock_exportaciones:
+            self._exportaciones[coleccion].append(exportacion)
+
+        def terminar():
+            with self._lock_exportaciones:
+                if exportacion in self._exportaciones[coleccion]:
+                    self._exportaciones[coleccion].remove(exportacion)
+
+        def lotes():
+            try:
+                while exportacion.hasta < exportacion.tope:
+                    fin = min(exportacion.hasta + lote, exportacion.tope)
+                    pagina = []
+                    with self._lock_exportaciones:
+                        for fila_id in range(exportacion.hasta + 1, fin + 1):
+                            fila = exportacion.originales.pop(fila_id, None)
+                            if fila is None:
+                                fila = filas.get(fila_id)
+                                fila = copy(fila) if fila is not None else None
+                            if fila is not None:
+                                pagina.append(fila)
+                        exportacion.hasta = fin
+                    if pagina:
+                        yield pagina
+            finally:
+                terminar()
+
+        recorrido = lotes()
+        # Un recorrido abandonado sin empezar no llega al finally
+        weakref.finalize(recorrido, terminar)
+        return recorrido
+
+    def _preservar(self, coleccion: str, fila: Fila):
+        """Antes de modificar o borrar `fila`: guarda cómo estaba para las exportaciones en curso que no la pasaron"""
+        if not self._exportaciones[coleccion]:
+            return
+        with self._lock_exportaciones:
+            for exportacion in self._exportaciones[coleccion]:
+                if exportacion.hasta < fila.id <= exportacion.tope and fila.id not in exportacion.originales:
+                    exportacion.originales[fila.id] = copy(fila)
+
+    def close(self):
+        """Nada que liberar: todo vive en memoria"""
+
+    def version(self, coleccion: str, libro_id: Optional[int] = None) -> int:
+        """Versión de la colección (o de las copias de un libro); crece con cada escritura"""
+        return self.versiones.obtener(coleccion if libro_id is None else (coleccion, libro_id))
+
+    def _registrar_cambio(self, tabla: str, registro: Fila):
+        """Se invoca tras cada alta o modificación (ver MemoryDBPersistente)"""
+
+    def _registrar_borrado(self, tabla: str, registro_id: int):
+        """Se invoca tras cada baja (ver MemoryDBPersistente)"""
 
     # Autores
-    def create_autor(self, nombre: str, fecha_nacimiento) -> dict:
-        autor_id = self.autor_counter
-        autor = {"id": autor_id, "nombre": nombre, "fecha_nacimiento": fecha_nacimiento}
+    def create_autor(self, nombre: str, fecha_nacimiento) -> FilaAutor:
+        autor_id = self._reservar_ids("autor_counter")
+        autor = FilaAutor(autor_id, nombre, fecha_nacimiento)
         self.autores[autor_id] = autor
-        self.autor_counter += 1
+        self._indexar_autor(autor)
+        self._registrar_cambio("autores", autor)
+        self.versiones.incrementar("autores")
         return autor
 
-    def get_autor(self, autor_id: int) -> Optional[dict]:
+    def create_autores(self, autores: List[Tuple[str, date]]) -> List[FilaAutor]:
+        """Alta en bloque: los ids del lote son consecutivos"""
+        inicio = self._reservar_ids("autor_counter", len(autores))
+        creados = []
+        for autor_id, (nombre, fecha_nacimiento) in enumerate(autores, inicio):
+            autor = FilaAutor(autor_id, nombre, fecha_nacimiento)
+            self.autores[autor_id] = autor
+            self._indexar_autor(autor)
+            self._registrar_cambio("autores", autor)
+            creados.append(autor)
+        self.versiones.incrementar("autores")
+        return creados
+
+    def _indexar_autor(self, autor: FilaAutor):
+        for trigrama in _trigramas(autor["nombre"].lower()):
+            self._trigramas_autor.setdefault(trigrama, set()).add(autor["id"])
+
+    def get_autor(self, autor_id: int) -> Optional[FilaAutor]:
         return self.autores.get(autor_id)
 
-    def get_all_autores(self) -> List[dict]:
-        return list(self.autores.values())
+    def get_all_autores(self, after_id: int = 0, limit: Optional[int] = None) -> List[FilaAutor]:
+        return self._pagina(self.autores, "autor_counter", after_id, limit)
 
     # Libros
-    def create_libro(self, nombre: str, anio: int, autor_id: int) -> dict:
-        libro_id = self.libro_counter
-        libro = {"id": libro_id, "nombre": nombre, "anio": anio, "autor_id": autor_id}
+    def create_libro(self, nombre: str, anio: int, autor_id: int) -> FilaLibro:
+        libro_id = self._reservar_ids("libro_counter")
+        libro = FilaLibro(libro_id, nombre, anio, autor_id)
         self.libros[libro_id] = libro
-        self.libro_counter += 1
+        self._indexar_libro(libro)
+        self._registrar_cambio("libros", libro)
+        self.versiones.incrementar("libros")
         return libro
 
-    def get_libro(self, libro_id: int) -> Optional[dict]:
+    def create_libros(self, libros: List[Tuple[str, int, int]]) -> List[FilaLibro]:
+        """Alta en bloque: los ids del lote son consecutivos"""
+        inicio = self._reservar_ids("libro_counter", len(libros))
+        creados = []
+        for libro_id, (nombre, anio, autor_id) in enumerate(libros, inicio):
+            libro = FilaLibro(libro_id, nombre, anio, autor_id)
+            self.libros[libro_id] = libro
+            self._indexar_libro(libro)
+            self._registrar_cambio("libros", libro)
+            creados.append(libro)
+        self.versiones.incrementar("libros")
+        return creados
+
+    def _indexar_libro(self, libro: FilaLibro):
+        self._libros_por_autor.setdefault(libro["autor_id"], []).append(libro["id"])
+
+    def get_libro(self, libro_id: int) -> Optional[FilaLibro]:
         return self.libros.get(libro_id)
 
-    def get_all_libros(self) -> List[dict]:
-        return list(self.libros.values())
+    def get_all_libros(self, after_id: int = 0, limit: Optional[int] = None) -> List[FilaLibro]:
+        return self._pagina(self.libros, "libro_counter", after_id, limit)
 
-    def get_libros_by_autor(self, nombre_autor: str) -> List[dict]:
-        libros_autor = []
-        for libro in self.libros.values():
-            autor = self.autores.get(libro["autor_id"])
-            if autor and nombre_autor.lower() in autor["nombre"].lower():
-                libros_autor.append(libro)
-        return libros_autor
+    def get_libros_by_autor(self, nombre_autor: str) -> List[FilaLibro]:
+        libro_ids = []
+        for autor_id in self._buscar_autores(nombre_autor.lower()):
+            libro_ids.extend(self._libros_por_autor.get(autor_id, ()))
+        libro_ids.sort()
+        return [self.libros[libro_id] for libro_id in libro_ids]
+
+    def _buscar_autores(self, consulta: str) -> List[int]:
+        """Autores cuyo nombre contiene la consulta (ya en minúsculas)"""
+        trigramas = _trigramas(consulta)
+        if not trigramas:
+            # Consultas de menos de 3 caracteres: se recorren solo los autores
+            candidatos = self.autores.keys()
+        else:
+            postings = []
+            for trigrama in trigramas:
+                ids = self._trigramas_autor.get(trigrama)
+                if not ids:
+                    return []
+                postings.append(ids)
+            postings.sort(key=len)
+            candidatos = set(postings[0])
+            for ids in postings[1:]:
+                candidatos &= ids
+        # Los trigramas no garantizan contigüidad: se verifica la subcadena
+        return [a_id for a_id in candidatos if consulta in self.autores[a_id]["nombre"].lower()]
 
     # Copias
-    def create_copia(self, libro_id: int) -> dict:
-        copia_id = self.copia_counter
-        copia = {"id": copia_id, "libro_id": libro_id, "estado": EstadoCopia.EN_BIBLIOTECA}
+    def create_copia(self, libro_id: int) -> FilaCopia:
+        copia_id = self._reservar_ids("copia_counter")
+        copia = FilaCopia(copia_id, libro_id, EstadoCopia.EN_BIBLIOTECA, self._estados)
         self.copias[copia_id] = copia
-        self.copia_counter += 1
+        self._indexar_copia(copia)
+        self._registrar_cambio("copias", copia)
+        self.versiones.incrementar("copias", ("copias", libro_id))
         return copia
 
-    def get_copia(self, copia_id: int) -> Optional[dict]:
+    def create_copias(self, libro_ids: List[int]) -> List[FilaCopia]:
+        """Alta en bloque: los ids del lote son consecutivos.
+
+        La columna de estados se extiende una sola vez y los contadores de
+        disponibilidad se suman por libro antes de publicar las copias.
+        """
+        inicio = self._reservar_ids("copia_counter", len(libro_ids))
+        if not libro_ids:
+            return []
+        self._estados.asignar(inicio + len(libro_ids) - 1, EstadoCopia.EN_BIBLIOTECA)
+        en_biblioteca = CODIGOS[EstadoCopia.EN_BIBLIOTECA]
+        for libro_id, cantidad in Counter(libro_ids).items():
+            with self._locks_libros.bloquear(libro_id):
+                contadores = self._disponibilidad.setdefault(libro_id, [0] * len(ESTADOS))
+                contadores[en_biblioteca] += cantidad
+
+        creados = []
+        for copia_id, libro_id in enumerate(libro_ids, inicio):
+            copia = FilaCopia(copia_id, libro_id, EstadoCopia.EN_BIBLIOTECA, self._estados)
+            self.copias[copia_id] = copia
+            self._copias_por_libro.setdefault(libro_id, []).append(copia_id)
+            self._registrar_cambio("copias", copia)
+            creados.append(copia)
+        self.versiones.incrementar("copias", *(("copias", libro_id) for libro_id in set(libro_ids)))
+        return creados
+
+    def _indexar_copia(self, copia: FilaCopia):
+        copia.adjuntar(self._estados)
+        self._copias_por_libro.setdefault(copia.libro_id, []).append(copia.id)
+        with self._locks_libros.bloquear(copia.libro_id):
+            contadores = self._disponibilidad.setdefault(copia.libro_id, [0] * len(ESTADOS))
+            contadores[self._estados.codigo(copia.id)] += 1
+
+    def get_copia(self, copia_id: int) -> Optional[FilaCopia]:
         return self.copias.get(copia_id)
 
-    def get_all_copias(self) -> List[dict]:
-        return list(self.copias.values())
+    def get_all_copias(self, after_id: int = 0, limit: Optional[int] = None) -> List[FilaCopia]:
+        return self._pagina(self.copias, "copia_counter", after_id, limit)
 
-    def get_copias_by_libro(self, libro_id: int) -> List[dict]:
-        return [c for c in self.copias.values() if c["libro_id"] == libro_id]
+    def get_copias_by_libro(self, libro_id: int) -> List[FilaCopia]:
+        return [self.copias[c_id] for c_id in self._copias_por_libro.get(libro_id, ())]
 
-    def update_estado_copia(self, copia_id: int, estado: EstadoCopia) -> Optional[dict]:
-        if copia_id in self.copias:
-            self.copias[copia_id]["estado"] = estado
-            return self.copias[copia_id]
-        return None
+    def update_estado_copia(self, copia_id: int, estado: EstadoCopia) -> Optional[FilaCopia]:
+        copia = self.copias.get(copia_id)
+        if copia is None:
+            return None
+        self._preservar("copias", copia)
+        with self._locks_libros.bloquear(copia.libro_id):
+            contadores = self._disponibilidad[copia.libro_id]
+            contadores[self._estados.codigo(copia_id)] -= 1
+            contadores[CODIGOS[estado]] += 1
+            self._estados.asignar(copia_id, estado)
+        self._registrar_cambio("copias", copia)
+        self.versiones.incrementar("copias", ("copias", copia.libro_id))
+        return copia
+
+    def get_disponibilidad_libro(self, libro_id: int) -> Dict[EstadoCopia, int]:
+        contadores = self._disponibilidad.get(libro_id, [0] * len(ESTADOS))
+        return dict(zip(ESTADOS, contadores))
 
     # Lectores
-    def create_lector(self, nombre: str, email: str) -> dict:
-        lector_id = self.lector_counter
-        lector = {"id": lector_id, "nombre": nombre, "email": email, "dias_sancion": 0}
+    def create_lector(self, nombre: str, email: str) -> FilaLector:
+        lector_id = self._reservar_ids("lector_counter")
+        lector = FilaLector(lector_id, nombre, email)
         self.lectores[lector_id] = lector
-        self.lector_counter += 1
+        self._registrar_cambio("lectores", lector)
+        self.versiones.incrementar("lectores")
         return lector
 
-    def get_lector(self, lector_id: int) -> Optional[dict]:
+    def create_lectores(self, lectores: List[Tuple[str, str]]) -> List[FilaLector]:
+        """Alta en bloque: los ids del lote son consecutivos"""
+        inicio = self._reservar_ids("lector_counter", len(lectores))
+        creados = []
+        for lector_id, (nombre, email) in enumerate(lectores, inicio):
+            lector = FilaLector(lector_id, nombre, email)
+            self.lectores[lector_id] = lector
+            self._registrar_cambio("lectores", lector)
+            creados.append(lector)
+        self.versiones.incrementar("lectores")
+        return creados
+
+    def get_lector(self, lector_id: int) -> Optional[FilaLector]:
         return self.lectores.get(lector_id)
 
-    def get_all_lectores(self) -> List[dict]:
-        return list(self.lectores.values())
+    def get_all_lectores(self, after_id: int = 0, limit: Optional[int] = None) -> List[FilaLector]:
+        return self._pagina(self.lectores, "lector_counter", after_id, limit)
 
-    def update_sancion_lector(self, lector_id: int, dias: int) -> Optional[dict]:
+    def update_sancion_lector(self, lector_id: int, dias: int) -> Optional[FilaLector]:
         if lector_id in self.lectores:
-            self.lectores[lector_id]["dias_sancion"] += dias
-            return self.lectores[lector_id]
+            lector = self.lectores[lector_id]
+            self._mover_sancion(lector, extender_sancion(lector.sancionado_hasta, dias))
+            return lector
         return None
 
-    def reducir_sancion_lector(self, lector_id: int, dias: int) -> Optional[dict]:
+    def reducir_sancion_lector(self, lector_id: int, dias: int) -> Optional[FilaLector]:
         if lector_id in self.lectores:
-            self.lectores[lector_id]["dias_sancion"] = max(0, self.lectores[lector_id]["dias_sancion"] - dias)
-            return self.lectores[lector_id]
+            lector = self.lectores[lector_id]
+            self._mover_sancion(lector, reducir_sancion(lector.sancionado_hasta, dias))
+            return lector
         return None
 
+    def get_lectores_sancionados(self) -> List[FilaLector]:
+        """Lectores con sanción vigente, de la que termina antes a la que termina después"""
+        with self._lock_sancionados:
+            # Las sanciones ya cumplidas quedan al frente y se descartan de paso
+            del self._sancionados[:bisect_right(self._sancionados, (datetime.now(), float("inf")))]
+            vigentes = list(self._sancionados)
+        return [self.lectores[lector_id] for _, lector_id in vigentes]
+
+    def _mover_sancion(self, lector: FilaLector, hasta: Optional[datetime]):
+        self._preservar("lectores", lector)
+        with self._lock_sancionados:
+            if lector.sancionado_hasta is not None:
+                # Si ya estaba cumplida puede haberse descartado del índice
+                anterior = (lector.sancionado_hasta, lector.id)
+                posicion = bisect_right(self._sancionados, anterior) - 1
+                if posicion >= 0 and self._sancionados[posicion] == anterior:
+                    del self._sancionados[posicion]
+            if hasta is not None:
+                insort(self._sancionados, (hasta, lector.id))
+            lector.sancionado_hasta = hasta
+        self._registrar_cambio("lectores", lector)
+        self.versiones.incrementar("lectores")
+
     # Préstamos
-    def create_prestamo(self, lector_id: int, copia_id: int) -> dict:
-        prestamo_id = self.prestamo_counter
+    def create_prestamo(self, lector_id: int, copia_id: int) -> FilaPrestamo:
+        prestamo_id = self._reservar_ids("prestamo_counter")
         fecha_prestamo = datetime.now()
-        fecha_devolucion_esperada = fecha_prestamo + timedelta(days=30)
-        prestamo = {
-            "id": prestamo_id,
-            "lector_id": lector_id,
-            "copia_id": copia_id,
-            "fecha_prestamo": fecha_prestamo,
-            "fecha_devolucion_esperada": fecha_devolucion_esperada,
-            "fecha_devolucion_real": None
-        }
+        prestamo = FilaPrestamo(prestamo_id, lector_id, copia_id, fecha_prestamo,
+                                fecha_prestamo + PLAZO_PRESTAMO)
         self.prestamos[prestamo_id] = prestamo
-        self.prestamo_counter += 1
+        self._indexar_prestamo(prestamo)
+        self._registrar_cambio("prestamos", prestamo)
+        self.versiones.incrementar("prestamos")
         return prestamo
 
-    def get_prestamo(self, prestamo_id: int) -> Optional[dict]:
+    def _indexar_prestamo(self, prestamo: FilaPrestamo):
+        if prestamo["fecha_devolucion_real"] is None:
+            self._prestamos_activos_por_lector.setdefault(prestamo["lector_id"], {})[prestamo["id"]] = None
+
+    def get_prestamo(self, prestamo_id: int) -> Optional[FilaPrestamo]:
         return self.prestamos.get(prestamo_id)
 
-    def get_all_prestamos(self) -> List[dict]:
-        return list(self.prestamos.values())
+    def get_all_prestamos(self, after_id: int = 0, limit: Optional[int] = None) -> List[FilaPrestamo]:
+        return self._pagina(self.prestamos, "prestamo_counter", after_id, limit)
 
-    def get_prestamos_activos_by_lector(self, lector_id: int) -> List[dict]:
-        return [p for p in self.prestamos.values()
-                if p["lector_id"] == lector_id and p["fecha_devolucion_real"] is None]
+    def get_prestamos_activos_by_lector(self, lector_id: int) -> List[FilaPrestamo]:
+        activos = self._prestamos_activos_por_lector.get(lector_id, {})
+        return [self.prestamos[p_id] for p_id in activos]
+
+    def devolver_prestamo(self, prestamo_id: int) -> Optional[FilaPrestamo]:
+        if prestamo_id in self.prestamos:
+            prestamo = self.prestamos[prestamo_id]
+            self._preservar("prestamos", prestamo)
+            prestamo["fecha_devolucion_real"] = datetime.now()
+            self._prestamos_activos_por_lector.get(prestamo["lector_id"], {}).pop(prestamo_id, None)
+            self._registrar_cambio("prestamos", prestamo)
+            self.versiones.incrementar("prestamos")
+            return prestamo
+        return None
 
-    def devolver_prestamo(self, prestamo_id: int) -> Optional[dict]:
+    def update_fecha_devolucion_esperada(self, prestamo_id: int, fecha: datetime) -> Optional[FilaPrestamo]:
         if prestamo_id in self.prestamos:
-            self.prestamos[prestamo_id]["fecha_devolucion_real"] = datetime.now()
-            return self.prestamos[prestamo_id]
+            self._preservar("prestamos", self.prestamos[prestamo_id])
+            prestamo = self.prestamos[prestamo_id]
+            prestamo["fecha_devolucion_esperada"] = fecha
+            self._registrar_cambio("prestamos", prestamo)
+            self.versiones.incrementar("prestamos")
+            if self.al_cambiar_vencimiento is not None:
+                self.al_cambiar_vencimiento(prestamo)
+            return prestamo
         return None
 
     # Suscripciones BioAlert
-    def create_suscripcion(self, lector_id: int, libro_id: int) -> dict:
-        suscripcion_id = self.suscripcion_counter
-        suscripcion = {
-            "id": suscripcion_id,
-            "lector_id": lector_id,
-            "libro_id": libro_id,
-            "fecha_suscripcion": datetime.now()
-        }
-        self.suscripciones[suscripcion_id] = suscripcion
-        self.suscripcion_counter += 1
+    def create_suscripcion(self, lector_id: int, libro_id: int, una_vez: bool = False) -> Optional[FilaSuscripcion]:
+        """Suscribe al lector al libro; None si ya estaba suscrito"""
+        with self._locks_libros.bloquear(libro_id):
+            if lector_id in self._suscripciones_por_libro.get(libro_id, {}):
+                return None
+            suscripcion_id = self._reservar_ids("suscripcion_counter")
+            suscripcion = FilaSuscripcion(suscripcion_id, lector_id, libro_id, datetime.now(), una_vez)
+            self.suscripciones[suscripcion_id] = suscripcion
+            self._indexar_suscripcion(suscripcion)
+        self._registrar_cambio("suscripciones", suscripcion)
+        self.versiones.incrementar("suscripciones")
         return suscripcion
 
-    def get_suscripciones_by_libro(self, libro_id: int) -> List[dict]:
-        return [s for s in self.suscripciones.values() if s["libro_id"] == libro_id]
+    def _indexar_suscripcion(self, suscripcion: FilaSuscripcion):
+        # Si hubiera duplicados de antes de exigir unicidad, vale la más antigua
+        self._suscripciones_por_libro.setdefault(suscripcion["libro_id"], {}).setdefault(
+            suscripcion["lector_id"], suscripcion["id"]
+        )
+
+    def get_suscripciones_by_libro(self, libro_id: int) -> List[FilaSuscripcion]:
+        ids = list(self._suscripciones_por_libro.get(libro_id, {}).values())
+        # Una baja concurrente puede sacar la fila entre las dos lecturas
+        return [s for s in map(self.suscripciones.get, ids) if s is not None]
 
     def delete_suscripcion(self, suscripcion_id: int) -> bool:
-        if suscripcion_id in self.suscripciones:
-            del self.suscripciones[suscripcion_id]
-            return True
-        return False
+        suscripcion = self.suscripciones.get(suscripcion_id)
+        if suscripcion is None:
+            return False
+        with self._locks_libros.bloquear(suscripcion.libro_id):
+            self._preservar("suscripciones", suscripcion)
+            if self.suscripciones.pop(suscripcion_id, None) is None:
+                return False
+            lectores = self._suscripciones_por_libro.get(suscripcion.libro_id, {})
+            if lectores.get(suscripcion.lector_id) == suscripcion_id:
+                del lectores[suscripcion.lector_id]
+                if not lectores:
+                    del self._suscripciones_por_libro[suscripcion.libro_id]
+        self._registrar_borrado("suscripciones", suscripcion_id)
+        self.versiones.incrementar("suscripciones")
+        return True
+
+
+def _trigramas(texto: str) -> Set[str]:
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def crear_db() -> Storage:
+    """Crea el backend indicado por BIBLIOTECA_STORAGE ("memory" o "sqlite").
+
+    Con BIBLIOTECA_WAL_DIR, MemoryDB registra sus cambios en disco.
+    """
+    backend = os.environ.get("BIBLIOTECA_STORAGE", "memory")
+    if backend == "memory":
+        wal_dir = os.environ.get("BIBLIOTECA_WAL_DIR")
+        if wal_dir:
+            from app.services.persistencia import MemoryDBPersistente
+            return MemoryDBPersistente(wal_dir)
+        return MemoryDB()
+    if backend == "sqlite":
+        from app.services.sqlite_db import SQLiteDB
+        return SQLiteDB(os.environ.get("BIBLIOTECA_SQLITE_PATH", "biblioteca.db"))
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
 
 
-db = MemoryDB()
+db = crear_db()
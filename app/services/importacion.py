@@ -0,0 +1,119 @@
+import csv
+import json
+from typing import AsyncIterator, Callable, Dict, List, Sequence, Type, TypeVar
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from app.models.schemas import ResultadoImportacion
+
+M = TypeVar("M", bound=BaseModel)
+
+# Cantidad máxima de filas con error que se detallan en la respuesta
+MAX_ERRORES = 100
+
+_adaptadores: Dict[type, TypeAdapter] = {}
+
+# Marca las líneas NDJSON que no son JSON válido
+_JSON_INVALIDO = object()
+
+
+async def _lineas(request: Request) -> AsyncIterator[List[str]]:
+    """Líneas completas del cuerpo, de a un trozo recibido por vez, sin armar el cuerpo entero"""
+    resto = b""
+    async for trozo in request.stream():
+        *completas, resto = (resto + trozo).split(b"\n")
+        if completas:
+            yield _decodificar(b"\n".join(completas)).split("\n")
+    if resto:
+        yield [_decodificar(resto)]
+
+
+def _decodificar(linea: bytes) -> str:
+    try:
+        return linea.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="El cuerpo debe estar codificado en UTF-8")
+
+
+async def leer_filas(request: Request) -> List[object]:
+    """Lee un lote como arreglo JSON, NDJSON o CSV según el Content-Type.
+
+    Las líneas NDJSON que no son JSON válido quedan marcadas para
+    informarlas junto con el resto de los errores del lote.
+    """
+    tipo = request.headers.get("content-type", "application/json").split(";")[0].strip()
+    if tipo == "application/json":
+        try:
+            filas = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="JSON inválido")
+        if not isinstance(filas, list):
+            raise HTTPException(status_code=400, detail="Se esperaba un arreglo JSON")
+        return filas
+    if tipo in ("application/x-ndjson", "application/ndjson"):
+        filas = []
+        async for lineas in _lineas(request):
+            for linea in lineas:
+                if not linea.strip():
+                    continue
+                try:
+                    filas.append(json.loads(linea))
+                except ValueError:
+                    filas.append(_JSON_INVALIDO)
+        return filas
+    if tipo == "text/csv":
+        # csv reconstruye los campos entre comillas que ocupan varias líneas
+        return list(csv.DictReader([linea + "\n" async for lineas in _lineas(request) for linea in lineas]))
+    raise HTTPException(status_code=415, detail=f"Formato no soportado: {tipo}")
+
+
+def _rechazar(errores: Dict[int, List[dict]]):
+    """Responde 422 con los errores de cada fila (numeradas desde 1); no se crea nada"""
+    if errores:
+        detalle = [{"fila": fila, "errores": errores[fila]} for fila in sorted(errores)[:MAX_ERRORES]]
+        raise HTTPException(
+            status_code=422,
+            detail={"mensaje": "El lote no se importó", "filas_con_error": len(errores), "errores": detalle}
+        )
+
+
+def validar_filas(filas: Sequence[object], modelo: Type[M]) -> List[M]:
+    """Valida todo el lote en una sola pasada de pydantic"""
+    errores: Dict[int, List[dict]] = {}
+    posiciones = []
+    datos = []
+    for fila, dato in enumerate(filas, 1):
+        if dato is _JSON_INVALIDO:
+            errores[fila] = [{"campo": None, "mensaje": "JSON inválido"}]
+        else:
+            posiciones.append(fila)
+            datos.append(dato)
+
+    adaptador = _adaptadores.get(modelo)
+    if adaptador is None:
+        adaptador = _adaptadores[modelo] = TypeAdapter(List[modelo])
+    validas = []
+    try:
+        validas = adaptador.validate_python(datos)
+    except ValidationError as e:
+        for error in e.errors(include_url=False):
+            indice, *campo = error["loc"]
+            errores.setdefault(posiciones[indice], []).append(
+                {"campo": ".".join(map(str, campo)) or None, "mensaje": error["msg"]}
+            )
+    _rechazar(errores)
+    return validas
+
+
+def verificar_referencias(filas: Sequence[BaseModel], campo: str, existe: Callable[[int], object], mensaje: str):
+    """Comprueba cada id referenciado una única vez para todo el lote"""
+    faltantes = {ref for ref in {getattr(fila, campo) for fila in filas} if not existe(ref)}
+    _rechazar({
+        numero: [{"campo": campo, "mensaje": mensaje}]
+        for numero, fila in enumerate(filas, 1) if getattr(fila, campo) in faltantes
+    })
+
+
+def resultado(creados: Sequence) -> ResultadoImportacion:
+    if not creados:
+        return ResultadoImportacion(creados=0)
+    return ResultadoImportacion(creados=len(creados), primer_id=creados[0]["id"], ultimo_id=creados[-1]["id"])
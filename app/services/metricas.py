@@ -0,0 +1,155 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Límites (en segundos) de los buckets de latencia; el último bucket es +Inf
+LIMITES_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _PorHilo:
+    """Un dict de valores por hilo: registrar no toma locks ni compite con otros hilos.
+
+    Solo el primer registro de cada hilo toma el lock para anotar su dict;
+    quien lee suma los de todos los hilos.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._fragmentos: List[dict] = []
+        self._lock = threading.Lock()
+
+    def propio(self) -> dict:
+        try:
+            return self._local.valores
+        except AttributeError:
+            valores = self._local.valores = {}
+            with self._lock:
+                self._fragmentos.append(valores)
+            return valores
+
+    def fragmentos(self) -> List[dict]:
+        with self._lock:
+            fragmentos = list(self._fragmentos)
+        # copy() de un dict es atómico bajo el GIL aunque otro hilo lo esté modificando
+        return [fragmento.copy() for fragmento in fragmentos]
+
+
+def _etiquetas(nombres: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Contador monótono por combinación de etiquetas"""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores = _PorHilo()
+
+    def incrementar(self, *etiquetas: str, cantidad: int = 1):
+        valores = self._valores.propio()
+        valores[etiquetas] = valores.get(etiquetas, 0) + cantidad
+
+    def valores(self) -> Dict[Tuple[str, ...], int]:
+        total: Dict[Tuple[str, ...], int] = {}
+        for fragmento in self._valores.fragmentos():
+            for clave, valor in fragmento.items():
+                total[clave] = total.get(clave, 0) + valor
+        return total
+
+    def exponer(self) -> Iterable[str]:
+        yield f"# HELP {self.nombre} {self.ayuda}"
+        yield f"# TYPE {self.nombre} counter"
+        for clave, valor in sorted(self.valores().items()):
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {valor}"
+
+
+class Histograma:
+    """Histograma con buckets fijos por combinación de etiquetas.
+
+    Cada combinación tiene en cada hilo una lista preasignada con un
+    contador por bucket y la suma al final: observar es una búsqueda
+    binaria y dos sumas.
+    """
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = (),
+                 limites: Tuple[float, ...] = LIMITES_LATENCIA):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.limites = tuple(limites)
+        self._valores = _PorHilo()
+
+    def observar(self, valor: float, *etiquetas: str):
+        valores = self._valores.propio()
+        cubetas = valores.get(etiquetas)
+        if cubetas is None:
+            # Buckets de cada límite, +Inf y la suma
+            cubetas = valores[etiquetas] = [0] * (len(self.limites) + 1) + [0.0]
+        cubetas[bisect_left(self.limites, valor)] += 1
+        cubetas[-1] += valor
+
+    def valores(self) -> Dict[Tuple[str, ...], List[float]]:
+        total: Dict[Tuple[str, ...], List[float]] = {}
+        for fragmento in self._valores.fragmentos():
+            for clave, cubetas in fragmento.items():
+                acumuladas = total.setdefault(clave, [0] * (len(self.limites) + 1) + [0.0])
+                for posicion, valor in enumerate(list(cubetas)):
+                    acumuladas[posicion] += valor
+        return total
+
+    def exponer(self) -> Iterable[str]:
+        yield f"# HELP {self.nombre} {self.ayuda}"
+        yield f"# TYPE {self.nombre} histogram"
+        for clave, cubetas in sorted(self.valores().items()):
+            acumulado = 0
+            for limite, cantidad in zip(self.limites + (float("inf"),), cubetas):
+                acumulado += cantidad
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                etiquetas = _etiquetas(self.etiquetas, clave, f'le="{le}"')
+                yield f"{self.nombre}_bucket{etiquetas} {acumulado}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(cubetas[-1])}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {acumulado}"
+
+
+class Medidor:
+    """Valor instantáneo por etiquetas que se calcula al exponer (tamaños, colas)"""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...],
+                 leer: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.leer = leer
+
+    def exponer(self) -> Iterable[str]:
+        yield f"# HELP {self.nombre} {self.ayuda}"
+        yield f"# TYPE {self.nombre} gauge"
+        for clave, valor in sorted(self.leer().items()):
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+
+
+def exponer(metricas: Iterable) -> str:
+    """Formato de texto de Prometheus (0.0.4)"""
+    return "\n".join(linea for metrica in metricas for linea in metrica.exponer()) + "\n"
+
+
+# Instancias globales que alimentan el middleware y los servicios
+latencia_requests = Histograma(
+    "biblioteca_request_duracion_segundos", "Latencia de los requests HTTP por ruta", ("metodo", "ruta")
+)
+rechazos = Contador(
+    "biblioteca_rechazos_total", "Préstamos y devoluciones rechazados por motivo", ("operacion", "motivo")
+)
@@ -0,0 +1,165 @@
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# Recolector del request que se está perfilando en este contexto (cada task de asyncio tiene el suyo)
+_recolector_actual: contextvars.ContextVar[Optional["Recolector"]] = contextvars.ContextVar(
+    "recolector_perfil", default=None
+)
+
+
+# Frames de este módulo (y las funciones C que llaman): son del perfilador, no del request
+_GLOBALES = globals()
+
+
+def _nombre(frame) -> str:
+    codigo = frame.f_code
+    # co_qualname existe desde Python 3.11
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(codigo, 'co_qualname', codigo.co_name)}"
+
+
+def _nombre_c(funcion) -> str:
+    modulo = getattr(funcion, "__module__", None) or type(getattr(funcion, "__self__", None)).__name__
+    return f"{modulo}:{getattr(funcion, '__qualname__', repr(funcion))}"
+
+
+def _despachar(frame, evento, arg):
+    """Función de sys.setprofile: los eventos de otros requests (u otro código) se ignoran"""
+    recolector = _recolector_actual.get()
+    if recolector is not None:
+        recolector.evento(frame, evento, arg)
+
+
+class Recolector:
+    """Tiempo propio (en ns) de cada pila de llamadas de un request perfilado.
+
+    Lleva una pila por hilo: el handler puede correr en el event loop o
+    en un hilo del pool. Mientras el request espera en un `await` sus
+    frames reciben 'return' y al reanudarse un nuevo 'call', así que el
+    tiempo en que corren otros requests no se le cuenta.
+    """
+
+    def __init__(self):
+        self.pilas: Dict[str, int] = {}
+        self._pilas_por_hilo: Dict[int, list] = {}
+
+    def evento(self, frame, evento: str, arg):
+        if frame.f_globals is _GLOBALES:
+            return
+        ahora = time.perf_counter_ns()
+        pila = self._pilas_por_hilo.setdefault(threading.get_ident(), [])
+        if evento == "call":
+            pila.append([_nombre(frame), ahora, 0])
+        elif evento == "c_call":
+            pila.append([_nombre_c(arg), ahora, 0])
+        elif pila:
+            # return, c_return o c_exception; los de frames anteriores al inicio del perfil no tienen par
+            nombre, inicio, hijos = pila.pop()
+            total = ahora - inicio
+            clave = ";".join([entrada[0] for entrada in pila] + [nombre])
+            self.pilas[clave] = self.pilas.get(clave, 0) + total - hijos
+            if pila:
+                pila[-1][2] += total
+
+    def perfilar_hilo(self, funcion: Callable) -> Callable:
+        """`funcion` perfilada en el hilo donde se ejecute (p. ej. uno del pool)"""
+        def envoltura(*args, **kwargs):
+            anterior = sys.getprofile()
+            sys.setprofile(_despachar)
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                sys.setprofile(anterior)
+        return envoltura
+
+
+class Perfilador:
+    """Perfilado a pedido de una muestra de requests, agregado por ruta.
+
+    Desactivado (BIBLIOTECA_PERFILADO distinto de 1) el middleware solo
+    consulta `activo`. Activado, se perfila una fracción
+    BIBLIOTECA_PERFILADO_MUESTREO de los requests (0 por defecto) y todo
+    request con el encabezado `encabezado`. Las pilas se exportan
+    colapsadas ("a;b;c microsegundos"), el formato de flamegraph.pl y
+    speedscope.
+    """
+
+    def __init__(self, activo: bool, muestreo: float, encabezado: str = "x-perfilar"):
+        self.activo = activo
+        self.muestreo = muestreo
+        self.encabezado = encabezado.lower().encode("latin-1")
+        self._lock = threading.Lock()
+        # sys.setprofile es por hilo: cuántos requests perfilados hay en curso en cada uno
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._por_ruta: Dict[str, dict] = {}
+
+    def elegir(self, scope) -> bool:
+        """Si el request de `scope` se perfila (la decisión de muestreo se toma una vez por request)"""
+        if self.muestreo and random.random() < self.muestreo:
+            return True
+        return any(nombre == self.encabezado for nombre, _ in scope["headers"])
+
+    def iniciar(self) -> contextvars.Token:
+        """Perfila desde aquí el código del request actual en el hilo del event loop"""
+        token = _recolector_actual.set(Recolector())
+        activos = getattr(self._local, "activos", 0)
+        if activos == 0:
+            sys.setprofile(_despachar)
+        self._local.activos = activos + 1
+        return token
+
+    def terminar(self, token: contextvars.Token, ruta: str):
+        recolector = _recolector_actual.get()
+        _recolector_actual.reset(token)
+        self._local.activos -= 1
+        if self._local.activos == 0:
+            sys.setprofile(None)
+        with self._lock:
+            agregado = self._por_ruta.setdefault(ruta, {"requests": 0, "pilas": {}})
+            agregado["requests"] += 1
+            pilas = agregado["pilas"]
+            for pila, ns in recolector.pilas.items():
+                pilas[pila] = pilas.get(pila, 0) + ns
+
+    def en_hilo(self, funcion: Callable) -> Callable:
+        """Para llevar el perfil del request actual a otro hilo; `funcion` tal cual si no se está perfilando"""
+        recolector = _recolector_actual.get()
+        return funcion if recolector is None else recolector.perfilar_hilo(funcion)
+
+    def resumen(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                ruta: {"requests": agregado["requests"], "pilas": len(agregado["pilas"]),
+                       "total_ms": round(sum(agregado["pilas"].values()) / 1e6, 3)}
+                for ruta, agregado in sorted(self._por_ruta.items())
+            }
+
+    def colapsadas(self, ruta: Optional[str] = None) -> str:
+        """Pilas colapsadas en microsegundos; sin `ruta`, todas con la ruta como frame raíz"""
+        with self._lock:
+            rutas = [ruta] if ruta is not None else sorted(self._por_ruta)
+            lineas = []
+            for nombre in rutas:
+                agregado = self._por_ruta.get(nombre)
+                if agregado is None:
+                    continue
+                prefijo = "" if ruta is not None else nombre + ";"
+                for pila, ns in sorted(agregado["pilas"].items()):
+                    if ns >= 1000:
+                        lineas.append(f"{prefijo}{pila} {ns // 1000}")
+        return "".join(linea + "\n" for linea in lineas)
+
+
+# Instancia global: BIBLIOTECA_PERFILADO=1 lo habilita
+perfilador = Perfilador(
+    os.environ.get("BIBLIOTECA_PERFILADO", "0") == "1",
+    float(os.environ.get("BIBLIOTECA_PERFILADO_MUESTREO", "0"))
+)
@@ -0,0 +1,184 @@
+import os
+import pickle
+import threading
+from typing import BinaryIO, List, Optional
+from app.services.database import MemoryDB, CONTADORES
+from app.services.registros import Fila
+
+
+class MemoryDBPersistente(MemoryDB):
+    """MemoryDB con registro de operaciones (WAL) y snapshots en disco.
+
+    Cada cambio se añade al segmento de log activo como un registro pickle
+    (tabla, id, fila) o (tabla, id, None) para las bajas. Un hilo de fondo
+    hace fsync por lotes cada `intervalo_fsync` segundos (0 = fsync en cada
+    escritura) y, cada `snapshot_cada` operaciones, vuelca un snapshot y
+    borra los segmentos que ya cubre.
+
+    `snapshot-N.bin` contiene todo lo escrito en los segmentos `wal-M.log`
+    con M < N. Al arrancar se carga el snapshot más reciente y se reaplican
+    los segmentos posteriores; un registro incompleto al final de un
+    segmento (caída a mitad de escritura) se descarta.
+    """
+
+    def __init__(self, directorio: str, intervalo_fsync: float = 0.05, snapshot_cada: int = 100_000):
+        self.directorio = directorio
+        self.intervalo_fsync = intervalo_fsync
+        self.snapshot_cada = snapshot_cada
+        # Con fsync en cada escritura una operación espera al disco; con fsync
+        # por lotes el lock del log nunca se retiene durante un fsync
+        self.bloqueante = intervalo_fsync <= 0
+        self._log: Optional[BinaryIO] = None
+        self._segmento = 0
+        self._pendientes = 0
+        self._ops_desde_snapshot = 0
+        self._log_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        super().__init__()
+
+        os.makedirs(directorio, exist_ok=True)
+        self._recuperar()
+        self._abrir_segmento(self._segmento + 1)
+
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._mantenimiento, name="memorydb-wal", daemon=True)
+        self._hilo.start()
+
+    def _ruta(self, prefijo: str, numero: int, extension: str) -> str:
+        return os.path.join(self.directorio, f"{prefijo}-{numero:08d}.{extension}")
+
+    def _listar(self, prefijo: str, extension: str) -> List[int]:
+        numeros = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.startswith(prefijo + "-") and nombre.endswith("." + extension):
+                numeros.append(int(nombre[len(prefijo) + 1:-len(extension) - 1]))
+        return sorted(numeros)
+
+    # Recuperación
+    def _recuperar(self):
+        snapshots = self._listar("snapshot", "bin")
+        base = snapshots[-1] if snapshots else 0
+        if snapshots:
+            with open(self._ruta("snapshot", base, "bin"), "rb") as f:
+                estado = pickle.load(f)
+            for tabla, filas in estado["tablas"].items():
+                setattr(self, tabla, filas)
+            for tabla, valor in estado["contadores"].items():
+                setattr(self, CONTADORES[tabla], valor)
+
+        segmentos = [n for n in self._listar("wal", "log") if n >= base]
+        for numero in segmentos:
+            self._reaplicar(self._ruta("wal", numero, "log"))
+
+        self._reconstruir_indices()
+        self._segmento = max(segmentos[-1] if segmentos else 0, base)
+
+    def _reaplicar(self, ruta: str):
+        with open(ruta, "rb") as f:
+            while True:
+                try:
+                    tabla, registro_id, registro = pickle.load(f)
+                except (EOFError, pickle.UnpicklingError):
+                    return
+                filas = getattr(self, tabla)
+                if registro is None:
+                    filas.pop(registro_id, None)
+                else:
+                    filas[registro_id] = registro
+                    contador = CONTADORES[tabla]
+                    setattr(self, contador, max(getattr(self, contador), registro_id + 1))
+
+    # Escritura del log
+    def _abrir_segmento(self, numero: int):
+        self._segmento = numero
+        self._log = self._archivo_segmento(numero)
+
+    def _archivo_segmento(self, numero: int) -> BinaryIO:
+        return open(self._ruta("wal", numero, "log"), "ab", buffering=1 << 20)
+
+    def _escribir(self, tabla: str, registro_id: int, registro: Optional[Fila]):
+        with self._log_lock:
+            # Se serializa con el lock tomado para que el log respete el orden de las escrituras
+            self._log.write(pickle.dumps((tabla, registro_id, registro), protocol=pickle.HIGHEST_PROTOCOL))
+            self._ops_desde_snapshot += 1
+            if self.intervalo_fsync <= 0:
+                self._log.flush()
+                os.fsync(self._log.fileno())
+            else:
+                self._pendientes += 1
+
+    def _registrar_cambio(self, tabla: str, registro: Fila):
+        if self._log is not None:
+            self._escribir(tabla, registro["id"], registro)
+
+    def _registrar_borrado(self, tabla: str, registro_id: int):
+        if self._log is not None:
+            self._escribir(tabla, registro_id, None)
+
+    def sincronizar(self):
+        """Fuerza a disco todo lo escrito en el log"""
+        with self._log_lock:
+            log = self._log
+            self._pendientes = 0
+        try:
+            # Fuera del lock: el buffer del archivo tiene su propio lock y no corta registros
+            log.flush()
+            os.fsync(log.fileno())
+        except (OSError, ValueError):
+            # El segmento se rotó (y sincronizó) mientras tanto
+            pass
+
+    def _mantenimiento(self):
+        while not self._detener.wait(self.intervalo_fsync or 0.05):
+            if self._pendientes:
+                self.sincronizar()
+            if self._ops_desde_snapshot >= self.snapshot_cada:
+                self.crear_snapshot()
+
+    # Snapshots
+    def crear_snapshot(self):
+        """Vuelca el estado completo y descarta los segmentos que cubre"""
+        with self._snapshot_lock:
+            # Solo crear_snapshot rota segmentos: el número siguiente se conoce sin el lock del log
+            numero = self._segmento + 1
+            nuevo = self._archivo_segmento(numero)
+            with self._log_lock:
+                # Con el log bloqueado ninguna escritura queda a medio registrar
+                anterior, self._log, self._segmento = self._log, nuevo, numero
+                self._pendientes = 0
+                self._ops_desde_snapshot = 0
+            anterior.flush()
+            os.fsync(anterior.fileno())
+            anterior.close()
+
+            # Las copias se toman después de rotar: lo que cambie mientras tanto
+            # también queda en el segmento nuevo y se reaplica sobre el snapshot
+            tablas = {tabla: getattr(self, tabla).copy() for tabla in CONTADORES}
+            contadores = {tabla: getattr(self, attr) for tabla, attr in CONTADORES.items()}
+
+            ruta = self._ruta("snapshot", numero, "bin")
+            with open(ruta + ".tmp", "wb") as f:
+                pickle.dump({"tablas": tablas, "contadores": contadores}, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(ruta + ".tmp", ruta)
+
+            for viejo in self._listar("snapshot", "bin"):
+                if viejo < numero:
+                    os.remove(self._ruta("snapshot", viejo, "bin"))
+            for viejo in self._listar("wal", "log"):
+                if viejo < numero:
+                    os.remove(self._ruta("wal", viejo, "log"))
+
+    def reset(self):
+        super().reset()
+        if self._log is not None:
+            self.crear_snapshot()
+
+    def close(self):
+        self._detener.set()
+        self._hilo.join()
+        with self._log_lock:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._log.close()
@@ -1,92 +1,236 @@
 from datetime import datetime
+from typing import Dict, List
 from fastapi import HTTPException
 from app.services.database import db
-from app.services.bioalert import bioalert
 from app.models.schemas import EstadoCopia
+from app.services.concurrencia import locks_lectores, locks_copias
+from app.services.metricas import rechazos
+from app.services.vencimientos import planificador
+from app.services.reservas import reservas, avisar_reservas, notificar_disponibles
+
+
+MAXIMO_PRESTAMOS = 3
 
 
 def realizar_prestamo(lector_id: int, copia_id: int):
     """Realiza un préstamo verificando todas las condiciones"""
+    return realizar_prestamos(lector_id, [copia_id])[0]
+
+
+def realizar_prestamos(lector_id: int, copia_ids: List[int]):
+    """Presta varias copias a un lector: se prestan todas o ninguna.
+
+    La sanción y el límite de libros se evalúan una sola vez para el lote.
+    """
+    if len(set(copia_ids)) != len(copia_ids):
+        raise _rechazo("prestamo", "copias_repetidas", 400, "Hay copias repetidas en la solicitud")
+
+    # Las copias que el lector tiene apartadas de esos libros se bloquean junto
+    # con las pedidas: si se lleva otra, la apartada pasa al siguiente sin
+    # quedar un momento RESERVADA y sin titular fuera de los locks
+    libros = {copia["libro_id"] for copia in map(db.get_copia, copia_ids) if copia}
+    bloqueadas = set(reservas.apartadas(lector_id, libros)) - set(copia_ids)
+
+    # Verificaciones y alta bajo los locks del lector y de las copias: dos
+    # préstamos simultáneos no pueden ver la misma copia libre ni el mismo
+    # cupo de 3 libros. Todo se verifica antes de escribir nada
+    with locks_lectores.bloquear(lector_id), locks_copias.bloquear(*copia_ids, *bloqueadas):
+        # Verificar que el lector existe
+        lector = db.get_lector(lector_id)
+        if not lector:
+            raise _rechazo("prestamo", "lector_inexistente", 404, "Lector no encontrado")
+
+        # Verificar que el lector no está sancionado (los días se calculan
+        # ahora a partir del fin de la sanción: las cumplidas ya no cuentan)
+        dias_sancion = lector["dias_sancion"]
+        if dias_sancion > 0:
+            raise _rechazo(
+                "prestamo", "sancionado", 400,
+                f"Lector tiene {dias_sancion} días de sanción. No puede pedir libros."
+            )
+
+        # Verificar que no supera los 3 libros
+        activos = len(db.get_prestamos_activos_by_lector(lector_id))
+        if activos >= MAXIMO_PRESTAMOS:
+            raise _rechazo(
+                "prestamo", "limite_prestamos", 400,
+                "El lector ya tiene 3 libros en préstamo. Máximo permitido alcanzado."
+            )
+        if activos + len(copia_ids) > MAXIMO_PRESTAMOS:
+            raise _rechazo(
+                "prestamo", "limite_prestamos", 400,
+                f"El lector tiene {activos} libros en préstamo y solo puede pedir "
+                f"{MAXIMO_PRESTAMOS - activos} más."
+            )
+
+        # En un lote el mensaje indica qué copia falló
+        sufijo = "" if len(copia_ids) == 1 else " (copia {})"
+        copias = []
+        for copia_id in copia_ids:
+            # Verificar que la copia existe
+            copia = db.get_copia(copia_id)
+            if not copia:
+                raise _rechazo("prestamo", "copia_inexistente", 404, "Copia no encontrada" + sufijo.format(copia_id))
+            copias.append(copia)
+
+            # Verificar que la copia está disponible (o reservada para este lector)
+            apartada = copia["estado"] == EstadoCopia.RESERVADA and reservas.titular(copia_id) == lector_id
+            if copia["estado"] != EstadoCopia.EN_BIBLIOTECA and not apartada:
+                raise _rechazo(
+                    "prestamo", "copia_no_disponible", 400,
+                    f"La copia no está disponible. Estado actual: {copia['estado']}" + sufijo.format(copia_id)
+                )
+
+        prestamos = []
+        # Copias que el lector tenía apartadas y ya no necesita (se llevó otra
+        # del mismo libro) pero que se le apartaron después de tomar los locks
+        sobrantes = []
+        asignaciones, disponibles = [], []
+        for copia in copias:
+            # Crear préstamo y actualizar estado de la copia
+            prestamos.append(db.create_prestamo(lector_id, copia["id"]))
+            db.update_estado_copia(copia["id"], EstadoCopia.PRESTADA)
+            apartada = reservas.prestada(copia["id"], lector_id, copia["libro_id"])
+            if apartada in bloqueadas:
+                asignadas, libres = reservas.soltar_bloqueada(apartada, copia["libro_id"])
+                asignaciones += asignadas
+                disponibles += libres
+            elif apartada is not None:
+                sobrantes.append((apartada, copia["libro_id"]))
+
+    avisar_reservas(asignaciones)
+    notificar_disponibles(disponibles)
+    # Fuera de los locks: soltar toma el de cada copia sobrante
+    for copia_id, libro_id in sobrantes:
+        reservas.soltar(copia_id, libro_id)
+    for prestamo in prestamos:
+        planificador.programar(prestamo)
+    return prestamos
 
-    # Verificar que el lector existe
-    lector = db.get_lector(lector_id)
-    if not lector:
-        raise HTTPException(status_code=404, detail="Lector no encontrado")
 
-    # Verificar que el lector no está sancionado
-    if lector["dias_sancion"] > 0:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Lector tiene {lector['dias_sancion']} días de sanción. No puede pedir libros."
-        )
+def devolver_libro(prestamo_id: int):
+    """Devuelve un libro y calcula multas si hay retraso"""
 
-    # Verificar que no tiene más de 3 libros
-    prestamos_activos = db.get_prestamos_activos_by_lector(lector_id)
-    if len(prestamos_activos) >= 3:
-        raise HTTPException(
-            status_code=400,
-            detail="El lector ya tiene 3 libros en préstamo. Máximo permitido alcanzado."
-        )
+    prestamo = db.get_prestamo(prestamo_id)
+    if not prestamo:
+        raise _rechazo("devolucion", "prestamo_inexistente", 404, "Préstamo no encontrado")
 
-    # Verificar que la copia existe
-    copia = db.get_copia(copia_id)
-    if not copia:
-        raise HTTPException(status_code=404, detail="Copia no encontrada")
+    # lector_id y copia_id no cambian: bastan para tomar los locks. El resto
+    # se vuelve a leer con los locks tomados para no devolver dos veces
+    with locks_lectores.bloquear(prestamo["lector_id"]), locks_copias.bloquear(prestamo["copia_id"]):
+        prestamo = db.get_prestamo(prestamo_id)
+        if prestamo["fecha_devolucion_real"] is not None:
+            raise _rechazo("devolucion", "ya_devuelto", 400, "El libro ya fue devuelto")
 
-    # Verificar que la copia está disponible
-    if copia["estado"] != EstadoCopia.EN_BIBLIOTECA:
-        raise HTTPException(
-            status_code=400,
-            detail=f"La copia no está disponible. Estado actual: {copia['estado']}"
-        )
+        # Actualizar préstamo
+        prestamo = db.devolver_prestamo(prestamo_id)
 
-    # Crear préstamo
-    prestamo = db.create_prestamo(lector_id, copia_id)
+        # La copia queda apartada para el primero en espera o vuelve al estante
+        libro_id = db.get_copia(prestamo["copia_id"])["libro_id"]
+        asignacion = reservas.reingresar(prestamo["copia_id"], libro_id)
 
-    # Actualizar estado de la copia
-    db.update_estado_copia(copia_id, EstadoCopia.PRESTADA)
+        # Calcular multa si hay retraso
+        dias_retraso = _dias_retraso(prestamo)
+        if dias_retraso > 0:
+            db.update_sancion_lector(prestamo["lector_id"], dias_retraso * 2)
 
-    return prestamo
+    # Avisar al lector con la reserva o a los suscriptores que el libro está disponible
+    if asignacion is not None:
+        avisar_reservas([asignacion])
+    else:
+        notificar_disponibles([libro_id])
 
+    return {
+        "prestamo": prestamo,
+        "dias_retraso": dias_retraso,
+        "sancion_aplicada": dias_retraso * 2 if dias_retraso > 0 else 0
+    }
 
-def devolver_libro(prestamo_id: int):
-    """Devuelve un libro y calcula multas si hay retraso"""
 
-    prestamo = db.get_prestamo(prestamo_id)
-    if not prestamo:
-        raise HTTPException(status_code=404, detail="Préstamo no encontrado")
+def devolver_libros(prestamo_ids: List[int]):
+    """Devuelve varios préstamos en una pasada (p. ej. el buzón de devoluciones).
+
+    Cada préstamo se informa por separado: uno inexistente o ya devuelto no
+    impide devolver el resto. Las sanciones se suman por lector y se aplican
+    en una sola actualización, y cada suscriptor recibe un único aviso por
+    libro aunque hayan vuelto varias copias (las que atienden reservas no
+    cuentan como disponibles).
+    """
+    prestamo_ids = list(dict.fromkeys(prestamo_ids))
+    resultados = {}
+    encontrados = {}
+    for prestamo_id in prestamo_ids:
+        prestamo = db.get_prestamo(prestamo_id)
+        if prestamo is None:
+            resultados[prestamo_id] = _fallida(prestamo_id, "prestamo_inexistente", "Préstamo no encontrado")
+        else:
+            encontrados[prestamo_id] = prestamo
+
+    # Se toman de una vez los locks de todos los lectores y copias del lote
+    # (en el orden de siempre) para que la sanción acumulada se aplique
+    # antes de que el lector pueda volver a pedir libros
+    lectores = {p["lector_id"] for p in encontrados.values()}
+    copias = {p["copia_id"] for p in encontrados.values()}
+    sanciones: Dict[int, int] = {}
+    asignaciones = []
+    disponibles = {}
+    with locks_lectores.bloquear(*lectores), locks_copias.bloquear(*copias):
+        for prestamo_id in encontrados:
+            if db.get_prestamo(prestamo_id)["fecha_devolucion_real"] is not None:
+                resultados[prestamo_id] = _fallida(prestamo_id, "ya_devuelto", "El libro ya fue devuelto")
+                continue
+            prestamo = db.devolver_prestamo(prestamo_id)
+            libro_id = db.get_copia(prestamo["copia_id"])["libro_id"]
+            asignacion = reservas.reingresar(prestamo["copia_id"], libro_id)
+            if asignacion is not None:
+                asignaciones.append(asignacion)
+            else:
+                disponibles[libro_id] = None
+
+            dias_retraso = _dias_retraso(prestamo)
+            if dias_retraso > 0:
+                sanciones[prestamo["lector_id"]] = sanciones.get(prestamo["lector_id"], 0) + dias_retraso * 2
+            resultados[prestamo_id] = {
+                "prestamo_id": prestamo_id,
+                "devuelto": True,
+                "error": None,
+                "prestamo": prestamo,
+                "dias_retraso": dias_retraso,
+                "sancion_aplicada": dias_retraso * 2
+            }
+
+        for lector_id, dias in sanciones.items():
+            db.update_sancion_lector(lector_id, dias)
+
+    avisar_reservas(asignaciones)
+    notificar_disponibles(disponibles)
 
-    if prestamo["fecha_devolucion_real"] is not None:
-        raise HTTPException(status_code=400, detail="El libro ya fue devuelto")
+    return {
+        "resultados": [resultados[prestamo_id] for prestamo_id in prestamo_ids],
+        "sanciones": [{"lector_id": lector_id, "dias": dias} for lector_id, dias in sanciones.items()],
+        "libros_notificados": len(disponibles)
+    }
 
-    # Actualizar préstamo
-    prestamo = db.devolver_prestamo(prestamo_id)
 
-    # Cambiar estado de la copia
-    db.update_estado_copia(prestamo["copia_id"], EstadoCopia.EN_BIBLIOTECA)
+def _rechazo(operacion: str, motivo: str, status_code: int, detail: str) -> HTTPException:
+    """HTTPException de un préstamo o devolución rechazados, contada en /metrics por motivo"""
+    rechazos.incrementar(operacion, motivo)
+    return HTTPException(status_code=status_code, detail=detail)
 
-    # Calcular multa si hay retraso
-    dias_retraso = 0
-    if prestamo["fecha_devolucion_real"] > prestamo["fecha_devolucion_esperada"]:
-        dias_retraso = (prestamo["fecha_devolucion_real"] - prestamo["fecha_devolucion_esperada"]).days
-        dias_sancion = dias_retraso * 2
-        db.update_sancion_lector(prestamo["lector_id"], dias_sancion)
-
-    # Notificar a suscriptores que el libro está disponible
-    copia = db.get_copia(prestamo["copia_id"])
-    libro = db.get_libro(copia["libro_id"])
-    suscripciones = db.get_suscripciones_by_libro(libro["id"])
-
-    for suscripcion in suscripciones:
-        lector = db.get_lector(suscripcion["lector_id"])
-        bioalert.notificar(
-            lector["email"],
-            libro["nombre"],
-            f"El libro '{libro['nombre']}' está ahora disponible."
-        )
 
+def _fallida(prestamo_id: int, motivo: str, error: str) -> dict:
+    rechazos.incrementar("devolucion", motivo)
     return {
-        "prestamo": prestamo,
-        "dias_retraso": dias_retraso,
-        "sancion_aplicada": dias_retraso * 2 if dias_retraso > 0 else 0
+        "prestamo_id": prestamo_id,
+        "devuelto": False,
+        "error": error,
+        "prestamo": None,
+        "dias_retraso": 0,
+        "sancion_aplicada": 0
     }
+
+
+def _dias_retraso(prestamo) -> int:
+    if prestamo["fecha_devolucion_real"] > prestamo["fecha_devolucion_esperada"]:
+        return (prestamo["fecha_devolucion_real"] - prestamo["fecha_devolucion_esperada"]).days
+    return 0
@@ -0,0 +1,218 @@
+import math
+from datetime import date, datetime, timedelta
+from typing import Optional
+from app.models.schemas import EstadoCopia
+
+PLAZO_PRESTAMO = timedelta(days=30)
+
+# Código de un byte de cada EstadoCopia en ColumnaEstados
+ESTADOS = tuple(EstadoCopia)
+CODIGOS = {estado: codigo for codigo, estado in enumerate(ESTADOS)}
+
+
+class Fila:
+    """Fila compacta con __slots__ en lugar de un dict por registro.
+
+    Conserva la interfaz de dict que usan servicios y routers
+    (`fila["campo"]`, `{**fila}`, `dict(fila)`) y expone los campos como
+    atributos para los esquemas con `from_attributes=True`.
+    """
+    __slots__ = ()
+    _campos: tuple = ()
+
+    def __getitem__(self, campo: str):
+        if campo not in self._campos:
+            raise KeyError(campo)
+        return getattr(self, campo)
+
+    def __setitem__(self, campo: str, valor):
+        if campo not in self._campos:
+            raise KeyError(campo)
+        setattr(self, campo, valor)
+
+    def get(self, campo: str, default=None):
+        return getattr(self, campo) if campo in self._campos else default
+
+    def keys(self):
+        return self._campos
+
+    def values(self):
+        return [getattr(self, campo) for campo in self._campos]
+
+    def items(self):
+        return [(campo, getattr(self, campo)) for campo in self._campos]
+
+    def __iter__(self):
+        return iter(self._campos)
+
+    def __len__(self):
+        return len(self._campos)
+
+    def __contains__(self, campo):
+        return campo in self._campos
+
+    def __eq__(self, otro):
+        if isinstance(otro, (Fila, dict)):
+            return dict(self.items()) == dict(otro.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+class FilaAutor(Fila):
+    __slots__ = _campos = ("id", "nombre", "fecha_nacimiento")
+
+    def __init__(self, id: int, nombre: str, fecha_nacimiento: date):
+        self.id = id
+        self.nombre = nombre
+        self.fecha_nacimiento = fecha_nacimiento
+
+
+class FilaLibro(Fila):
+    __slots__ = _campos = ("id", "nombre", "anio", "autor_id")
+
+    def __init__(self, id: int, nombre: str, anio: int, autor_id: int):
+        self.id = id
+        self.nombre = nombre
+        self.anio = anio
+        self.autor_id = autor_id
+
+
+class ColumnaEstados:
+    """Estado de todas las copias de una base: un byte por copia, indexado por id"""
+
+    def __init__(self):
+        self._codigos = bytearray()
+
+    def codigo(self, copia_id: int) -> int:
+        return self._codigos[copia_id]
+
+    def obtener(self, copia_id: int) -> EstadoCopia:
+        return ESTADOS[self._codigos[copia_id]]
+
+    def asignar(self, copia_id: int, estado: EstadoCopia):
+        faltan = copia_id + 1 - len(self._codigos)
+        if faltan > 0:
+            self._codigos.extend(bytes(faltan))
+        self._codigos[copia_id] = CODIGOS[estado]
+
+
+class _EstadoSuelto:
+    """Estado de una copia que aún no pertenece a ninguna base (p. ej. al leer un snapshot)"""
+    __slots__ = ("estado",)
+
+    def obtener(self, copia_id: int) -> EstadoCopia:
+        return self.estado
+
+    def asignar(self, copia_id: int, estado: EstadoCopia):
+        self.estado = EstadoCopia(estado)
+
+
+class FilaCopia(Fila):
+    """El estado vive en la ColumnaEstados de la base y solo cambia vía update_estado_copia"""
+    __slots__ = ("id", "libro_id", "_columna")
+    _campos = ("id", "libro_id", "estado")
+
+    def __init__(self, id: int, libro_id: int, estado: EstadoCopia = EstadoCopia.EN_BIBLIOTECA,
+                 columna: Optional[ColumnaEstados] = None):
+        self.id = id
+        self.libro_id = libro_id
+        self._columna = columna if columna is not None else _EstadoSuelto()
+        self._columna.asignar(id, estado)
+
+    @property
+    def estado(self) -> EstadoCopia:
+        return self._columna.obtener(self.id)
+
+    def adjuntar(self, columna: ColumnaEstados):
+        """Mueve el estado de la copia a la columna de una base"""
+        columna.asignar(self.id, self.estado)
+        self._columna = columna
+
+    def __reduce__(self):
+        return FilaCopia, (self.id, self.libro_id, self.estado)
+
+
+def dias_restantes(sancionado_hasta: Optional[datetime], ahora: Optional[datetime] = None) -> int:
+    """Días de sanción que faltan cumplir; un día empezado cuenta entero"""
+    if sancionado_hasta is None:
+        return 0
+    segundos = (sancionado_hasta - (ahora or datetime.now())).total_seconds()
+    return max(0, math.ceil(segundos / 86400))
+
+
+def extender_sancion(sancionado_hasta: Optional[datetime], dias: int) -> datetime:
+    """Suma `dias` a la sanción vigente, o los cuenta desde ahora si no hay ninguna"""
+    ahora = datetime.now()
+    return max(sancionado_hasta or ahora, ahora) + timedelta(days=dias)
+
+
+def reducir_sancion(sancionado_hasta: Optional[datetime], dias: int) -> Optional[datetime]:
+    """Adelanta el fin de la sanción; None si con eso ya terminó"""
+    if sancionado_hasta is None:
+        return None
+    hasta = sancionado_hasta - timedelta(days=dias)
+    return hasta if hasta > datetime.now() else None
+
+
+class FilaLector(Fila):
+    """La sanción se guarda como fecha de fin; `dias_sancion` se calcula al leer"""
+    __slots__ = ("id", "nombre", "email", "sancionado_hasta")
+    _campos = ("id", "nombre", "email", "dias_sancion", "sancionado_hasta")
+
+    def __init__(self, id: int, nombre: str, email: str, sancionado_hasta: Optional[datetime] = None):
+        self.id = id
+        self.nombre = nombre
+        self.email = email
+        self.sancionado_hasta = sancionado_hasta
+
+    @property
+    def dias_sancion(self) -> int:
+        return dias_restantes(self.sancionado_hasta)
+
+
+class FilaPrestamo(Fila):
+    """La fecha esperada solo se guarda si difiere de fecha_prestamo + PLAZO_PRESTAMO"""
+    __slots__ = ("id", "lector_id", "copia_id", "fecha_prestamo", "_esperada", "fecha_devolucion_real")
+    _campos = ("id", "lector_id", "copia_id", "fecha_prestamo",
+               "fecha_devolucion_esperada", "fecha_devolucion_real")
+
+    def __init__(self, id: int, lector_id: int, copia_id: int, fecha_prestamo: datetime,
+                 fecha_devolucion_esperada: Optional[datetime] = None,
+                 fecha_devolucion_real: Optional[datetime] = None):
+        self.id = id
+        self.lector_id = lector_id
+        self.copia_id = copia_id
+        self.fecha_prestamo = fecha_prestamo
+        self.fecha_devolucion_esperada = fecha_devolucion_esperada
+        self.fecha_devolucion_real = fecha_devolucion_real
+
+    @property
+    def fecha_devolucion_esperada(self) -> datetime:
+        if self._esperada is None:
+            return self.fecha_prestamo + PLAZO_PRESTAMO
+        return self._esperada
+
+    @fecha_devolucion_esperada.setter
+    def fecha_devolucion_esperada(self, fecha: Optional[datetime]):
+        if fecha == self.fecha_prestamo + PLAZO_PRESTAMO:
+            fecha = None
+        self._esperada = fecha
+
+
+class FilaSuscripcion(Fila):
+    """Con `una_vez` la suscripción se elimina tras el primer aviso de disponibilidad"""
+    __slots__ = _campos = ("id", "lector_id", "libro_id", "fecha_suscripcion", "una_vez")
+
+    def __init__(self, id: int, lector_id: int, libro_id: int, fecha_suscripcion: datetime, una_vez: bool = False):
+        self.id = id
+        self.lector_id = lector_id
+        self.libro_id = libro_id
+        self.fecha_suscripcion = fecha_suscripcion
+        self.una_vez = una_vez
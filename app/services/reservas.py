@@ -0,0 +1,270 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from fastapi import HTTPException
+from app.models.schemas import EstadoCopia, EstadoReserva
+from app.services.database import db
+from app.services.bioalert import bioalert, Envio
+from app.services.concurrencia import locks_copias
+from app.services.temporizador import Temporizador
+
+# (lector_id, libro_id, copia_id, fecha_limite) de una copia recién apartada
+Asignacion = Tuple[int, int, int, datetime]
+
+
+class ColaReservas(Temporizador):
+    """Lista de espera FIFO por libro.
+
+    Si alguien espera el libro, la copia devuelta no vuelve al estante: pasa
+    a RESERVADA para el primero de la cola, que tiene `plazo_retiro` para
+    pedirla. Si no lo hace, la reserva vence y la copia pasa al siguiente.
+
+    Cada cola es un OrderedDict (alta, salida del primero y cancelación en
+    O(1)) y los plazos de retiro esperan en el heap del Temporizador. Las
+    colas viven en memoria; el estado de las copias lo guarda la base.
+    Orden de locks: lectores, copias y al final el lock interno.
+    """
+
+    def __init__(self, plazo_retiro: timedelta):
+        super().__init__("reservas")
+        self.plazo_retiro = plazo_retiro
+        self._lock = threading.Lock()
+        self._vaciar()
+
+    def _vaciar(self):
+        # libro_id -> lectores en espera, en orden de llegada
+        self._colas: Dict[int, OrderedDict] = {}
+        # copia_id -> (lector_id, libro_id, fecha_limite)
+        self._asignadas: Dict[int, Tuple[int, int, datetime]] = {}
+        # libro_id -> {lector_id: copia_id} de las reservas listas
+        self._listas: Dict[int, Dict[int, int]] = {}
+
+    def reservar(self, lector_id: int, libro_id: int) -> dict:
+        """Pone al lector al final de la cola; si hay una copia en la biblioteca se aparta en el acto"""
+        if not db.get_lector(lector_id):
+            raise HTTPException(status_code=404, detail="Lector no encontrado")
+        if not db.get_libro(libro_id):
+            raise HTTPException(status_code=404, detail="Libro no encontrado")
+
+        with self._lock:
+            if lector_id in self._listas.get(libro_id, {}) or lector_id in self._colas.get(libro_id, {}):
+                raise HTTPException(status_code=409, detail="El lector ya tiene una reserva de este libro")
+            self._colas.setdefault(libro_id, OrderedDict())[lector_id] = None
+
+        avisar_reservas(self._apartar_disponibles(libro_id))
+        return self.consultar(lector_id, libro_id)
+
+    def _apartar_disponibles(self, libro_id: int) -> List[Asignacion]:
+        if db.get_disponibilidad_libro(libro_id)[EstadoCopia.EN_BIBLIOTECA] == 0:
+            return []
+        asignaciones = []
+        for copia in db.get_copias_by_libro(libro_id):
+            if copia["estado"] != EstadoCopia.EN_BIBLIOTECA:
+                continue
+            with locks_copias.bloquear(copia["id"]):
+                if db.get_copia(copia["id"])["estado"] != EstadoCopia.EN_BIBLIOTECA:
+                    continue
+                asignacion = self._apartar(copia["id"], libro_id)
+            if asignacion is None:
+                break
+            asignaciones.append(asignacion)
+        return asignaciones
+
+    def _apartar(self, copia_id: int, libro_id: int) -> Optional[Asignacion]:
+        """Reserva la copia para el primero de la cola (con el lock de la copia tomado)"""
+        with self._lock:
+            cola = self._colas.get(libro_id)
+            if not cola:
+                return None
+            lector_id, _ = cola.popitem(last=False)
+            if not cola:
+                del self._colas[libro_id]
+            fecha_limite = datetime.now() + self.plazo_retiro
+            self._asignadas[copia_id] = (lector_id, libro_id, fecha_limite)
+            self._listas.setdefault(libro_id, {})[lector_id] = copia_id
+        db.update_estado_copia(copia_id, EstadoCopia.RESERVADA)
+        self.agendar(fecha_limite, copia_id)
+        return lector_id, libro_id, copia_id, fecha_limite
+
+    def reingresar(self, copia_id: int, libro_id: int) -> Optional[Asignacion]:
+        """Destino de una copia devuelta (con su lock tomado): la reserva del primero en espera o el estante"""
+        asignacion = self._apartar(copia_id, libro_id)
+        if asignacion is None:
+            db.update_estado_copia(copia_id, EstadoCopia.EN_BIBLIOTECA)
+        return asignacion
+
+    def titular(self, copia_id: int) -> Optional[int]:
+        """Lector para quien está apartada la copia"""
+        with self._lock:
+            asignada = self._asignadas.get(copia_id)
+        return asignada[0] if asignada else None
+
+    def apartadas(self, lector_id: int, libro_ids: Iterable[int]) -> List[int]:
+        """Copias que el lector tiene apartadas de esos libros"""
+        with self._lock:
+            listas = [self._listas.get(libro_id, {}).get(lector_id) for libro_id in libro_ids]
+        return [copia_id for copia_id in listas if copia_id is not None]
+
+    def prestada(self, copia_id: int, lector_id: int, libro_id: int) -> Optional[int]:
+        """El lector se llevó una copia del libro: su reserva (lista o en espera) queda cumplida.
+
+        Si tenía apartada otra copia del libro, la reserva se retira y se
+        devuelve esa copia: sigue RESERVADA, sin titular, hasta que quien
+        llama la pase a `soltar_bloqueada` (si ya tiene su lock) o a `soltar`.
+        """
+        with self._lock:
+            self._salir_de_cola(lector_id, libro_id)
+            apartada = self._listas.get(libro_id, {}).get(lector_id)
+            if apartada is None:
+                return None
+            self._olvidar(apartada)
+        return None if apartada == copia_id else apartada
+
+    def soltar(self, copia_id: int, libro_id: int):
+        """Pasa al siguiente en espera, o al estante, una copia que `prestada` dejó sin titular"""
+        with locks_copias.bloquear(copia_id):
+            asignaciones, disponibles = self.soltar_bloqueada(copia_id, libro_id)
+        avisar_reservas(asignaciones)
+        notificar_disponibles(disponibles)
+
+    def soltar_bloqueada(self, copia_id: int, libro_id: int) -> Tuple[List[Asignacion], List[int]]:
+        """Como `soltar`, con el lock de la copia ya tomado: devuelve a quién avisar al soltar los locks"""
+        if db.get_copia(copia_id)["estado"] != EstadoCopia.RESERVADA or self.titular(copia_id) is not None:
+            return [], []
+        asignacion = self.reingresar(copia_id, libro_id)
+        return ([asignacion], []) if asignacion is not None else ([], [libro_id])
+
+    def cancelar(self, lector_id: int, libro_id: int) -> bool:
+        """Quita al lector de la cola o libera la copia que tenía apartada"""
+        with self._lock:
+            if self._salir_de_cola(lector_id, libro_id):
+                return True
+            copia_id = self._listas.get(libro_id, {}).get(lector_id)
+        if copia_id is None:
+            return False
+        return self._liberar(copia_id, lambda asignada: asignada[0] == lector_id)
+
+    def _vencer(self, copia_id: int, fecha: datetime) -> int:
+        # Solo si la copia sigue apartada con este mismo plazo (no se retiró ni se reasignó)
+        return int(self._liberar(copia_id, lambda asignada: asignada[2] == fecha))
+
+    def _liberar(self, copia_id: int, vigente: Callable[[tuple], bool]) -> bool:
+        """Retira la reserva de la copia y la pasa al siguiente en espera o al estante"""
+        with locks_copias.bloquear(copia_id):
+            with self._lock:
+                asignada = self._asignadas.get(copia_id)
+                if asignada is None or not vigente(asignada):
+                    return False
+                libro_id = self._olvidar(copia_id)
+            if db.get_copia(copia_id)["estado"] != EstadoCopia.RESERVADA:
+                # Alguien cambió el estado a mano: la copia ya no es de la cola
+                return True
+            asignacion = self.reingresar(copia_id, libro_id)
+
+        if asignacion is not None:
+            avisar_reservas([asignacion])
+        else:
+            notificar_disponibles([libro_id])
+        return True
+
+    def _salir_de_cola(self, lector_id: int, libro_id: int) -> bool:
+        cola = self._colas.get(libro_id)
+        if cola is None or lector_id not in cola:
+            return False
+        del cola[lector_id]
+        if not cola:
+            del self._colas[libro_id]
+        return True
+
+    def _olvidar(self, copia_id: int) -> int:
+        lector_id, libro_id, _ = self._asignadas.pop(copia_id)
+        listas = self._listas[libro_id]
+        del listas[lector_id]
+        if not listas:
+            del self._listas[libro_id]
+        return libro_id
+
+    def consultar(self, lector_id: int, libro_id: int) -> Optional[dict]:
+        with self._lock:
+            copia_id = self._listas.get(libro_id, {}).get(lector_id)
+            if copia_id is not None:
+                return _reserva(lector_id, libro_id, copia_id, self._asignadas[copia_id][2])
+            if lector_id in self._colas.get(libro_id, {}):
+                return _reserva(lector_id, libro_id)
+        return None
+
+    def get_reservas_by_libro(self, libro_id: int) -> List[dict]:
+        """Reservas listas y después la cola en orden de llegada"""
+        with self._lock:
+            listas = [
+                _reserva(lector_id, libro_id, copia_id, self._asignadas[copia_id][2])
+                for lector_id, copia_id in self._listas.get(libro_id, {}).items()
+            ]
+            return listas + [_reserva(lector_id, libro_id) for lector_id in self._colas.get(libro_id, {})]
+
+    def liberar_huerfanas(self):
+        """Devuelve al estante las copias RESERVADA sin reserva en memoria (al arrancar)"""
+        for copia in db.get_all_copias():
+            if copia["estado"] == EstadoCopia.RESERVADA and self.titular(copia["id"]) is None:
+                with locks_copias.bloquear(copia["id"]):
+                    if db.get_copia(copia["id"])["estado"] == EstadoCopia.RESERVADA:
+                        db.update_estado_copia(copia["id"], EstadoCopia.EN_BIBLIOTECA)
+
+    def reset(self):
+        """Olvida colas, reservas listas y plazos agendados"""
+        super().reset()
+        with self._lock:
+            self._vaciar()
+
+
+def _reserva(lector_id: int, libro_id: int, copia_id: Optional[int] = None,
+             fecha_limite: Optional[datetime] = None) -> dict:
+    return {
+        "lector_id": lector_id,
+        "libro_id": libro_id,
+        "estado": EstadoReserva.EN_ESPERA if copia_id is None else EstadoReserva.LISTA,
+        "copia_id": copia_id,
+        "fecha_limite": fecha_limite
+    }
+
+
+def avisar_reservas(asignaciones: List[Asignacion]):
+    """Encola el aviso a cada lector cuya reserva quedó lista"""
+    if asignaciones:
+        bioalert.encolar_envios(_avisos_reserva, asignaciones)
+
+
+def _avisos_reserva(asignaciones: List[Asignacion]) -> Iterator[Envio]:
+    for lector_id, libro_id, copia_id, fecha_limite in asignaciones:
+        lector = db.get_lector(lector_id)
+        libro = db.get_libro(libro_id)
+        yield (
+            lector["email"],
+            libro["nombre"],
+            f"Tu reserva de '{libro['nombre']}' está lista: retira la copia {copia_id} "
+            f"antes del {fecha_limite:%d/%m/%Y %H:%M}."
+        )
+
+
+def notificar_disponibles(libro_ids: Iterable[int]):
+    """Encola el aviso a los suscriptores de cada libro; los destinatarios se resuelven en segundo plano"""
+    libro_ids = list(libro_ids)
+    if libro_ids:
+        bioalert.encolar_envios(_avisos_disponibilidad, libro_ids)
+
+
+def _avisos_disponibilidad(libro_ids: List[int]) -> Iterator[Envio]:
+    """Un aviso por suscripción; las de un solo aviso se dan de baja después de enviarlo"""
+    for libro_id in libro_ids:
+        libro = db.get_libro(libro_id)
+        for suscripcion in db.get_suscripciones_by_libro(libro_id):
+            lector = db.get_lector(suscripcion["lector_id"])
+            yield lector["email"], libro["nombre"], f"El libro '{libro['nombre']}' está ahora disponible."
+            if suscripcion["una_vez"]:
+                db.delete_suscripcion(suscripcion["id"])
+
+
+# Instancia global: RESERVAS_PLAZO_RETIRO_HORAS fija cuánto espera una copia apartada
+reservas = ColaReservas(timedelta(hours=float(os.environ.get("RESERVAS_PLAZO_RETIRO_HORAS", "48"))))
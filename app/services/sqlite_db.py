@@ -0,0 +1,530 @@
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from datetime import date, datetime
+from app.models.schemas import EstadoCopia
+from app.services.registros import PLAZO_PRESTAMO, dias_restantes, extender_sancion, reducir_sancion
+from app.services.versiones import Versiones
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS autores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    fecha_nacimiento TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS libros (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    anio INTEGER NOT NULL,
+    autor_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_libros_autor ON libros (autor_id);
+CREATE TABLE IF NOT EXISTS copias (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    libro_id INTEGER NOT NULL,
+    estado TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_copias_libro_estado ON copias (libro_id, estado);
+CREATE TABLE IF NOT EXISTS lectores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    email TEXT NOT NULL,
+    sancionado_hasta TEXT
+);
+CREATE TABLE IF NOT EXISTS prestamos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lector_id INTEGER NOT NULL,
+    copia_id INTEGER NOT NULL,
+    fecha_prestamo TEXT NOT NULL,
+    fecha_devolucion_esperada TEXT NOT NULL,
+    fecha_devolucion_real TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_prestamos_lector_activos
+    ON prestamos (lector_id, fecha_devolucion_real);
+CREATE TABLE IF NOT EXISTS suscripciones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lector_id INTEGER NOT NULL,
+    libro_id INTEGER NOT NULL,
+    fecha_suscripcion TEXT NOT NULL,
+    una_vez INTEGER NOT NULL DEFAULT 0,
+    -- Un lector se suscribe a lo sumo una vez a cada libro; el índice también sirve para buscar por libro
+    UNIQUE (libro_id, lector_id)
+);
+"""
+
+TABLAS = ("autores", "libros", "copias", "lectores", "prestamos", "suscripciones")
+
+
+def _limite(limit: Optional[int]) -> int:
+    # En SQLite LIMIT -1 significa sin límite
+    return -1 if limit is None else limit
+
+
+def _fecha(valor: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(valor) if valor is not None else None
+
+
+def _autor(fila) -> dict:
+    return {"id": fila[0], "nombre": fila[1], "fecha_nacimiento": date.fromisoformat(fila[2])}
+
+
+def _libro(fila) -> dict:
+    return {"id": fila[0], "nombre": fila[1], "anio": fila[2], "autor_id": fila[3]}
+
+
+def _copia(fila) -> dict:
+    return {"id": fila[0], "libro_id": fila[1], "estado": EstadoCopia(fila[2])}
+
+
+def _instante(valor: Optional[datetime]) -> Optional[str]:
+    # Siempre con microsegundos para que el orden del texto sea el de las fechas
+    return valor.isoformat(timespec="microseconds") if valor is not None else None
+
+
+def _lector(fila) -> dict:
+    hasta = _fecha(fila[3])
+    return {
+        "id": fila[0],
+        "nombre": fila[1],
+        "email": fila[2],
+        "dias_sancion": dias_restantes(hasta),
+        "sancionado_hasta": hasta
+    }
+
+
+def _prestamo(fila) -> dict:
+    return {
+        "id": fila[0],
+        "lector_id": fila[1],
+        "copia_id": fila[2],
+        "fecha_prestamo": _fecha(fila[3]),
+        "fecha_devolucion_esperada": _fecha(fila[4]),
+        "fecha_devolucion_real": _fecha(fila[5])
+    }
+
+
+def _suscripcion(fila) -> dict:
+    return {
+        "id": fila[0],
+        "lector_id": fila[1],
+        "libro_id": fila[2],
+        "fecha_suscripcion": _fecha(fila[3]),
+        "una_vez": bool(fila[4])
+    }
+
+
+# Tabla -> (columnas, conversión de cada fila)
+COLUMNAS = {
+    "autores": ("id, nombre, fecha_nacimiento", _autor),
+    "libros": ("id, nombre, anio, autor_id", _libro),
+    "copias": ("id, libro_id, estado", _copia),
+    "lectores": ("id, nombre, email, sancionado_hasta", _lector),
+    "prestamos": ("*", _prestamo),
+    "suscripciones": ("id, lector_id, libro_id, fecha_suscripcion, una_vez", _suscripcion),
+}
+
+
+class SQLiteDB:
+    """Backend persistente con la misma interfaz que MemoryDB.
+
+    Cada hilo usa su propia conexión (el threadpool de FastAPI reutiliza
+    hilos, así que en la práctica es un pool de conexiones). Las consultas
+    son parametrizadas y sqlite3 cachea su preparación por conexión.
+
+    Las versiones de cada colección (ver MemoryDB.version) se llevan en el
+    proceso: escrituras de otro proceso sobre el mismo archivo no las mueven.
+    """
+    bloqueante = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self.versiones = Versiones()
+        self.al_cambiar_vencimiento: Optional[Callable[[dict], None]] = None
+        self._local = threading.local()
+        self._conexiones: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(ESQUEMA)
+        self._migrar(conn)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_lectores_sancion ON lectores (sancionado_hasta)")
+
+    def _migrar(self, conn: sqlite3.Connection):
+        """Lleva al esquema actual una base creada con uno anterior; no hace nada si ya está al día"""
+        def columnas(tabla: str) -> set:
+            return {columna[1] for columna in conn.execute(f"PRAGMA table_info({tabla})")}
+
+        if "sancionado_hasta" not in columnas("lectores"):
+            # Se guardaban los días de sanción restantes en lugar de la fecha de fin
+            with conn:
+                conn.execute("ALTER TABLE lectores ADD COLUMN sancionado_hasta TEXT")
+                conn.executemany(
+                    "UPDATE lectores SET sancionado_hasta = ? WHERE id = ?",
+                    [(_instante(extender_sancion(None, dias)), lector_id) for lector_id, dias in
+                     conn.execute("SELECT id, dias_sancion FROM lectores WHERE dias_sancion > 0").fetchall()]
+                )
+
+        if "una_vez" not in columnas("suscripciones"):
+            # Antes de las suscripciones de un solo aviso tampoco se exigía unicidad: se conservan las más antiguas
+            with conn:
+                conn.execute("ALTER TABLE suscripciones ADD COLUMN una_vez INTEGER NOT NULL DEFAULT 0")
+                conn.execute(
+                    "DELETE FROM suscripciones WHERE id NOT IN "
+                    "(SELECT min(id) FROM suscripciones GROUP BY libro_id, lector_id)"
+                )
+                conn.execute("DROP INDEX IF EXISTS idx_suscripciones_libro")
+                conn.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS idx_suscripciones_libro_lector "
+                    "ON suscripciones (libro_id, lector_id)"
+                )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            # lower() de SQLite solo convierte ASCII; se usa el de Python
+            conn.create_function("py_lower", 1, str.lower, deterministic=True)
+            self._local.conn = conn
+            with self._lock:
+                self._conexiones.append(conn)
+        return conn
+
+    def _uno(self, sql: str, params=()) -> Optional[tuple]:
+        return self._conn().execute(sql, params).fetchone()
+
+    def _todos(self, sql: str, params=()) -> List[tuple]:
+        return self._conn().execute(sql, params).fetchall()
+
+    def _insertar(self, sql: str, params) -> int:
+        conn = self._conn()
+        with conn:
+            return conn.execute(sql, params).lastrowid
+
+    def _insertar_lote(self, tabla: str, columnas: str, filas: List[tuple]) -> int:
+        """Inserta todas las filas en una transacción con ids consecutivos y devuelve el primero.
+
+        BEGIN IMMEDIATE toma el lock de escritura antes de leer la secuencia,
+        así ningún otro alta se intercala en el bloque de ids.
+        """
+        marcas = ", ".join("?" * (columnas.count(",") + 2))
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            secuencia = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabla,)).fetchone()
+            inicio = (secuencia[0] if secuencia else 0) + 1
+            conn.executemany(
+                f"INSERT INTO {tabla} (id, {columnas}) VALUES ({marcas})",
+                ((fila_id, *fila) for fila_id, fila in enumerate(filas, inicio))
+            )
+        return inicio
+
+    def _actualizar(self, sql: str, params) -> bool:
+        conn = self._conn()
+        with conn:
+            return conn.execute(sql, params).rowcount > 0
+
+    def close(self):
+        with self._lock:
+            for conn in self._conexiones:
+                conn.close()
+            self._conexiones.clear()
+        self._local = threading.local()
+
+    def tamanios(self) -> Dict[str, int]:
+        return {tabla: self._uno(f"SELECT COUNT(*) FROM {tabla}")[0] for tabla in COLUMNAS}
+
+    def exportar(self, coleccion: str, lote: int = 1000) -> Iterator[List[dict]]:
+        """Recorre una tabla en lotes dentro de una única transacción de lectura.
+
+        Usa una conexión propia: el recorrido puede continuar en otro hilo y,
+        en modo WAL, la transacción ve una foto fija aunque haya escrituras.
+        """
+        columnas, convertir = COLUMNAS[coleccion]
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            cursor = conn.execute(f"SELECT {columnas} FROM {coleccion} ORDER BY id")
+            while True:
+                filas = cursor.fetchmany(lote)
+                if not filas:
+                    return
+                yield [convertir(f) for f in filas]
+        finally:
+            conn.close()
+
+    def reset(self):
+        """Vacía todas las tablas y reinicia los contadores de ids"""
+        conn = self._conn()
+        with conn:
+            for tabla in TABLAS:
+                conn.execute(f"DELETE FROM {tabla}")
+            conn.execute("DELETE FROM sqlite_sequence")
+        self.versiones.reiniciar()
+
+    def version(self, coleccion: str, libro_id: Optional[int] = None) -> int:
+        return self.versiones.obtener(coleccion if libro_id is None else (coleccion, libro_id))
+
+    # Autores
+    def create_autor(self, nombre: str, fecha_nacimiento) -> dict:
+        autor_id = self._insertar(
+            "INSERT INTO autores (nombre, fecha_nacimiento) VALUES (?, ?)",
+            (nombre, fecha_nacimiento.isoformat())
+        )
+        self.versiones.incrementar("autores")
+        return {"id": autor_id, "nombre": nombre, "fecha_nacimiento": fecha_nacimiento}
+
+    def create_autores(self, autores: List[Tuple[str, date]]) -> List[dict]:
+        inicio = self._insertar_lote(
+            "autores", "nombre, fecha_nacimiento", [(nombre, fecha.isoformat()) for nombre, fecha in autores]
+        )
+        self.versiones.incrementar("autores")
+        return [
+            {"id": autor_id, "nombre": nombre, "fecha_nacimiento": fecha}
+            for autor_id, (nombre, fecha) in enumerate(autores, inicio)
+        ]
+
+    def get_autor(self, autor_id: int) -> Optional[dict]:
+        fila = self._uno("SELECT id, nombre, fecha_nacimiento FROM autores WHERE id = ?", (autor_id,))
+        return _autor(fila) if fila else None
+
+    def get_all_autores(self, after_id: int = 0, limit: Optional[int] = None) -> List[dict]:
+        filas = self._todos(
+            "SELECT id, nombre, fecha_nacimiento FROM autores WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, _limite(limit))
+        )
+        return [_autor(f) for f in filas]
+
+    # Libros
+    def create_libro(self, nombre: str, anio: int, autor_id: int) -> dict:
+        libro_id = self._insertar(
+            "INSERT INTO libros (nombre, anio, autor_id) VALUES (?, ?, ?)",
+            (nombre, anio, autor_id)
+        )
+        self.versiones.incrementar("libros")
+        return {"id": libro_id, "nombre": nombre, "anio": anio, "autor_id": autor_id}
+
+    def create_libros(self, libros: List[Tuple[str, int, int]]) -> List[dict]:
+        inicio = self._insertar_lote("libros", "nombre, anio, autor_id", libros)
+        self.versiones.incrementar("libros")
+        return [
+            {"id": libro_id, "nombre": nombre, "anio": anio, "autor_id": autor_id}
+            for libro_id, (nombre, anio, autor_id) in enumerate(libros, inicio)
+        ]
+
+    def get_libro(self, libro_id: int) -> Optional[dict]:
+        fila = self._uno("SELECT id, nombre, anio, autor_id FROM libros WHERE id = ?", (libro_id,))
+        return _libro(fila) if fila else None
+
+    def get_all_libros(self, after_id: int = 0, limit: Optional[int] = None) -> List[dict]:
+        filas = self._todos(
+            "SELECT id, nombre, anio, autor_id FROM libros WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, _limite(limit))
+        )
+        return [_libro(f) for f in filas]
+
+    def get_libros_by_autor(self, nombre_autor: str) -> List[dict]:
+        filas = self._todos(
+            "SELECT l.id, l.nombre, l.anio, l.autor_id FROM autores a "
+            "JOIN libros l ON l.autor_id = a.id "
+            "WHERE instr(py_lower(a.nombre), ?) > 0 ORDER BY l.id",
+            (nombre_autor.lower(),)
+        )
+        return [_libro(f) for f in filas]
+
+    # Copias
+    def create_copia(self, libro_id: int) -> dict:
+        copia_id = self._insertar(
+            "INSERT INTO copias (libro_id, estado) VALUES (?, ?)",
+            (libro_id, EstadoCopia.EN_BIBLIOTECA.value)
+        )
+        self.versiones.incrementar("copias", ("copias", libro_id))
+        return {"id": copia_id, "libro_id": libro_id, "estado": EstadoCopia.EN_BIBLIOTECA}
+
+    def create_copias(self, libro_ids: List[int]) -> List[dict]:
+        estado = EstadoCopia.EN_BIBLIOTECA
+        inicio = self._insertar_lote("copias", "libro_id, estado", [(libro_id, estado.value) for libro_id in libro_ids])
+        self.versiones.incrementar("copias", *(("copias", libro_id) for libro_id in set(libro_ids)))
+        return [
+            {"id": copia_id, "libro_id": libro_id, "estado": estado}
+            for copia_id, libro_id in enumerate(libro_ids, inicio)
+        ]
+
+    def get_copia(self, copia_id: int) -> Optional[dict]:
+        fila = self._uno("SELECT id, libro_id, estado FROM copias WHERE id = ?", (copia_id,))
+        return _copia(fila) if fila else None
+
+    def get_all_copias(self, after_id: int = 0, limit: Optional[int] = None) -> List[dict]:
+        filas = self._todos(
+            "SELECT id, libro_id, estado FROM copias WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, _limite(limit))
+        )
+        return [_copia(f) for f in filas]
+
+    def get_copias_by_libro(self, libro_id: int) -> List[dict]:
+        filas = self._todos("SELECT id, libro_id, estado FROM copias WHERE libro_id = ? ORDER BY id", (libro_id,))
+        return [_copia(f) for f in filas]
+
+    def update_estado_copia(self, copia_id: int, estado: EstadoCopia) -> Optional[dict]:
+        if self._actualizar("UPDATE copias SET estado = ? WHERE id = ?", (EstadoCopia(estado).value, copia_id)):
+            copia = self.get_copia(copia_id)
+            self.versiones.incrementar("copias", ("copias", copia["libro_id"]))
+            return copia
+        return None
+
+    def get_disponibilidad_libro(self, libro_id: int) -> Dict[EstadoCopia, int]:
+        # Resuelta solo con el índice (libro_id, estado), sin leer la tabla
+        disponibilidad = {estado: 0 for estado in EstadoCopia}
+        for estado, cantidad in self._todos(
+            "SELECT estado, count(*) FROM copias WHERE libro_id = ? GROUP BY estado", (libro_id,)
+        ):
+            disponibilidad[EstadoCopia(estado)] = cantidad
+        return disponibilidad
+
+    # Lectores
+    def create_lector(self, nombre: str, email: str) -> dict:
+        lector_id = self._insertar("INSERT INTO lectores (nombre, email) VALUES (?, ?)", (nombre, email))
+        self.versiones.incrementar("lectores")
+        return {"id": lector_id, "nombre": nombre, "email": email, "dias_sancion": 0, "sancionado_hasta": None}
+
+    def create_lectores(self, lectores: List[Tuple[str, str]]) -> List[dict]:
+        inicio = self._insertar_lote("lectores", "nombre, email", lectores)
+        self.versiones.incrementar("lectores")
+        return [
+            {"id": lector_id, "nombre": nombre, "email": email, "dias_sancion": 0, "sancionado_hasta": None}
+            for lector_id, (nombre, email) in enumerate(lectores, inicio)
+        ]
+
+    def get_lector(self, lector_id: int) -> Optional[dict]:
+        fila = self._uno("SELECT id, nombre, email, sancionado_hasta FROM lectores WHERE id = ?", (lector_id,))
+        return _lector(fila) if fila else None
+
+    def get_all_lectores(self, after_id: int = 0, limit: Optional[int] = None) -> List[dict]:
+        filas = self._todos(
+            "SELECT id, nombre, email, sancionado_hasta FROM lectores WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, _limite(limit))
+        )
+        return [_lector(f) for f in filas]
+
+    def update_sancion_lector(self, lector_id: int, dias: int) -> Optional[dict]:
+        return self._mover_sancion(lector_id, lambda hasta: extender_sancion(hasta, dias))
+
+    def reducir_sancion_lector(self, lector_id: int, dias: int) -> Optional[dict]:
+        return self._mover_sancion(lector_id, lambda hasta: reducir_sancion(hasta, dias))
+
+    def _mover_sancion(self, lector_id: int, calcular) -> Optional[dict]:
+        """Lee y reescribe el fin de la sanción en una sola transacción de escritura"""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            fila = conn.execute("SELECT sancionado_hasta FROM lectores WHERE id = ?", (lector_id,)).fetchone()
+            if fila is None:
+                return None
+            conn.execute(
+                "UPDATE lectores SET sancionado_hasta = ? WHERE id = ?",
+                (_instante(calcular(_fecha(fila[0]))), lector_id)
+            )
+        self.versiones.incrementar("lectores")
+        return self.get_lector(lector_id)
+
+    def get_lectores_sancionados(self) -> List[dict]:
+        # Rango sobre idx_lectores_sancion: las sanciones cumplidas no se leen
+        filas = self._todos(
+            "SELECT id, nombre, email, sancionado_hasta FROM lectores "
+            "WHERE sancionado_hasta > ? ORDER BY sancionado_hasta, id",
+            (_instante(datetime.now()),)
+        )
+        return [_lector(f) for f in filas]
+
+    # Préstamos
+    def create_prestamo(self, lector_id: int, copia_id: int) -> dict:
+        fecha_prestamo = datetime.now()
+        fecha_devolucion_esperada = fecha_prestamo + PLAZO_PRESTAMO
+        prestamo_id = self._insertar(
+            "INSERT INTO prestamos (lector_id, copia_id, fecha_prestamo, fecha_devolucion_esperada) "
+            "VALUES (?, ?, ?, ?)",
+            (lector_id, copia_id, fecha_prestamo.isoformat(), fecha_devolucion_esperada.isoformat())
+        )
+        self.versiones.incrementar("prestamos")
+        return {
+            "id": prestamo_id,
+            "lector_id": lector_id,
+            "copia_id": copia_id,
+            "fecha_prestamo": fecha_prestamo,
+            "fecha_devolucion_esperada": fecha_devolucion_esperada,
+            "fecha_devolucion_real": None
+        }
+
+    def get_prestamo(self, prestamo_id: int) -> Optional[dict]:
+        fila = self._uno("SELECT * FROM prestamos WHERE id = ?", (prestamo_id,))
+        return _prestamo(fila) if fila else None
+
+    def get_all_prestamos(self, after_id: int = 0, limit: Optional[int] = None) -> List[dict]:
+        filas = self._todos(
+            "SELECT * FROM prestamos WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, _limite(limit))
+        )
+        return [_prestamo(f) for f in filas]
+
+    def get_prestamos_activos_by_lector(self, lector_id: int) -> List[dict]:
+        filas = self._todos(
+            "SELECT * FROM prestamos WHERE lector_id = ? AND fecha_devolucion_real IS NULL ORDER BY id",
+            (lector_id,)
+        )
+        return [_prestamo(f) for f in filas]
+
+    def devolver_prestamo(self, prestamo_id: int) -> Optional[dict]:
+        if self._actualizar(
+            "UPDATE prestamos SET fecha_devolucion_real = ? WHERE id = ?",
+            (datetime.now().isoformat(), prestamo_id)
+        ):
+            self.versiones.incrementar("prestamos")
+            return self.get_prestamo(prestamo_id)
+        return None
+
+    def update_fecha_devolucion_esperada(self, prestamo_id: int, fecha: datetime) -> Optional[dict]:
+        if self._actualizar(
+            "UPDATE prestamos SET fecha_devolucion_esperada = ? WHERE id = ?", (fecha.isoformat(), prestamo_id)
+        ):
+            self.versiones.incrementar("prestamos")
+            prestamo = self.get_prestamo(prestamo_id)
+            if self.al_cambiar_vencimiento is not None:
+                self.al_cambiar_vencimiento(prestamo)
+            return prestamo
+        return None
+
+    # Suscripciones BioAlert
+    def create_suscripcion(self, lector_id: int, libro_id: int, una_vez: bool = False) -> Optional[dict]:
+        """Suscribe al lector al libro; None si ya estaba suscrito"""
+        fecha_suscripcion = datetime.now()
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO suscripciones (lector_id, libro_id, fecha_suscripcion, una_vez) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (libro_id, lector_id) DO NOTHING",
+                (lector_id, libro_id, fecha_suscripcion.isoformat(), int(una_vez))
+            )
+        if cursor.rowcount == 0:
+            return None
+        self.versiones.incrementar("suscripciones")
+        return {
+            "id": cursor.lastrowid,
+            "lector_id": lector_id,
+            "libro_id": libro_id,
+            "fecha_suscripcion": fecha_suscripcion,
+            "una_vez": una_vez
+        }
+
+    def get_suscripciones_by_libro(self, libro_id: int) -> List[dict]:
+        filas = self._todos(
+            "SELECT id, lector_id, libro_id, fecha_suscripcion, una_vez FROM suscripciones "
+            "WHERE libro_id = ? ORDER BY id",
+            (libro_id,)
+        )
+        return [_suscripcion(f) for f in filas]
+
+    def delete_suscripcion(self, suscripcion_id: int) -> bool:
+        if self._actualizar("DELETE FROM suscripciones WHERE id = ?", (suscripcion_id,)):
+            self.versiones.incrementar("suscripciones")
+            return True
+        return False
@@ -0,0 +1,62 @@
+from typing import Callable, Dict, Iterator, List, Optional, Protocol, Tuple
+from datetime import date, datetime
+from app.models.schemas import EstadoCopia
+
+
+class Storage(Protocol):
+    """Interfaz común de los backends de almacenamiento (MemoryDB, SQLiteDB)"""
+
+    # True si una operación puede esperar E/S: los handlers async la corren en el pool de hilos
+    bloqueante: bool
+    # Se invoca con el préstamo tras cambiar su fecha esperada (lo registra el planificador de vencimientos)
+    al_cambiar_vencimiento: Optional[Callable[[dict], None]]
+
+    def reset(self) -> None: ...
+    def close(self) -> None: ...
+    def exportar(self, coleccion: str, lote: int = 1000) -> Iterator[List[dict]]: ...
+    def version(self, coleccion: str, libro_id: Optional[int] = None) -> int: ...
+    def tamanios(self) -> Dict[str, int]: ...
+
+    # Autores
+    def create_autor(self, nombre: str, fecha_nacimiento: date) -> dict: ...
+    def create_autores(self, autores: List[Tuple[str, date]]) -> List[dict]: ...
+    def get_autor(self, autor_id: int) -> Optional[dict]: ...
+    def get_all_autores(self, after_id: int = 0, limit: Optional[int] = None) -> List[dict]: ...
+
+    # Libros
+    def create_libro(self, nombre: str, anio: int, autor_id: int) -> dict: ...
+    def create_libros(self, libros: List[Tuple[str, int, int]]) -> List[dict]: ...
+    def get_libro(self, libro_id: int) -> Optional[dict]: ...
+    def get_all_libros(self, after_id: int = 0, limit: Optional[int] = None) -> List[dict]: ...
+    def get_libros_by_autor(self, nombre_autor: str) -> List[dict]: ...
+
+    # Copias
+    def create_copia(self, libro_id: int) -> dict: ...
+    def create_copias(self, libro_ids: List[int]) -> List[dict]: ...
+    def get_copia(self, copia_id: int) -> Optional[dict]: ...
+    def get_all_copias(self, after_id: int = 0, limit: Optional[int] = None) -> List[dict]: ...
+    def get_copias_by_libro(self, libro_id: int) -> List[dict]: ...
+    def update_estado_copia(self, copia_id: int, estado: EstadoCopia) -> Optional[dict]: ...
+    def get_disponibilidad_libro(self, libro_id: int) -> Dict[EstadoCopia, int]: ...
+
+    # Lectores
+    def create_lector(self, nombre: str, email: str) -> dict: ...
+    def create_lectores(self, lectores: List[Tuple[str, str]]) -> List[dict]: ...
+    def get_lector(self, lector_id: int) -> Optional[dict]: ...
+    def get_all_lectores(self, after_id: int = 0, limit: Optional[int] = None) -> List[dict]: ...
+    def update_sancion_lector(self, lector_id: int, dias: int) -> Optional[dict]: ...
+    def reducir_sancion_lector(self, lector_id: int, dias: int) -> Optional[dict]: ...
+    def get_lectores_sancionados(self) -> List[dict]: ...
+
+    # Préstamos
+    def create_prestamo(self, lector_id: int, copia_id: int) -> dict: ...
+    def get_prestamo(self, prestamo_id: int) -> Optional[dict]: ...
+    def get_all_prestamos(self, after_id: int = 0, limit: Optional[int] = None) -> List[dict]: ...
+    def get_prestamos_activos_by_lector(self, lector_id: int) -> List[dict]: ...
+    def devolver_prestamo(self, prestamo_id: int) -> Optional[dict]: ...
+    def update_fecha_devolucion_esperada(self, prestamo_id: int, fecha: datetime) -> Optional[dict]: ...
+
+    # Suscripciones BioAlert
+    def create_suscripcion(self, lector_id: int, libro_id: int, una_vez: bool = False) -> Optional[dict]: ...
+    def get_suscripciones_by_libro(self, libro_id: int) -> List[dict]: ...
+    def delete_suscripcion(self, suscripcion_id: int) -> bool: ...
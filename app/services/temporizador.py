@@ -0,0 +1,98 @@
+import heapq
+import threading
+from datetime import datetime
+from typing import Hashable, Iterable, List, Optional, Tuple
+
+# Tope de cada espera: el hilo revisa igual el heap si el reloj del sistema salta
+ESPERA_MAXIMA = 3600.0
+
+
+class Temporizador:
+    """Min-heap de (fecha, clave) atendido por un hilo que duerme hasta la próxima fecha.
+
+    Agendar y vencer cuestan O(log n). Las subclases implementan `_vencer`,
+    que recibe cada clave cuando llega su fecha y devuelve cuántos cambios
+    hizo. Las entradas no se quitan del heap al cancelarse: `_vencer` debe
+    comprobar que siguen vigentes.
+    """
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._heap: List[Tuple[datetime, Hashable]] = []
+        self._cond = threading.Condition()
+        self._hilo: Optional[threading.Thread] = None
+        self._detenido = False
+
+    def agendar(self, fecha: datetime, clave: Hashable):
+        entrada = (fecha, clave)
+        with self._cond:
+            heapq.heappush(self._heap, entrada)
+            self._iniciar()
+            if self._heap[0] == entrada:
+                # Vence antes que todo lo demás: el hilo debe acortar su espera
+                self._cond.notify()
+
+    def agendar_todos(self, entradas: Iterable[Tuple[datetime, Hashable]]):
+        """Agenda muchas entradas de una vez (heapify en lugar de n inserciones)"""
+        with self._cond:
+            self._heap.extend(entradas)
+            heapq.heapify(self._heap)
+            self._cond.notify()
+        self.iniciar()
+
+    def iniciar(self):
+        """Arranca (o rearranca tras `detener`) el hilo de fondo"""
+        with self._cond:
+            self._detenido = False
+            self._iniciar()
+
+    def _iniciar(self):
+        if self._hilo is None and not self._detenido:
+            self._hilo = threading.Thread(target=self._ejecutar, name=self.nombre, daemon=True)
+            self._hilo.start()
+
+    def _ejecutar(self):
+        while True:
+            with self._cond:
+                while not self._detenido:
+                    if self._heap:
+                        espera = (self._heap[0][0] - datetime.now()).total_seconds()
+                        if espera <= 0:
+                            break
+                        self._cond.wait(min(espera, ESPERA_MAXIMA))
+                    else:
+                        self._cond.wait(ESPERA_MAXIMA)
+                if self._detenido:
+                    return
+            self.procesar_vencidos()
+
+    def procesar_vencidos(self, ahora: Optional[datetime] = None) -> int:
+        """Atiende todo lo vencido hasta `ahora`; devuelve la suma de lo que informó `_vencer`"""
+        ahora = ahora or datetime.now()
+        cambios = 0
+        while True:
+            with self._cond:
+                if not self._heap or self._heap[0][0] > ahora:
+                    return cambios
+                fecha, clave = heapq.heappop(self._heap)
+            cambios += self._vencer(clave, fecha)
+
+    def _vencer(self, clave: Hashable, fecha: datetime) -> int:
+        raise NotImplementedError
+
+    def detener(self):
+        """Detiene el hilo de fondo; lo agendado se conserva y puede procesarse a mano"""
+        with self._cond:
+            self._detenido = True
+            self._cond.notify()
+            hilo, self._hilo = self._hilo, None
+        if hilo is not None:
+            hilo.join()
+
+    def reset(self):
+        """Olvida todo lo agendado"""
+        with self._cond:
+            self._heap.clear()
+
+    def __len__(self):
+        return len(self._heap)
@@ -0,0 +1,68 @@
+import os
+from datetime import datetime
+from app.models.schemas import EstadoCopia
+from app.services.database import db
+from app.services.bioalert import bioalert
+from app.services.concurrencia import locks_lectores, locks_copias
+from app.services.temporizador import Temporizador
+
+
+class PlanificadorVencimientos(Temporizador):
+    """Marca CON_RETRASO las copias de los préstamos vencidos.
+
+    Los préstamos activos esperan en el heap por fecha de devolución
+    esperada y el hilo duerme hasta el próximo vencimiento: programar y
+    vencer cuestan O(log n) y nunca se recorren todos los préstamos.
+
+    Las devoluciones no se quitan del heap. Al vencer se relee el préstamo y
+    se descarta si ya no está activo, o se reprograma si su fecha cambió.
+    """
+
+    def __init__(self, recordatorio: bool = True):
+        super().__init__("vencimientos")
+        self.recordatorio = recordatorio
+
+    def programar(self, prestamo):
+        """Agenda el vencimiento de un préstamo (también tras cambiar su fecha esperada)"""
+        self.agendar(prestamo["fecha_devolucion_esperada"], prestamo["id"])
+
+    def cargar_activos(self):
+        """Agenda todos los préstamos activos (al arrancar con datos persistidos)"""
+        self.agendar_todos([
+            (p["fecha_devolucion_esperada"], p["id"])
+            for p in db.get_all_prestamos() if p["fecha_devolucion_real"] is None
+        ])
+
+    def _vencer(self, prestamo_id: int, fecha: datetime) -> int:
+        prestamo = db.get_prestamo(prestamo_id)
+        if prestamo is None or prestamo["fecha_devolucion_real"] is not None:
+            return 0
+        if prestamo["fecha_devolucion_esperada"] > fecha:
+            # Se prorrogó después de agendarlo
+            self.programar(prestamo)
+            return 0
+
+        with locks_lectores.bloquear(prestamo["lector_id"]), locks_copias.bloquear(prestamo["copia_id"]):
+            # Con los locks tomados no puede devolverse en medio
+            if db.get_prestamo(prestamo_id)["fecha_devolucion_real"] is not None:
+                return 0
+            copia = db.get_copia(prestamo["copia_id"])
+            if copia["estado"] != EstadoCopia.PRESTADA:
+                return 0
+            db.update_estado_copia(copia["id"], EstadoCopia.CON_RETRASO)
+
+        if self.recordatorio:
+            lector = db.get_lector(prestamo["lector_id"])
+            libro = db.get_libro(copia["libro_id"])
+            bioalert.notificar(
+                lector["email"],
+                libro["nombre"],
+                f"Venció el plazo de devolución de '{libro['nombre']}'. Devuélvelo cuanto antes para evitar sanciones."
+            )
+        return 1
+
+
+# Instancia global: VENCIMIENTOS_RECORDATORIO=0 desactiva el aviso por email
+planificador = PlanificadorVencimientos(os.environ.get("VENCIMIENTOS_RECORDATORIO", "1") != "0")
+# Una fecha esperada que se adelanta no puede esperar a la entrada vieja del heap
+db.al_cambiar_vencimiento = planificador.programar
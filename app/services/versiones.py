@@ -0,0 +1,32 @@
+import threading
+from typing import Dict, Hashable
+
+
+class Versiones:
+    """Contadores de versión monótonos por clave (colección, o ("copias", libro_id) para las copias de un libro).
+
+    Cada escritura incrementa la versión de lo que tocó después de
+    aplicar el cambio; quien lee la versión antes de armar una respuesta
+    sabe que esta incluye al menos esos cambios. Las versiones nunca
+    retroceden, ni siquiera tras `reiniciar`, para que un ETag viejo no
+    vuelva a ser válido.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._base = 0
+        self._versiones: Dict[Hashable, int] = {}
+
+    def incrementar(self, *claves: Hashable):
+        with self._lock:
+            for clave in claves:
+                self._versiones[clave] = self._versiones.get(clave, self._base) + 1
+
+    def obtener(self, clave: Hashable) -> int:
+        return self._versiones.get(clave, self._base)
+
+    def reiniciar(self):
+        """Tras vaciar la base: todas las claves pasan a una versión mayor que cualquiera anterior"""
+        with self._lock:
+            self._base = max(self._versiones.values(), default=self._base) + 1
+            self._versiones.clear()
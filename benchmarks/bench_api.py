@@ -0,0 +1,258 @@
+"""Prueba de carga de toda la API, en el mismo proceso, con latencias por ruta en JSON.
+
+Puebla MemoryDB con volúmenes sintéticos configurables (autores, libros,
+copias, lectores y préstamos históricos y activos), genera una carga
+mixta (navegar el catálogo, buscar por autor, prestar, devolver,
+suscribirse) y la ejecuta contra la aplicación ASGI con el transporte ASGI
+de httpx, sin red ni servidor. Imprime un JSON con la configuración, el
+throughput total y, por ruta, requests/segundo, errores y latencias
+p50/p95/p99.
+
+La carga se puede grabar y reproducir: un archivo JSONL cuya primera
+línea es {"datos": {...volúmenes...}} y cada una de las siguientes es un
+request {"ruta": "GET /libros/{libro_id}", "metodo": "GET", "url": "/libros/7"}
+(con "cuerpo" opcional). Cada préstamo usa una copia y un lector propios y
+cada devolución un préstamo activo distinto, así que el resultado no
+depende del orden en que los clientes concurrentes ejecuten los requests.
+
+Con --comparar se contrasta el p99 de cada ruta con un JSON anterior y se
+sale con código 1 si alguna empeora más que --tolerancia.
+
+Uso: python -m benchmarks.bench_api [--libros 10000] [--prestamos 1000000] [--requests 20000]
+     [--clientes 16] [--grabar carga.jsonl | --reproducir carga.jsonl] [--salida r.json]
+     [--comparar anterior.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import date
+from typing import Dict, List
+
+os.environ["BIBLIOTECA_STORAGE"] = "memory"
+os.environ.pop("BIBLIOTECA_WAL_DIR", None)
+
+import httpx
+
+from app.models.schemas import EstadoCopia
+from app.services.bioalert import bioalert
+from app.services.catalogo import vista_libros
+from app.services.database import db
+from app.services.reservas import reservas
+from app.services.vencimientos import planificador
+from main import app
+
+# Proporción de cada operación en la carga generada
+PESOS = {
+    "GET /libros/": 20,
+    "GET /libros/{libro_id}": 20,
+    "GET /libros/buscar/{nombre_autor}": 15,
+    "GET /copias/libro/{libro_id}": 5,
+    "GET /lectores/{lector_id}": 10,
+    "POST /prestamos/": 12,
+    "POST /prestamos/{prestamo_id}/devolver": 12,
+    "POST /bioalert/suscribir": 6,
+}
+
+
+def poblar(datos: dict):
+    """Carga los volúmenes pedidos directamente en MemoryDB (sin pasar por la API)"""
+    db.reset()
+    bioalert.reset()
+    planificador.reset()
+    reservas.reset()
+    vista_libros.reset()
+
+    n_autores, n_libros, n_lectores = datos["autores"], datos["libros"], datos["lectores"]
+    n_copias = n_libros * datos["copias_por_libro"]
+    db.create_autores([(f"Autor {i:06d}", date(1950, 1, 1)) for i in range(1, n_autores + 1)])
+    db.create_libros([(f"Libro {i}", 2000, i % n_autores + 1) for i in range(1, n_libros + 1)])
+    db.create_copias([i % n_libros + 1 for i in range(n_copias)])
+    db.create_lectores([(f"Lector {i}", f"lector{i}@example.com") for i in range(1, n_lectores + 1)])
+
+    # Historial: préstamos ya devueltos repartidos entre todas las copias y lectores
+    activos = datos["activos"]
+    for i in range(datos["prestamos"] - activos):
+        prestamo = db.create_prestamo(i % n_lectores + 1, i % n_copias + 1)
+        db.devolver_prestamo(prestamo["id"])
+    # Activos: la copia i y el lector i para i = 1..activos
+    for i in range(1, activos + 1):
+        db.create_prestamo(i, i)
+        db.update_estado_copia(i, EstadoCopia.PRESTADA)
+
+
+def generar(datos: dict, n_requests: int, semilla: int = 42) -> List[dict]:
+    rnd = random.Random(semilla)
+    activos = datos["activos"]
+    n_copias = datos["libros"] * datos["copias_por_libro"]
+    # Ids de préstamos activos: los últimos creados por `poblar`
+    primer_activo = datos["prestamos"] - activos + 1
+    devoluciones = iter(range(primer_activo, datos["prestamos"] + 1))
+    # Cada préstamo nuevo usa una copia libre y un lector sin préstamos activos
+    prestamos_libres = iter(zip(range(activos + 1, n_copias + 1), range(activos + 1, datos["lectores"] + 1)))
+    suscripciones = set()
+
+    rutas, pesos = zip(*PESOS.items())
+    carga = []
+    for ruta in rnd.choices(rutas, pesos, k=n_requests):
+        libro_id = rnd.randint(1, datos["libros"])
+        if ruta == "GET /libros/":
+            request = {"url": f"/libros/?after_id={rnd.randint(0, max(0, datos['libros'] - 50))}&limit=50"}
+        elif ruta == "GET /libros/{libro_id}":
+            request = {"url": f"/libros/{libro_id}"}
+        elif ruta == "GET /libros/buscar/{nombre_autor}":
+            request = {"url": f"/libros/buscar/{rnd.randint(1, datos['autores']):06d}"}
+        elif ruta == "GET /copias/libro/{libro_id}":
+            request = {"url": f"/copias/libro/{libro_id}"}
+        elif ruta == "GET /lectores/{lector_id}":
+            request = {"url": f"/lectores/{rnd.randint(1, datos['lectores'])}"}
+        elif ruta == "POST /prestamos/":
+            siguiente = next(prestamos_libres, None)
+            if siguiente is None:
+                sys.exit("No quedan copias o lectores libres para prestar: aumentar --libros o --lectores")
+            copia_id, lector_id = siguiente
+            request = {"metodo": "POST", "url": "/prestamos/", "cuerpo": {"lector_id": lector_id, "copia_id": copia_id}}
+        elif ruta == "POST /prestamos/{prestamo_id}/devolver":
+            prestamo_id = next(devoluciones, None)
+            if prestamo_id is None:
+                sys.exit("No quedan préstamos activos para devolver: aumentar --activos")
+            request = {"metodo": "POST", "url": f"/prestamos/{prestamo_id}/devolver"}
+        else:
+            lector_id = rnd.randint(1, datos["lectores"])
+            while (lector_id, libro_id) in suscripciones:
+                lector_id, libro_id = rnd.randint(1, datos["lectores"]), rnd.randint(1, datos["libros"])
+            suscripciones.add((lector_id, libro_id))
+            request = {"metodo": "POST", "url": "/bioalert/suscribir",
+                       "cuerpo": {"lector_id": lector_id, "libro_id": libro_id}}
+        carga.append({"ruta": ruta, "metodo": request.get("metodo", "GET"), **request})
+    return carga
+
+
+def grabar(ruta: str, datos: dict, carga: List[dict]):
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write(json.dumps({"datos": datos}) + "\n")
+        for request in carga:
+            archivo.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+
+def leer(ruta: str):
+    with open(ruta, encoding="utf-8") as archivo:
+        lineas = [json.loads(linea) for linea in archivo if linea.strip()]
+    return lineas[0]["datos"], lineas[1:]
+
+
+async def ejecutar(carga: List[dict], clientes: int):
+    latencias: Dict[str, List[float]] = {}
+    errores: Dict[str, int] = {}
+    pendientes = iter(carga)
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+
+        async def cliente_virtual():
+            for request in pendientes:
+                inicio = time.perf_counter()
+                respuesta = await cliente.request(request["metodo"], request["url"], json=request.get("cuerpo"))
+                latencias.setdefault(request["ruta"], []).append(time.perf_counter() - inicio)
+                if respuesta.status_code >= 400:
+                    errores[request["ruta"]] = errores.get(request["ruta"], 0) + 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente_virtual() for _ in range(clientes)))
+        duracion = time.perf_counter() - inicio
+    return latencias, errores, duracion
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+def resumen(valores: List[float], errores: int, duracion: float) -> dict:
+    ordenados = sorted(valores)
+    return {
+        "requests": len(ordenados),
+        "errores": errores,
+        "req_s": round(len(ordenados) / duracion, 1),
+        "p50_ms": round(percentil(ordenados, 0.50) * 1000, 3),
+        "p95_ms": round(percentil(ordenados, 0.95) * 1000, 3),
+        "p99_ms": round(percentil(ordenados, 0.99) * 1000, 3),
+    }
+
+
+def comparar(actual: dict, anterior: dict, tolerancia: float) -> List[str]:
+    """Rutas cuyo p99 empeoró más que `tolerancia` (proporción) respecto del resultado anterior"""
+    regresiones = []
+    for ruta, medida in actual["rutas"].items():
+        previa = anterior.get("rutas", {}).get(ruta)
+        if previa and medida["p99_ms"] > previa["p99_ms"] * (1 + tolerancia):
+            regresiones.append(f"{ruta}: p99 {previa['p99_ms']:.3f} ms -> {medida['p99_ms']:.3f} ms")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--autores", type=int, default=1_000)
+    parser.add_argument("--libros", type=int, default=10_000)
+    parser.add_argument("--copias-por-libro", type=int, default=3)
+    parser.add_argument("--lectores", type=int, default=20_000)
+    parser.add_argument("--prestamos", type=int, default=100_000, help="Total sembrado, incluidos los activos")
+    parser.add_argument("--activos", type=int, default=5_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--clientes", type=int, default=16)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--grabar", help="Guarda la carga generada en este JSONL")
+    parser.add_argument("--reproducir", help="Ejecuta la carga grabada en este JSONL en lugar de generarla")
+    parser.add_argument("--salida", help="Escribe el resultado en este archivo en lugar de stdout")
+    parser.add_argument("--comparar", help="Resultado JSON anterior contra el cual buscar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Aumento de p99 admitido (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.reproducir:
+        datos, carga = leer(args.reproducir)
+    else:
+        datos = {
+            "autores": args.autores, "libros": args.libros, "copias_por_libro": args.copias_por_libro,
+            "lectores": args.lectores, "prestamos": args.prestamos, "activos": args.activos,
+        }
+        if not datos["activos"] <= min(datos["prestamos"], datos["lectores"], datos["libros"] * datos["copias_por_libro"]):
+            parser.error("--activos no puede superar a --prestamos, --lectores ni a la cantidad de copias")
+        carga = generar(datos, args.requests, args.semilla)
+        if args.grabar:
+            grabar(args.grabar, datos, carga)
+
+    inicio = time.perf_counter()
+    poblar(datos)
+    siembra = time.perf_counter() - inicio
+
+    latencias, errores, duracion = asyncio.run(ejecutar(carga, args.clientes))
+    bioalert.esperar()
+    resultado = {
+        "datos": datos,
+        "requests": len(carga),
+        "clientes": args.clientes,
+        "siembra_s": round(siembra, 2),
+        "duracion_s": round(duracion, 3),
+        "total": resumen([t for valores in latencias.values() for t in valores], sum(errores.values()), duracion),
+        "rutas": {ruta: resumen(valores, errores.get(ruta, 0), duracion) for ruta, valores in sorted(latencias.items())},
+    }
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            regresiones = comparar(resultado, json.load(archivo), args.tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}", file=sys.stderr)
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark HTTP de los handlers async contra el modelo de handlers en el pool de hilos.
+
+Levanta la aplicación con uvicorn dos veces, con BIBLIOTECA_EN_HILOS=1
+(cada request salta al pool de hilos, como los handlers `def`) y sin él
+(los handlers corren en el event loop), y para cada cantidad de clientes
+concurrentes mide requests/segundo y latencia p50/p99 con una mezcla de
+lecturas por id y listados paginados.
+
+Uso: python -m benchmarks.bench_async [--clientes 1 64 512] [--duracion 10]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import List
+
+import httpx
+
+AUTORES = 50
+LIBROS = 500
+LECTORES = 2000
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def levantar(puerto: int, en_hilos: bool) -> subprocess.Popen:
+    entorno = {**os.environ, "BIBLIOTECA_STORAGE": "memory", "BIBLIOTECA_EN_HILOS": "1" if en_hilos else "0"}
+    entorno.pop("BIBLIOTECA_WAL_DIR", None)
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(puerto),
+         "--log-level", "warning", "--no-access-log"],
+        env=entorno
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{puerto}/")
+            return proceso
+        except httpx.TransportError:
+            time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError("uvicorn no respondió")
+
+
+def poblar(url: str):
+    with httpx.Client(base_url=url) as cliente:
+        for i in range(AUTORES):
+            cliente.post("/autores/", json={"nombre": f"Autor {i}", "fecha_nacimiento": "1950-01-01"})
+        libros = [{"nombre": f"Libro {i}", "anio": 2000, "autor_id": i % AUTORES + 1} for i in range(LIBROS)]
+        cliente.post("/libros/lote", json=libros)
+        cliente.post("/copias/lote", json=[{"libro_id": i % LIBROS + 1} for i in range(2 * LIBROS)])
+        lectores = [{"nombre": f"Lector {i}", "email": f"lector{i}@example.com"} for i in range(LECTORES)]
+        cliente.post("/lectores/lote", json=lectores)
+
+
+def ruta(rnd: random.Random) -> str:
+    eleccion = rnd.random()
+    if eleccion < 0.3:
+        return f"/libros/{rnd.randint(1, LIBROS)}"
+    if eleccion < 0.6:
+        return f"/lectores/{rnd.randint(1, LECTORES)}"
+    if eleccion < 0.8:
+        return f"/copias/{rnd.randint(1, 2 * LIBROS)}"
+    if eleccion < 0.9:
+        return f"/libros/{rnd.randint(1, LIBROS)}/disponibilidad"
+    return f"/lectores/?after_id={rnd.randint(0, LECTORES - 20)}&limit=20"
+
+
+async def cliente_virtual(puerto: int, semilla: int, fin: float, latencias: List[float]):
+    """Una conexión keep-alive que hace GETs de a uno (HTTP/1.1 mínimo: el cliente no debe ser el cuello de botella)"""
+    rnd = random.Random(semilla)
+    lector, escritor = await asyncio.open_connection("127.0.0.1", puerto)
+    try:
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            escritor.write(f"GET {ruta(rnd)} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+            encabezados = await lector.readuntil(b"\r\n\r\n")
+            estado = encabezados.split(b" ", 2)[1]
+            largo = int(encabezados.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+            await lector.readexactly(largo)
+            latencias.append(time.perf_counter() - inicio)
+            assert estado == b"200", encabezados
+    finally:
+        escritor.close()
+
+
+async def cargar(puerto: int, clientes: int, duracion: float) -> List[float]:
+    latencias: List[float] = []
+    fin = time.perf_counter() + duracion
+    await asyncio.gather(*(cliente_virtual(puerto, i, fin, latencias) for i in range(clientes)))
+    return latencias
+
+
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 64, 512])
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos por medición")
+    args = parser.parse_args()
+
+    print(f"{'modo':>8} {'clientes':>9} {'req/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for modo, en_hilos in (("hilos", True), ("async", False)):
+        puerto = puerto_libre()
+        url = f"http://127.0.0.1:{puerto}"
+        proceso = levantar(puerto, en_hilos)
+        try:
+            poblar(url)
+            for clientes in args.clientes:
+                asyncio.run(cargar(puerto, clientes, min(1.0, args.duracion)))  # calentamiento
+                latencias = asyncio.run(cargar(puerto, clientes, args.duracion))
+                print(f"{modo:>8} {clientes:>9} {len(latencias) / args.duracion:>9.0f} "
+                      f"{percentil(latencias, 0.5) * 1000:>9.2f} {percentil(latencias, 0.99) * 1000:>9.2f}")
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+
+if __name__ == "__main__":
+    main()
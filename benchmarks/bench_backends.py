@@ -0,0 +1,67 @@
+"""Comparación de throughput entre MemoryDB y SQLiteDB.
+
+Ejecuta el mismo flujo (alta de copias, préstamo, consulta de préstamos
+activos y devolución) contra ambos backends e imprime operaciones/segundo.
+
+Uso: python -m benchmarks.bench_backends [--n 20000] [--path /tmp/bench.db]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date
+
+from app.models.schemas import EstadoCopia
+from app.services.database import MemoryDB
+from app.services.sqlite_db import SQLiteDB
+
+
+def medir(nombre: str, n: int, fn) -> float:
+    inicio = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    ops = n / (time.perf_counter() - inicio)
+    print(f"  {nombre:<28} {ops:>12,.0f} ops/s")
+    return ops
+
+
+def ejecutar(backend, n: int):
+    autor = backend.create_autor("Ian Somerville", date(1951, 2, 23))
+    libro = backend.create_libro("Software Engineering", 2015, autor["id"])
+    lectores = [backend.create_lector(f"Lector {i}", f"l{i}@example.com")["id"] for i in range(n)]
+    copias = []
+    prestamos = []
+
+    medir("create_copia", n, lambda i: copias.append(backend.create_copia(libro["id"])["id"]))
+
+    def prestar(i):
+        prestamos.append(backend.create_prestamo(lectores[i], copias[i])["id"])
+        backend.update_estado_copia(copias[i], EstadoCopia.PRESTADA)
+
+    medir("préstamo", n, prestar)
+    medir("get_prestamos_activos", n, lambda i: backend.get_prestamos_activos_by_lector(lectores[i]))
+
+    def devolver(i):
+        backend.devolver_prestamo(prestamos[i])
+        backend.update_estado_copia(copias[i], EstadoCopia.EN_BIBLIOTECA)
+
+    medir("devolución", n, devolver)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=20_000)
+    parser.add_argument("--path", default=os.path.join(tempfile.mkdtemp(), "bench.db"))
+    args = parser.parse_args()
+
+    print("MemoryDB")
+    ejecutar(MemoryDB(), args.n)
+    print(f"SQLiteDB ({args.path})")
+    sqlite_db = SQLiteDB(args.path)
+    sqlite_db.reset()
+    ejecutar(sqlite_db, args.n)
+    sqlite_db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Latencia de devolver un libro según la cantidad de suscriptores.
+
+Con BioAlert encolando los avisos en segundo plano, la devolución debería
+costar lo mismo para un libro sin suscriptores que para uno con miles.
+
+Uso: python -m benchmarks.bench_bioalert [--suscriptores 0 100 10000] [--n 200]
+"""
+import argparse
+import time
+from datetime import date
+
+from app.services.bioalert import bioalert
+from app.services.database import db
+from app.services.prestamo_service import realizar_prestamo, devolver_libro
+
+
+def medir(suscriptores: int, n: int) -> float:
+    db.reset()
+    autor = db.create_autor("Autor", date(1950, 1, 1))
+    libro = db.create_libro("Libro", 2015, autor["id"])
+    copias = db.create_copias([libro["id"]] * n)
+    lectores = db.create_lectores([(f"Lector {i}", f"l{i}@example.com") for i in range(n + suscriptores)])
+    for lector in lectores[n:]:
+        db.create_suscripcion(lector["id"], libro["id"])
+    prestamos = [realizar_prestamo(lectores[i]["id"], copias[i]["id"]) for i in range(n)]
+
+    inicio = time.perf_counter()
+    for prestamo in prestamos:
+        devolver_libro(prestamo["id"])
+    por_devolucion = (time.perf_counter() - inicio) / n
+    bioalert.esperar()
+    return por_devolucion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suscriptores", type=int, nargs="+", default=[0, 100, 10_000])
+    parser.add_argument("--n", type=int, default=200)
+    args = parser.parse_args()
+
+    for suscriptores in args.suscriptores:
+        print(f"  {suscriptores:>8,} suscriptores  {medir(suscriptores, args.n) * 1e6:>10,.1f} µs/devolución")
+    print(bioalert.metricas())
+    bioalert.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark de GET /libros/buscar/{nombre_autor} a nivel de MemoryDB.
+
+Compara la búsqueda con índice de trigramas contra el recorrido completo
+de libros que se usaba antes, para catálogos de 1k a 1M libros.
+
+Uso: python -m benchmarks.bench_busqueda_autor [--tamanios 1000 10000 ...]
+"""
+import argparse
+import random
+import string
+import time
+from datetime import date
+
+from app.services.database import MemoryDB
+
+LIBROS_POR_AUTOR = 10
+CONSULTA = "somerville"
+
+
+def poblar(n_libros: int) -> MemoryDB:
+    rnd = random.Random(42)
+    memdb = MemoryDB()
+    n_autores = max(1, n_libros // LIBROS_POR_AUTOR)
+    for _ in range(n_autores - 1):
+        nombre = " ".join(
+            "".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(4, 9))).title()
+            for _ in range(2)
+        )
+        memdb.create_autor(nombre, date(1950, 1, 1))
+    memdb.create_autor("Ian Somerville", date(1951, 2, 23))
+    for i in range(n_libros):
+        memdb.create_libro(f"Libro {i}", 2000, rnd.randint(1, n_autores))
+    return memdb
+
+
+def busqueda_lineal(memdb: MemoryDB, nombre_autor: str):
+    """Implementación previa: recorre todos los libros"""
+    libros_autor = []
+    for libro in memdb.libros.values():
+        autor = memdb.autores.get(libro["autor_id"])
+        if autor and nombre_autor.lower() in autor["nombre"].lower():
+            libros_autor.append(libro)
+    return libros_autor
+
+
+def medir(fn, repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanios", type=int, nargs="+",
+                        default=[1_000, 10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'libros':>10} {'resultados':>10} {'lineal (ms)':>12} {'índice (ms)':>12}")
+    for n in args.tamanios:
+        memdb = poblar(n)
+        esperado = busqueda_lineal(memdb, CONSULTA)
+        assert memdb.get_libros_by_autor(CONSULTA) == esperado
+        repeticiones = max(1, 100_000 // n)
+        lineal = medir(lambda: busqueda_lineal(memdb, CONSULTA), repeticiones)
+        indice = medir(lambda: memdb.get_libros_by_autor(CONSULTA), 1000)
+        print(f"{n:>10} {len(esperado):>10} {lineal * 1000:>12.3f} {indice * 1000:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Tiempo de importación masiva de copias vía POST /copias/lote.
+
+Sube `--n` copias como NDJSON y como arreglo JSON contra la app completa
+(TestClient, backend configurado por BIBLIOTECA_STORAGE) y reporta el
+tiempo total y las filas por segundo.
+
+Uso: python -m benchmarks.bench_importacion [--n 1000000]
+"""
+import argparse
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app.services.database import db
+from main import app
+
+
+def importar(client: TestClient, nombre: str, cuerpo: bytes, content_type: str, n: int):
+    inicio = time.perf_counter()
+    response = client.post("/copias/lote", content=cuerpo, headers={"Content-Type": content_type})
+    segundos = time.perf_counter() - inicio
+    assert response.status_code == 201, response.text[:500]
+    assert response.json()["creados"] == n
+    print(f"  {nombre:<12} {segundos:>8.2f} s  {n / segundos:>12,.0f} filas/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    fila = json.dumps({"libro_id": 1})
+    ndjson = ((fila + "\n") * args.n).encode()
+    arreglo = ("[" + ",".join([fila] * args.n) + "]").encode()
+
+    print(f"{args.n:,} copias")
+    for nombre, cuerpo, content_type in (("ndjson", ndjson, "application/x-ndjson"),
+                                         ("json", arreglo, "application/json")):
+        db.reset()
+        autor = client.post("/autores/", json={"nombre": "Autor", "fecha_nacimiento": "1950-01-01"}).json()
+        client.post("/libros/", json={"nombre": "Libro", "anio": 2015, "autor_id": autor["id"]})
+        importar(client, nombre, cuerpo, content_type, args.n)
+
+
+if __name__ == "__main__":
+    main()
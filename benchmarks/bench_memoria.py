@@ -0,0 +1,74 @@
+"""Memoria residente por fila de copias y préstamos en MemoryDB.
+
+Compara las filas compactas (app/services/registros.py) con el formato
+anterior de un dict por fila, medido con tracemalloc. Solo cuenta las
+filas y el dict id -> fila, no los índices secundarios.
+
+Uso: python -m benchmarks.bench_memoria [--n 1000000]
+"""
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app.models.schemas import EstadoCopia
+from app.services.registros import FilaCopia, FilaPrestamo, PLAZO_PRESTAMO
+
+
+def medir(construir) -> int:
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    resultado = construir()
+    despues = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del resultado
+    return despues - antes
+
+
+def copias_dict(n: int):
+    return {i: {"id": i, "libro_id": 1, "estado": EstadoCopia.EN_BIBLIOTECA} for i in range(1, n + 1)}
+
+
+def prestamos_dict(n: int):
+    filas = {}
+    for i in range(1, n + 1):
+        fecha = datetime.now()
+        filas[i] = {
+            "id": i,
+            "lector_id": i,
+            "copia_id": i,
+            "fecha_prestamo": fecha,
+            "fecha_devolucion_esperada": fecha + timedelta(days=30),
+            "fecha_devolucion_real": None
+        }
+    return filas
+
+
+def copias_fila(n: int):
+    return {i: FilaCopia(i, 1, EstadoCopia.EN_BIBLIOTECA) for i in range(1, n + 1)}
+
+
+def prestamos_fila(n: int):
+    filas = {}
+    for i in range(1, n + 1):
+        fecha = datetime.now()
+        filas[i] = FilaPrestamo(i, i, i, fecha, fecha + PLAZO_PRESTAMO)
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{'colección':<12} {'dict (B/fila)':>14} {'Fila (B/fila)':>14}")
+    for nombre, antes, despues in (("copias", copias_dict, copias_fila),
+                                   ("préstamos", prestamos_dict, prestamos_fila)):
+        bytes_antes = medir(lambda: antes(args.n)) / args.n
+        bytes_despues = medir(lambda: despues(args.n)) / args.n
+        print(f"{nombre:<12} {bytes_antes:>14.0f} {bytes_despues:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Costo del WAL de MemoryDBPersistente y tiempo de recuperación.
+
+Mide la latencia por préstamo (create_prestamo + update_estado_copia) con
+y sin log, y cuánto tarda en reabrirse una base de N copias recuperando
+solo desde el log y desde un snapshot.
+
+Uso: python -m benchmarks.bench_persistencia [--n 1000000]
+"""
+import argparse
+import tempfile
+import time
+from datetime import date
+
+from app.models.schemas import EstadoCopia
+from app.services.database import MemoryDB
+from app.services.persistencia import MemoryDBPersistente
+
+
+def latencia_prestamo(backend, n: int) -> float:
+    autor = backend.create_autor("Ian Somerville", date(1951, 2, 23))
+    libro = backend.create_libro("Software Engineering", 2015, autor["id"])
+    lector = backend.create_lector("Juan Estudiante", "juan@example.com")
+    copias = [backend.create_copia(libro["id"])["id"] for _ in range(n)]
+    inicio = time.perf_counter()
+    for copia_id in copias:
+        backend.create_prestamo(lector["id"], copia_id)
+        backend.update_estado_copia(copia_id, EstadoCopia.PRESTADA)
+    return (time.perf_counter() - inicio) / n * 1e6
+
+
+def reabrir(directorio: str) -> float:
+    inicio = time.perf_counter()
+    backend = MemoryDBPersistente(directorio)
+    transcurrido = time.perf_counter() - inicio
+    backend.close()
+    return transcurrido
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--ops", type=int, default=50_000)
+    args = parser.parse_args()
+
+    print("Latencia por préstamo (µs)")
+    print(f"  MemoryDB               {latencia_prestamo(MemoryDB(), args.ops):8.2f}")
+    for intervalo in (0.05, 0.0):
+        backend = MemoryDBPersistente(tempfile.mkdtemp(), intervalo_fsync=intervalo, snapshot_cada=10**9)
+        etiqueta = f"WAL fsync cada {intervalo * 1000:.0f} ms" if intervalo else "WAL fsync por operación"
+        ops = args.ops if intervalo else min(args.ops, 2_000)
+        print(f"  {etiqueta:<22} {latencia_prestamo(backend, ops):8.2f}")
+        backend.close()
+
+    directorio = tempfile.mkdtemp()
+    backend = MemoryDBPersistente(directorio, snapshot_cada=10**9)
+    autor = backend.create_autor("Ian Somerville", date(1951, 2, 23))
+    libro = backend.create_libro("Software Engineering", 2015, autor["id"])
+    for _ in range(args.n):
+        backend.create_copia(libro["id"])
+    backend.close()
+    print(f"Recuperación de {args.n:,} copias")
+    print(f"  solo log               {reabrir(directorio):8.2f} s")
+
+    backend = MemoryDBPersistente(directorio, snapshot_cada=10**9)
+    backend.crear_snapshot()
+    backend.close()
+    print(f"  snapshot               {reabrir(directorio):8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark de serialización de respuestas: costo por cada 10k filas.
+
+Compara el camino de response_model (validar cada fila contra el esquema,
+volcarla a objetos de Python y codificarla con json o con orjson) contra
+`volcar`, que escribe las filas de la base directo a bytes con los
+adaptadores precompilados de app.models.serializacion.
+
+Uso: python -m benchmarks.bench_serializacion [--filas 10000] [--repeticiones 20]
+"""
+import argparse
+import json
+import time
+from datetime import date
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+
+from app.models.schemas import Copia, Lector, Prestamo
+from app.models.serializacion import precompilar, volcar
+from app.services.database import MemoryDB
+
+
+def poblar(n: int) -> MemoryDB:
+    memdb = MemoryDB()
+    memdb.create_autor("Autor", date(1950, 1, 1))
+    memdb.create_libro("Libro", 2000, 1)
+    memdb.create_copias([1] * n)
+    memdb.create_lectores([(f"Lector {i}", f"lector{i}@example.com") for i in range(n)])
+    for i in range(1, n + 1):
+        memdb.create_prestamo(i, i)
+    return memdb
+
+
+def response_model(modelo: type, dumps):
+    """Lo que hace FastAPI con response_model=List[modelo]: validar, volcar a Python y codificar"""
+    adaptador = TypeAdapter(List[modelo])
+    return lambda filas: dumps(adaptador.dump_python(adaptador.validate_python(filas, from_attributes=True), mode="json"))
+
+
+def json_dumps(contenido) -> bytes:
+    # Igual que fastapi.responses.JSONResponse.render
+    return json.dumps(contenido, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def medir(fn, repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=10_000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    memdb = poblar(args.filas)
+    colecciones = [
+        (Prestamo, memdb.get_all_prestamos()),
+        (Lector, memdb.get_all_lectores()),
+        (Copia, memdb.get_all_copias()),
+    ]
+    precompilar(*(modelo for modelo, _ in colecciones))
+    escala = 1000 * 10_000 / args.filas
+
+    print(f"{'esquema':>10} {'json (ms)':>10} {'orjson (ms)':>12} {'volcar (ms)':>12} {'mejora':>8}")
+    for modelo, filas in colecciones:
+        con_json = response_model(modelo, json_dumps)
+        con_orjson = response_model(modelo, orjson.dumps)
+        assert json.loads(volcar(modelo, filas)) == json.loads(con_json(filas))
+        antes = medir(lambda: con_json(filas), args.repeticiones)
+        orj = medir(lambda: con_orjson(filas), args.repeticiones)
+        despues = medir(lambda: volcar(modelo, filas), args.repeticiones)
+        print(f"{modelo.__name__:>10} {antes * escala:>10.2f} {orj * escala:>12.2f} "
+              f"{despues * escala:>12.2f} {antes / despues:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,57 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import autores, libros, copias, lectores, prestamos, bioalert
+from fastapi.responses import ORJSONResponse
+from app.routers import autores, libros, copias, lectores, prestamos, reservas, bioalert, export, metricas, perfilado
+from app.services.database import db
+from app.services.bioalert import bioalert as bioalert_service
+from app.services.vencimientos import planificador
+from app.services.reservas import reservas as cola_reservas
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Agenda los vencimientos de los préstamos activos ya persistidos
+    planificador.cargar_activos()
+    # Las listas de espera no se persisten: las copias apartadas vuelven al estante
+    cola_reservas.liberar_huerfanas()
+    yield
+    planificador.detener()
+    cola_reservas.detener()
+    # Termina los envíos de BioAlert en curso antes de cerrar la base
+    bioalert_service.cerrar()
+    # Vuelca a disco lo pendiente (log de MemoryDB, conexiones SQLite)
+    db.close()
+
 
 app = FastAPI(
     title="Sistema de Biblioteca",
     description="API REST para gestión de biblioteca con sistema BioAlert",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Las rutas que siguen usando response_model codifican con orjson en vez de json
+    default_response_class=ORJSONResponse
 )
 
+# Perfilado a pedido (BIBLIOTECA_PERFILADO=1); queda dentro de la medición de latencia
+app.add_middleware(perfilado.Perfilar)
+# Latencia por ruta para /metrics
+app.add_middleware(metricas.MedirLatencia)
+
 # Incluir routerss
 app.include_router(autores.router)
 app.include_router(libros.router)
 app.include_router(copias.router)
 app.include_router(lectores.router)
 app.include_router(prestamos.router)
+app.include_router(reservas.router)
 app.include_router(bioalert.router)
+app.include_router(export.router)
+app.include_router(metricas.router)
+app.include_router(perfilado.router)
 
 
 @app.get("/")
-def root():
+async def root():
     return {
         "message": "Sistema de Biblioteca API",
         "endpoints": {
@@ -26,7 +60,10 @@ def root():
             "copias": "/copias",
             "lectores": "/lectores",
             "prestamos": "/prestamos",
-            "bioalert": "/bioalert"
+            "reservas": "/reservas",
+            "bioalert": "/bioalert",
+            "export": "/export/{coleccion}",
+            "metrics": "/metrics"
         },
         "docs": "/docs"
     }
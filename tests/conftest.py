@@ -1,4 +1,11 @@
+import os
+import tempfile
 import pytest
+
+# BIBLIOTECA_STORAGE=sqlite ejecuta toda la suite contra el backend SQLite
+if os.environ.get("BIBLIOTECA_STORAGE") == "sqlite":
+    os.environ.setdefault("BIBLIOTECA_SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "test.db"))
+
 from fastapi.testclient import TestClient
 from main import app
 from app.services.database import db, MemoryDB
@@ -8,25 +15,24 @@ from app.services.bioalert import BioAlert
 @pytest.fixture(autouse=True)
 def reset_database():
     """Resetea la base de datos antes de cada test"""
-    # Limpiar la base de datos
-    db.autores.clear()
-    db.libros.clear()
-    db.copias.clear()
-    db.lectores.clear()
-    db.prestamos.clear()
-    db.suscripciones.clear()
-
-    # Resetear contadores
-    db.autor_counter = 1
-    db.libro_counter = 1
-    db.copia_counter = 1
-    db.lector_counter = 1
-    db.prestamo_counter = 1
-    db.suscripcion_counter = 1
-
-    # Limpiar notificaciones de BioAlert
+    # Limpiar la base de datos (colecciones, índices y contadores)
+    db.reset()
+
+    # Limpiar notificaciones de BioAlert (tras terminar los envíos pendientes)
     from app.services.bioalert import bioalert
-    bioalert.notificaciones.clear()
+    bioalert.reset()
+
+    # Olvidar los vencimientos agendados por tests anteriores
+    from app.services.vencimientos import planificador
+    planificador.reset()
+
+    # Vaciar las listas de espera y sus plazos de retiro
+    from app.services.reservas import reservas
+    reservas.reset()
+
+    # Descartar los fragmentos del catálogo (los ids se reutilizan tras el reset)
+    from app.services.catalogo import vista_libros
+    vista_libros.reset()
 
     yield
 
@@ -54,3 +54,27 @@ def test_get_autor_not_found(client):
     response = client.get("/autores/999")
     assert response.status_code == 404
     assert response.json()["detail"] == "Autor no encontrado"
+
+
+def test_get_autores_paginado(client):
+    """Test recorrer autores por páginas con cursor"""
+    for i in range(5):
+        client.post("/autores/", json={"nombre": f"Autor {i}", "fecha_nacimiento": "1950-01-01"})
+
+    response = client.get("/autores/", params={"limit": 2})
+    assert response.status_code == 200
+    assert [a["id"] for a in response.json()] == [1, 2]
+    assert response.headers["X-Next-Cursor"] == "2"
+
+    response = client.get("/autores/", params={"limit": 2, "after_id": 2})
+    assert [a["id"] for a in response.json()] == [3, 4]
+
+    response = client.get("/autores/", params={"limit": 2, "after_id": 4})
+    assert [a["id"] for a in response.json()] == [5]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_autores_limit_invalido(client):
+    """Test tamaño de página fuera de rango"""
+    assert client.get("/autores/", params={"limit": 0}).status_code == 422
+    assert client.get("/autores/", params={"limit": 100000}).status_code == 422
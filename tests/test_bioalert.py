@@ -1,3 +1,6 @@
+import asyncio
+import json
+import threading
 import pytest
 from fastapi.testclient import TestClient
 
@@ -220,3 +223,214 @@ def test_notificacion_al_devolver_libro(client):
     notif_disponibilidad = [n for n in notificaciones if "disponible" in n["mensaje"]]
     assert len(notif_disponibilidad) >= 1
     assert any(n["email"] == "suscrito@example.com" for n in notif_disponibilidad)
+
+
+def test_get_notificaciones_paginado(client):
+    """Test recorrer el historial de notificaciones por páginas"""
+    autor = client.post(
+        "/autores/",
+        json={"nombre": "Test Autor", "fecha_nacimiento": "1950-01-01"}
+    ).json()
+    libro = client.post(
+        "/libros/",
+        json={"nombre": "Test Libro", "anio": 2015, "autor_id": autor["id"]}
+    ).json()
+    for i in range(3):
+        lector = client.post(
+            "/lectores/",
+            json={"nombre": f"Lector {i}", "email": f"lector{i}@example.com"}
+        ).json()
+        client.post("/bioalert/suscribir", json={"lector_id": lector["id"], "libro_id": libro["id"]})
+
+    response = client.get("/bioalert/notificaciones", params={"limit": 2})
+    pagina = response.json()["notificaciones"]
+    assert [n["email"] for n in pagina] == ["lector0@example.com", "lector1@example.com"]
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("/bioalert/notificaciones", params={"limit": 2, "after_id": cursor})
+    assert [n["email"] for n in response.json()["notificaciones"]] == ["lector2@example.com"]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_envios_en_segundo_plano_respetan_orden(client):
+    """Test: los envíos no bloquean a quien notifica y se publican en el orden en que se encolaron"""
+    from app.services.bioalert import bioalert
+    liberar = threading.Event()
+
+    def lento():
+        liberar.wait(5)
+        yield "lento@example.com", "Libro", "primero"
+
+    bioalert.encolar_envios(lento)
+    for i in range(5):
+        bioalert.notificar(f"rapido{i}@example.com", "Libro", "después")
+
+    # Nada se publica mientras la primera tarea no termina
+    assert not bioalert.esperar(timeout=0.05)
+    assert bioalert.get_notificaciones() == []
+
+    liberar.set()
+    notificaciones = client.get("/bioalert/notificaciones").json()["notificaciones"]
+    assert [n["email"] for n in notificaciones] == ["lento@example.com"] + [f"rapido{i}@example.com" for i in range(5)]
+    assert [n["id"] for n in notificaciones] == list(range(1, 7))
+
+
+def test_metricas_cola(client):
+    """Test: las métricas reflejan lo encolado y lo completado"""
+    from app.services.bioalert import bioalert
+    antes = client.get("/bioalert/metricas").json()
+    bioalert.notificar("a@example.com", "Libro", "mensaje")
+    bioalert.esperar()
+
+    metricas = client.get("/bioalert/metricas").json()
+    assert metricas["encoladas"] == antes["encoladas"] + 1
+    assert metricas["completadas"] == metricas["encoladas"]
+    assert metricas["en_cola"] == 0
+    assert metricas["trabajadores"] >= 1
+    assert metricas["latencia_maxima_ms"] >= metricas["latencia_promedio_ms"] >= 0
+
+
+def test_historial_acotado_e_indexado(tmp_path):
+    """Test: el historial conserva las últimas N, mantiene los índices y derrama las antiguas a disco"""
+    from app.services.bioalert import HistorialNotificaciones
+    archivo = tmp_path / "historial.log"
+    historial = HistorialNotificaciones(4, str(archivo))
+    for i in range(6):
+        historial.agregar(f"lector{i % 2}@example.com", f"Libro {i % 3}", f"mensaje {i}")
+
+    assert len(historial) == 4
+    assert [n["id"] for n in historial.consultar()] == [3, 4, 5, 6]
+    assert [n["id"] for n in historial.consultar(email="lector0@example.com")] == [3, 5]
+    assert [n["id"] for n in historial.consultar(libro="Libro 0")] == [4]
+    assert [n["id"] for n in historial.consultar(email="lector1@example.com", libro="Libro 0")] == [4]
+    assert [n["id"] for n in historial.consultar(after_id=4, limit=1)] == [5]
+    assert historial.consultar(email="nadie@example.com") == []
+
+    corte = historial.consultar()[2]["fecha"]
+    assert [n["id"] for n in historial.consultar(since=corte)][0] <= 5
+
+    historial.cerrar()
+    derramadas = [json.loads(linea) for linea in archivo.read_text(encoding="utf-8").splitlines()]
+    assert [n["id"] for n in derramadas] == [1, 2]
+    assert derramadas[0]["mensaje"] == "mensaje 0"
+
+
+def test_get_notificaciones_filtradas(client):
+    """Test filtrar el historial por email, libro y fecha"""
+    from app.services.bioalert import bioalert
+    bioalert.notificar("ana@example.com", "Libro A", "uno")
+    bioalert.notificar("luis@example.com", "Libro A", "dos")
+    bioalert.notificar("ana@example.com", "Libro B", "tres")
+
+    def mensajes(**params):
+        response = client.get("/bioalert/notificaciones", params=params)
+        return [n["mensaje"] for n in response.json()["notificaciones"]]
+
+    assert mensajes(email="ana@example.com") == ["uno", "tres"]
+    assert mensajes(libro="Libro A") == ["uno", "dos"]
+    assert mensajes(email="ana@example.com", libro="Libro B") == ["tres"]
+    assert mensajes(email="ana@example.com", limit=1, after_id=1) == ["tres"]
+    assert mensajes(since="2999-01-01T00:00:00") == []
+    assert mensajes(since="2999-01-01T00:00:00Z") == []
+    assert mensajes(since="2020-01-01T00:00:00+00:00") == ["uno", "dos", "tres"]
+
+
+def crear_libro_y_lector(client):
+    """Helper para crear un autor con un libro y un lector"""
+    autor = client.post(
+        "/autores/",
+        json={"nombre": "Test Autor", "fecha_nacimiento": "1950-01-01"}
+    ).json()
+    libro = client.post(
+        "/libros/",
+        json={"nombre": "Test Libro", "anio": 2015, "autor_id": autor["id"]}
+    ).json()
+    lector = client.post(
+        "/lectores/",
+        json={"nombre": "Test Lector", "email": "test@example.com"}
+    ).json()
+    return libro, lector
+
+
+def test_suscripcion_duplicada(client):
+    """Test: suscribirse dos veces al mismo libro devuelve 409"""
+    libro, lector = crear_libro_y_lector(client)
+    body = {"lector_id": lector["id"], "libro_id": libro["id"]}
+
+    assert client.post("/bioalert/suscribir", json=body).status_code == 201
+    response = client.post("/bioalert/suscribir", json=body)
+    assert response.status_code == 409
+    assert len(client.get(f"/bioalert/suscripciones/libro/{libro['id']}").json()) == 1
+
+
+def test_cancelar_suscripcion(client):
+    """Test darse de baja de una suscripción"""
+    libro, lector = crear_libro_y_lector(client)
+    suscripcion = client.post(
+        "/bioalert/suscribir",
+        json={"lector_id": lector["id"], "libro_id": libro["id"]}
+    ).json()
+
+    assert client.delete(f"/bioalert/suscripciones/{suscripcion['id']}").status_code == 204
+    assert client.get(f"/bioalert/suscripciones/libro/{libro['id']}").json() == []
+    assert client.delete(f"/bioalert/suscripciones/{suscripcion['id']}").status_code == 404
+
+
+def test_suscripcion_una_vez_expira_tras_el_aviso(client):
+    """Test: una suscripción de un solo aviso se elimina al notificar la disponibilidad"""
+    libro, lector = crear_libro_y_lector(client)
+    copia = client.post("/copias/", json={"libro_id": libro["id"]}).json()
+    client.post("/bioalert/suscribir", json={"lector_id": lector["id"], "libro_id": libro["id"], "una_vez": True})
+
+    for _ in range(2):
+        prestamo = client.post("/prestamos/", json={"lector_id": lector["id"], "copia_id": copia["id"]}).json()
+        client.post(f"/prestamos/{prestamo['id']}/devolver")
+
+    avisos = client.get("/bioalert/notificaciones", params={"email": "test@example.com"}).json()["notificaciones"]
+    assert len([n for n in avisos if "ahora disponible" in n["mensaje"]]) == 1
+    assert client.get(f"/bioalert/suscripciones/libro/{libro['id']}").json() == []
+
+
+def test_esperar_async(client):
+    """Test: esperar_async vuelve en el acto sin pendientes y respeta el timeout con un envío en curso"""
+    from app.services.bioalert import bioalert
+    assert asyncio.run(bioalert.esperar_async()) is True
+
+    liberar = threading.Event()
+    bioalert.encolar_envios(lambda: liberar.wait() and [("a@example.com", "Libro", "mensaje")])
+    assert asyncio.run(bioalert.esperar_async(timeout=0.05)) is False
+    liberar.set()
+    assert asyncio.run(bioalert.esperar_async(timeout=5)) is True
+    assert bioalert.get_notificaciones(email="a@example.com")
+
+
+def test_cola_llena_desde_handler_en_event_loop(client, monkeypatch):
+    """Test: si la cola se llena con el handler ya en el event loop, sus envíos esperan lugar y se entregan todos"""
+    from app.services.bioalert import bioalert
+    libro, lector = crear_libro_y_lector(client)
+    liberar = threading.Event()
+    for _ in range(bioalert.trabajadores):
+        bioalert.encolar_envios(lambda: liberar.wait() and [])
+    while bioalert.metricas()["en_cola"]:
+        liberar.wait(0.001)
+    for i in range(bioalert.capacidad):
+        bioalert.notificar(f"relleno{i}@example.com", "Libro", "mensaje")
+    assert bioalert.saturada()
+
+    # La cola se llenó entre el despacho y el encolado: el handler corre igual en el event loop
+    monkeypatch.setattr(bioalert, "saturada", lambda: False)
+    respuestas = []
+    hilo = threading.Thread(target=lambda: respuestas.append(
+        client.post("/bioalert/suscribir", json={"lector_id": lector["id"], "libro_id": libro["id"]})
+    ))
+    hilo.start()
+    hilo.join(0.2)
+    assert hilo.is_alive()
+    liberar.set()
+    hilo.join(10)
+
+    assert respuestas[0].status_code == 201
+    assert bioalert.esperar(timeout=10)
+    notificaciones = bioalert.get_notificaciones()
+    assert len(notificaciones) == bioalert.capacidad + 1
+    assert notificaciones[-1]["email"] == "test@example.com"
@@ -0,0 +1,159 @@
+import asyncio
+import random
+import sys
+import threading
+import pytest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from fastapi import HTTPException
+from app.models.schemas import EstadoCopia
+from app.services.database import db
+from app.routers.asincrono import asincrono
+from app.services.prestamo_service import realizar_prestamo, realizar_prestamos, devolver_libro
+
+HILOS = 32
+
+
+@pytest.fixture(autouse=True)
+def intercalado_agresivo():
+    """Cambia de hilo mucho más seguido para provocar carreras"""
+    anterior = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(anterior)
+
+
+def intentar(fn, *args):
+    try:
+        return fn(*args)
+    except HTTPException:
+        return None
+
+
+def en_paralelo(fn, argumentos):
+    """Ejecuta fn sobre cada argumento en HILOS hilos que arrancan a la vez"""
+    barrera = threading.Barrier(HILOS)
+    lotes = [argumentos[i::HILOS] for i in range(HILOS)]
+
+    def trabajar(lote):
+        barrera.wait()
+        return [fn(arg) for arg in lote]
+
+    with ThreadPoolExecutor(HILOS) as pool:
+        return [r for resultados in pool.map(trabajar, lotes) for r in resultados]
+
+
+def crear_catalogo(n_copias: int, n_lectores: int):
+    autor = db.create_autor("Ian Somerville", date(1951, 2, 23))
+    libro = db.create_libro("Software Engineering", 2015, autor["id"])
+    copias = [db.create_copia(libro["id"])["id"] for _ in range(n_copias)]
+    lectores = [db.create_lector(f"Lector {i}", f"l{i}@example.com")["id"] for i in range(n_lectores)]
+    return libro, copias, lectores
+
+
+def verificar_invariantes(libro, copias, lectores):
+    activos = [p for p in db.get_all_prestamos() if p["fecha_devolucion_real"] is None]
+
+    # Ninguna copia prestada dos veces
+    por_copia = Counter(p["copia_id"] for p in activos)
+    assert all(cantidad == 1 for cantidad in por_copia.values())
+
+    # Ningún lector supera los 3 libros
+    for lector_id in lectores:
+        assert len(db.get_prestamos_activos_by_lector(lector_id)) <= 3
+
+    # El estado de cada copia coincide con sus préstamos activos
+    for copia_id in copias:
+        esperado = EstadoCopia.PRESTADA if copia_id in por_copia else EstadoCopia.EN_BIBLIOTECA
+        assert db.get_copia(copia_id)["estado"] == esperado
+
+    disponibilidad = db.get_disponibilidad_libro(libro["id"])
+    assert disponibilidad[EstadoCopia.PRESTADA] == len(activos)
+    assert disponibilidad[EstadoCopia.EN_BIBLIOTECA] == len(copias) - len(activos)
+
+
+def test_prestamos_concurrentes_misma_copia():
+    """Test: de muchos préstamos simultáneos de una copia solo uno prospera"""
+    libro, copias, lectores = crear_catalogo(1, 200)
+
+    resultados = en_paralelo(lambda l: intentar(realizar_prestamo, l, copias[0]), lectores)
+
+    assert len([r for r in resultados if r is not None]) == 1
+    verificar_invariantes(libro, copias, lectores)
+
+
+def test_prestamos_concurrentes_mismo_lector():
+    """Test: un lector no supera 3 libros aunque los pida a la vez"""
+    libro, copias, lectores = crear_catalogo(50, 1)
+
+    resultados = en_paralelo(lambda c: intentar(realizar_prestamo, lectores[0], c), copias)
+
+    assert len([r for r in resultados if r is not None]) == 3
+    verificar_invariantes(libro, copias, lectores)
+
+
+def test_miles_de_prestamos_y_devoluciones_concurrentes():
+    """Test: con préstamos y devoluciones mezclados se mantienen las reglas"""
+    libro, copias, lectores = crear_catalogo(100, 150)
+    rnd = random.Random(7)
+    operaciones = [(rnd.choice(lectores), rnd.choice(copias)) for _ in range(4000)]
+
+    def operar(op):
+        lector_id, copia_id = op
+        prestamo = intentar(realizar_prestamo, lector_id, copia_id)
+        if prestamo is not None and prestamo["id"] % 2 == 0:
+            intentar(devolver_libro, prestamo["id"])
+        return prestamo
+
+    en_paralelo(operar, operaciones)
+
+    verificar_invariantes(libro, copias, lectores)
+
+
+def test_lotes_concurrentes_mismo_lector():
+    """Test: lotes simultáneos de un lector se prestan completos o no se prestan"""
+    libro, copias, lectores = crear_catalogo(60, 1)
+    lotes = [copias[i:i + 2] for i in range(0, len(copias), 2)]
+
+    resultados = en_paralelo(lambda lote: intentar(realizar_prestamos, lectores[0], lote), lotes)
+
+    exitosos = [r for r in resultados if r is not None]
+    assert len(exitosos) == 1 and len(exitosos[0]) == 2
+    verificar_invariantes(libro, copias, lectores)
+
+
+def test_devoluciones_concurrentes_del_mismo_prestamo():
+    """Test: un préstamo solo puede devolverse una vez"""
+    libro, copias, lectores = crear_catalogo(1, 1)
+    prestamo = realizar_prestamo(lectores[0], copias[0])
+
+    resultados = en_paralelo(lambda _: intentar(devolver_libro, prestamo["id"]), list(range(100)))
+
+    assert len([r for r in resultados if r is not None]) == 1
+    verificar_invariantes(libro, copias, lectores)
+
+
+def test_ids_unicos_con_altas_concurrentes():
+    """Test: la asignación de ids no repite valores entre hilos"""
+    lectores = en_paralelo(lambda i: db.create_lector(f"L{i}", f"l{i}@example.com")["id"], list(range(2000)))
+
+    assert sorted(lectores) == list(range(1, 2001))
+
+
+def test_handlers_async_fuera_del_pool_salvo_almacenamiento_bloqueante(monkeypatch):
+    """Test: un handler corre en el event loop con MemoryDB y en el pool de hilos si el almacenamiento bloquea"""
+    @asincrono
+    def handler(valor):
+        return valor, threading.get_ident()
+
+    async def llamar():
+        return await handler(1), threading.get_ident()
+
+    monkeypatch.setattr(db, "bloqueante", False)
+    (valor, hilo_handler), hilo_bucle = asyncio.run(llamar())
+    assert valor == 1 and hilo_handler == hilo_bucle
+
+    monkeypatch.setattr(db, "bloqueante", True)
+    (valor, hilo_handler), hilo_bucle = asyncio.run(llamar())
+    assert valor == 1 and hilo_handler != hilo_bucle
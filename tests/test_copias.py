@@ -157,3 +157,21 @@ def test_update_estado_copia_inexistente(client):
     response = client.put("/copias/999/estado?estado=prestada")
     assert response.status_code == 404
     assert response.json()["detail"] == "Copia no encontrada"
+
+
+def test_get_copias_by_libro_condicional(client):
+    """Test: el ETag de las copias de un libro solo cambia con las copias de ese libro"""
+    autor = client.post("/autores/", json={"nombre": "Test Autor", "fecha_nacimiento": "1950-01-01"}).json()
+    libro = client.post("/libros/", json={"nombre": "Libro 1", "anio": 2015, "autor_id": autor["id"]}).json()
+    otro = client.post("/libros/", json={"nombre": "Libro 2", "anio": 2016, "autor_id": autor["id"]}).json()
+    copia = client.post("/copias/", json={"libro_id": libro["id"]}).json()
+
+    etag = client.get(f"/copias/libro/{libro['id']}").headers["ETag"]
+    client.post("/copias/", json={"libro_id": otro["id"]})
+    response = client.get(f"/copias/libro/{libro['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.put(f"/copias/{copia['id']}/estado", params={"estado": "en_reparacion"})
+    response = client.get(f"/copias/libro/{libro['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["estado"] == "en_reparacion"
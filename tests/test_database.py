@@ -0,0 +1,349 @@
+import pickle
+import sqlite3
+import pytest
+from datetime import date, datetime, timedelta
+from app.services.database import MemoryDB
+from app.services.sqlite_db import SQLiteDB
+from app.services.registros import FilaAutor, FilaPrestamo, PLAZO_PRESTAMO, dias_restantes
+from app.models.schemas import EstadoCopia
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def memdb(request, tmp_path):
+    """Backend de almacenamiento aislado del singleton global"""
+    if request.param == "memory":
+        yield MemoryDB()
+    else:
+        backend = SQLiteDB(str(tmp_path / "test.db"))
+        yield backend
+        backend.close()
+
+
+def crear_catalogo(memdb):
+    """Helper para crear autor, dos libros y un lector"""
+    autor = memdb.create_autor("Ian Somerville", date(1951, 2, 23))
+    libro1 = memdb.create_libro("Software Engineering", 2015, autor["id"])
+    libro2 = memdb.create_libro("Requirements Engineering", 1997, autor["id"])
+    lector = memdb.create_lector("Juan Estudiante", "juan@example.com")
+    return {"autor": autor, "libro1": libro1, "libro2": libro2, "lector": lector}
+
+
+def test_indice_copias_por_libro(memdb):
+    """Test: las copias se obtienen por libro sin mezclar libros"""
+    data = crear_catalogo(memdb)
+    c1 = memdb.create_copia(data["libro1"]["id"])
+    c2 = memdb.create_copia(data["libro2"]["id"])
+    c3 = memdb.create_copia(data["libro1"]["id"])
+
+    assert [c["id"] for c in memdb.get_copias_by_libro(data["libro1"]["id"])] == [c1["id"], c3["id"]]
+    assert [c["id"] for c in memdb.get_copias_by_libro(data["libro2"]["id"])] == [c2["id"]]
+    assert memdb.get_copias_by_libro(999) == []
+
+
+def test_indice_copias_refleja_cambio_de_estado(memdb):
+    """Test: el índice devuelve la copia con su estado actualizado"""
+    data = crear_catalogo(memdb)
+    copia = memdb.create_copia(data["libro1"]["id"])
+
+    memdb.update_estado_copia(copia["id"], EstadoCopia.EN_REPARACION)
+
+    copias = memdb.get_copias_by_libro(data["libro1"]["id"])
+    assert copias[0]["estado"] == EstadoCopia.EN_REPARACION
+
+
+def test_indice_prestamos_activos_por_lector(memdb):
+    """Test: devolver un préstamo lo saca de los activos del lector"""
+    data = crear_catalogo(memdb)
+    c1 = memdb.create_copia(data["libro1"]["id"])
+    c2 = memdb.create_copia(data["libro2"]["id"])
+    p1 = memdb.create_prestamo(data["lector"]["id"], c1["id"])
+    p2 = memdb.create_prestamo(data["lector"]["id"], c2["id"])
+
+    assert len(memdb.get_prestamos_activos_by_lector(data["lector"]["id"])) == 2
+
+    memdb.devolver_prestamo(p1["id"])
+    activos = memdb.get_prestamos_activos_by_lector(data["lector"]["id"])
+    assert [p["id"] for p in activos] == [p2["id"]]
+
+    # Devolver dos veces no rompe el índice
+    memdb.devolver_prestamo(p1["id"])
+    assert len(memdb.get_prestamos_activos_by_lector(data["lector"]["id"])) == 1
+
+
+def test_indice_suscripciones_por_libro(memdb):
+    """Test: eliminar una suscripción la saca del índice del libro"""
+    data = crear_catalogo(memdb)
+    s1 = memdb.create_suscripcion(data["lector"]["id"], data["libro1"]["id"])
+    s2 = memdb.create_suscripcion(data["lector"]["id"], data["libro2"]["id"])
+
+    assert [s["id"] for s in memdb.get_suscripciones_by_libro(data["libro1"]["id"])] == [s1["id"]]
+
+    assert memdb.delete_suscripcion(s1["id"]) is True
+    assert memdb.get_suscripciones_by_libro(data["libro1"]["id"]) == []
+    assert [s["id"] for s in memdb.get_suscripciones_by_libro(data["libro2"]["id"])] == [s2["id"]]
+    assert memdb.delete_suscripcion(s1["id"]) is False
+
+
+def test_reset_limpia_indices(memdb):
+    """Test: reset deja la base vacía, incluidos índices y contadores"""
+    data = crear_catalogo(memdb)
+    copia = memdb.create_copia(data["libro1"]["id"])
+    memdb.create_prestamo(data["lector"]["id"], copia["id"])
+
+    memdb.reset()
+
+    assert memdb.get_copias_by_libro(data["libro1"]["id"]) == []
+    assert memdb.get_prestamos_activos_by_lector(data["lector"]["id"]) == []
+    assert memdb.create_autor("Otro", date(1900, 1, 1))["id"] == 1
+
+
+def test_busqueda_autor_por_subcadena(memdb):
+    """Test: la búsqueda por autor encuentra subcadenas sin importar mayúsculas"""
+    data = crear_catalogo(memdb)
+    otro = memdb.create_autor("Robert Martin", date(1952, 12, 5))
+    libro_otro = memdb.create_libro("Clean Code", 2008, otro["id"])
+    libro3 = memdb.create_libro("Sistemas", 2001, data["autor"]["id"])
+
+    ids = [l["id"] for l in memdb.get_libros_by_autor("SOMERV")]
+    assert ids == [data["libro1"]["id"], data["libro2"]["id"], libro3["id"]]
+    assert [l["id"] for l in memdb.get_libros_by_autor("rt mar")] == [libro_otro["id"]]
+    assert memdb.get_libros_by_autor("Tolkien") == []
+
+
+def test_busqueda_autor_trigramas_no_contiguos(memdb):
+    """Test: compartir trigramas no basta, la subcadena debe existir"""
+    autor = memdb.create_autor("abcd bcde", date(1950, 1, 1))
+    memdb.create_libro("Libro", 2000, autor["id"])
+
+    # "abcde" comparte todos sus trigramas con el nombre pero no aparece en él
+    assert memdb.get_libros_by_autor("abcde") == []
+    assert len(memdb.get_libros_by_autor("cd bc")) == 1
+
+
+def test_busqueda_autor_consulta_corta(memdb):
+    """Test: consultas de menos de 3 caracteres también funcionan"""
+    data = crear_catalogo(memdb)
+
+    assert len(memdb.get_libros_by_autor("ia")) == 2
+    assert len(memdb.get_libros_by_autor("z")) == 0
+
+
+def test_update_fecha_devolucion_esperada(memdb):
+    """Test: se puede mover la fecha esperada de devolución de un préstamo"""
+    data = crear_catalogo(memdb)
+    copia = memdb.create_copia(data["libro1"]["id"])
+    prestamo = memdb.create_prestamo(data["lector"]["id"], copia["id"])
+    nueva = datetime.now() - timedelta(days=3)
+
+    actualizado = memdb.update_fecha_devolucion_esperada(prestamo["id"], nueva)
+
+    assert actualizado["fecha_devolucion_esperada"] == nueva
+    assert memdb.get_prestamo(prestamo["id"])["fecha_devolucion_esperada"] == nueva
+    assert memdb.update_fecha_devolucion_esperada(999, nueva) is None
+
+
+def test_sqlite_persiste_entre_conexiones(tmp_path):
+    """Test: los datos de SQLiteDB sobreviven a reabrir la base"""
+    path = str(tmp_path / "biblioteca.db")
+    backend = SQLiteDB(path)
+    autor = backend.create_autor("Ian Somerville", date(1951, 2, 23))
+    backend.close()
+
+    reabierta = SQLiteDB(path)
+    assert reabierta.get_autor(autor["id"]) == autor
+    reabierta.close()
+
+
+# Lectores y suscripciones como los creaba la primera versión de SQLiteDB
+ESQUEMA_ORIGINAL = """
+CREATE TABLE lectores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    email TEXT NOT NULL,
+    dias_sancion INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE suscripciones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lector_id INTEGER NOT NULL,
+    libro_id INTEGER NOT NULL,
+    fecha_suscripcion TEXT NOT NULL
+);
+CREATE INDEX idx_suscripciones_libro ON suscripciones (libro_id);
+"""
+
+
+def test_sqlite_migra_base_con_esquema_original(tmp_path):
+    """Test: una base con el esquema original se migra (sanción como fecha de fin, suscripciones únicas) una sola vez"""
+    path = str(tmp_path / "biblioteca.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(ESQUEMA_ORIGINAL)
+    conn.execute("INSERT INTO lectores (nombre, email, dias_sancion) VALUES ('Ana', 'ana@example.com', 6)")
+    conn.execute("INSERT INTO lectores (nombre, email, dias_sancion) VALUES ('Luis', 'luis@example.com', 0)")
+    conn.executemany(
+        "INSERT INTO suscripciones (lector_id, libro_id, fecha_suscripcion) VALUES (?, ?, '2020-01-01T00:00:00')",
+        [(1, 7), (2, 7), (1, 7), (1, 8)]
+    )
+    conn.commit()
+    conn.close()
+
+    for _ in range(2):
+        backend = SQLiteDB(path)
+        assert backend.get_lector(1)["dias_sancion"] == 6
+        assert backend.get_lector(2)["sancionado_hasta"] is None
+        assert [lector["id"] for lector in backend.get_lectores_sancionados()] == [1]
+        assert [(s["id"], s["una_vez"]) for s in backend.get_suscripciones_by_libro(7)] == [(1, False), (2, False)]
+        backend.close()
+    backend = SQLiteDB(path)
+    assert backend.create_lector("Eva", "eva@example.com")["id"] == 3
+    assert backend.create_suscripcion(1, 7) is None
+    assert backend.create_suscripcion(1, 9, una_vez=True)["una_vez"] is True
+    backend.close()
+
+
+def test_fila_se_comporta_como_dict():
+    """Test: las filas compactas conservan la interfaz de dict"""
+    autor = FilaAutor(1, "Ian Somerville", date(1951, 2, 23))
+
+    assert autor["nombre"] == "Ian Somerville"
+    assert {**autor, "extra": 1}["id"] == 1
+    assert dict(autor) == {"id": 1, "nombre": "Ian Somerville", "fecha_nacimiento": date(1951, 2, 23)}
+    assert autor == {"id": 1, "nombre": "Ian Somerville", "fecha_nacimiento": date(1951, 2, 23)}
+    with pytest.raises(KeyError):
+        autor["inexistente"]
+    with pytest.raises(AttributeError):
+        autor.inexistente = 1
+
+
+def test_fila_prestamo_fecha_esperada_derivada():
+    """Test: la fecha esperada por defecto no se almacena pero se expone"""
+    fecha = datetime(2024, 1, 1, 10, 0)
+    prestamo = FilaPrestamo(1, 1, 1, fecha, fecha + PLAZO_PRESTAMO)
+
+    assert prestamo._esperada is None
+    assert prestamo["fecha_devolucion_esperada"] == fecha + PLAZO_PRESTAMO
+
+    prestamo["fecha_devolucion_esperada"] = fecha + timedelta(days=5)
+    assert prestamo["fecha_devolucion_esperada"] == fecha + timedelta(days=5)
+
+    copia = pickle.loads(pickle.dumps(prestamo))
+    assert copia == prestamo
+
+
+def test_disponibilidad_por_estado(memdb):
+    """Test: los contadores por libro y estado siguen los cambios de estado"""
+    data = crear_catalogo(memdb)
+    c1 = memdb.create_copia(data["libro1"]["id"])
+    c2 = memdb.create_copia(data["libro1"]["id"])
+    memdb.create_copia(data["libro2"]["id"])
+
+    memdb.update_estado_copia(c1["id"], EstadoCopia.PRESTADA)
+    memdb.update_estado_copia(c2["id"], EstadoCopia.PRESTADA)
+    memdb.update_estado_copia(c2["id"], EstadoCopia.CON_RETRASO)
+
+    disponibilidad = memdb.get_disponibilidad_libro(data["libro1"]["id"])
+    assert disponibilidad[EstadoCopia.PRESTADA] == 1
+    assert disponibilidad[EstadoCopia.CON_RETRASO] == 1
+    assert disponibilidad[EstadoCopia.EN_BIBLIOTECA] == 0
+    assert memdb.get_disponibilidad_libro(data["libro2"]["id"])[EstadoCopia.EN_BIBLIOTECA] == 1
+    assert sum(memdb.get_disponibilidad_libro(999).values()) == 0
+
+
+def test_estado_copia_solo_cambia_via_update():
+    """Test: el estado en la columna no se puede pisar desde la fila"""
+    memdb = MemoryDB()
+    copia = memdb.create_copia(1)
+
+    with pytest.raises(AttributeError):
+        copia["estado"] = EstadoCopia.PRESTADA
+    assert memdb.get_disponibilidad_libro(1)[EstadoCopia.EN_BIBLIOTECA] == 1
+
+
+def test_paginacion_por_cursor(memdb):
+    """Test: get_all_* devuelve páginas por id a partir de un cursor"""
+    data = crear_catalogo(memdb)
+    copias = [memdb.create_copia(data["libro1"]["id"])["id"] for _ in range(5)]
+
+    assert [c["id"] for c in memdb.get_all_copias(limit=2)] == copias[:2]
+    assert [c["id"] for c in memdb.get_all_copias(after_id=copias[1], limit=2)] == copias[2:4]
+    assert [c["id"] for c in memdb.get_all_copias(after_id=copias[3])] == copias[4:]
+    assert memdb.get_all_copias(after_id=copias[4], limit=2) == []
+    assert len(memdb.get_all_copias()) == 5
+
+
+def test_altas_en_bloque_ids_consecutivos(memdb):
+    """Test: las altas en bloque asignan ids consecutivos tras los existentes"""
+    data = crear_catalogo(memdb)
+    copias = memdb.create_copias([data["libro1"]["id"], data["libro2"]["id"], data["libro1"]["id"]])
+    suelta = memdb.create_copia(data["libro2"]["id"])
+
+    assert [c["id"] for c in copias] == [1, 2, 3]
+    assert suelta["id"] == 4
+    assert memdb.get_copia(2) == copias[1]
+    assert [c["id"] for c in memdb.get_copias_by_libro(data["libro1"]["id"])] == [1, 3]
+    assert memdb.get_disponibilidad_libro(data["libro1"]["id"])[EstadoCopia.EN_BIBLIOTECA] == 2
+
+    autores = memdb.create_autores([("Ada Lovelace", date(1815, 12, 10)), ("Alan Turing", date(1912, 6, 23))])
+    libros = memdb.create_libros([("Notes", 1843, autores[0]["id"])])
+    lectores = memdb.create_lectores([("Ana", "ana@example.com"), ("Luis", "luis@example.com")])
+    assert [a["id"] for a in autores] == [2, 3]
+    assert libros[0]["id"] == 3
+    assert [lector["id"] for lector in lectores] == [2, 3]
+    assert memdb.get_libros_by_autor("lovelace") == libros
+    assert memdb.get_lector(3)["dias_sancion"] == 0
+    assert memdb.create_copias([]) == []
+
+
+def test_suscripcion_unica_por_lector_y_libro(memdb):
+    """Test: un lector no puede suscribirse dos veces al mismo libro hasta darse de baja"""
+    data = crear_catalogo(memdb)
+    s1 = memdb.create_suscripcion(data["lector"]["id"], data["libro1"]["id"])
+
+    assert memdb.create_suscripcion(data["lector"]["id"], data["libro1"]["id"]) is None
+    assert memdb.get_suscripciones_by_libro(data["libro1"]["id"]) == [s1]
+
+    memdb.delete_suscripcion(s1["id"])
+    s2 = memdb.create_suscripcion(data["lector"]["id"], data["libro1"]["id"], una_vez=True)
+    assert s2["id"] > s1["id"]
+    assert memdb.get_suscripciones_by_libro(data["libro1"]["id"])[0]["una_vez"] is True
+
+
+def test_sancion_vence_sola(memdb):
+    """Test: la sanción se guarda como fecha de fin y los días restantes se calculan al leer"""
+    primero = memdb.create_lector("Ana", "ana@example.com")
+    segundo = memdb.create_lector("Luis", "luis@example.com")
+    memdb.create_lector("Eva", "eva@example.com")
+
+    memdb.update_sancion_lector(segundo["id"], 10)
+    memdb.update_sancion_lector(primero["id"], 4)
+    assert memdb.get_lector(segundo["id"])["dias_sancion"] == 10
+    assert [lector["id"] for lector in memdb.get_lectores_sancionados()] == [primero["id"], segundo["id"]]
+
+    # Una sanción vigente se extiende desde su fin, no desde hoy
+    memdb.update_sancion_lector(primero["id"], 8)
+    assert memdb.get_lector(primero["id"])["dias_sancion"] == 12
+    assert [lector["id"] for lector in memdb.get_lectores_sancionados()] == [segundo["id"], primero["id"]]
+
+    assert memdb.reducir_sancion_lector(primero["id"], 12)["dias_sancion"] == 0
+    assert memdb.get_lector(primero["id"])["sancionado_hasta"] is None
+    assert [lector["id"] for lector in memdb.get_lectores_sancionados()] == [segundo["id"]]
+
+    hasta = memdb.get_lector(segundo["id"])["sancionado_hasta"]
+    assert dias_restantes(hasta, hasta - timedelta(hours=1)) == 1
+    assert dias_restantes(hasta, hasta) == 0
+
+
+def test_versiones_crecen_con_cada_escritura(memdb):
+    """Test: cada escritura sube la versión de su colección y nunca retrocede, ni tras reset"""
+    data = crear_catalogo(memdb)
+    copia = memdb.create_copia(data["libro1"]["id"])
+    libros = memdb.version("libros")
+    copias_libro1 = memdb.version("copias", data["libro1"]["id"])
+    copias_libro2 = memdb.version("copias", data["libro2"]["id"])
+
+    memdb.update_estado_copia(copia["id"], EstadoCopia.EN_REPARACION)
+    assert memdb.version("libros") == libros
+    assert memdb.version("copias", data["libro1"]["id"]) > copias_libro1
+    assert memdb.version("copias", data["libro2"]["id"]) == copias_libro2
+
+    memdb.reset()
+    assert memdb.version("libros") > libros
@@ -0,0 +1,105 @@
+import json
+import pytest
+from datetime import datetime
+from fastapi.testclient import TestClient
+from app.services.database import db
+
+
+def crear_copias(client, cantidad):
+    """Helper para crear un libro con varias copias"""
+    autor = client.post(
+        "/autores/",
+        json={"nombre": "Test Autor", "fecha_nacimiento": "1950-01-01"}
+    ).json()
+    libro = client.post(
+        "/libros/",
+        json={"nombre": "Test Libro", "anio": 2015, "autor_id": autor["id"]}
+    ).json()
+    return [client.post("/copias/", json={"libro_id": libro["id"]}).json() for _ in range(cantidad)]
+
+
+def test_export_copias_ndjson(client):
+    """Test exportar copias como NDJSON"""
+    copias = crear_copias(client, 3)
+
+    response = client.get("/export/copias")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    filas = [json.loads(linea) for linea in response.text.splitlines()]
+    assert filas == copias
+
+
+def test_export_prestamos_ndjson(client):
+    """Test exportar préstamos con sus fechas"""
+    copias = crear_copias(client, 1)
+    lector = client.post(
+        "/lectores/",
+        json={"nombre": "Test Lector", "email": "test@example.com"}
+    ).json()
+    prestamo = client.post(
+        "/prestamos/",
+        json={"lector_id": lector["id"], "copia_id": copias[0]["id"]}
+    ).json()
+
+    response = client.get("/export/prestamos")
+    filas = [json.loads(linea) for linea in response.text.splitlines()]
+    assert filas == [prestamo]
+
+
+def test_export_coleccion_vacia(client):
+    """Test exportar una colección sin filas"""
+    response = client.get("/export/autores")
+    assert response.status_code == 200
+    assert response.text == ""
+
+
+def test_export_coleccion_inexistente(client):
+    """Test exportar una colección que no existe"""
+    response = client.get("/export/usuarios")
+    assert response.status_code == 422
+
+
+def test_export_recorre_en_lotes_con_vista_fija(client):
+    """Test: las filas creadas durante el recorrido no aparecen"""
+    crear_copias(client, 5)
+
+    lotes = db.exportar("copias", lote=2)
+    primero = next(lotes)
+    client.post("/copias/", json={"libro_id": 1})
+    resto = [fila for lote in lotes for fila in lote]
+
+    assert [c["id"] for c in primero] == [1, 2]
+    assert [c["id"] for c in resto] == [3, 4, 5]
+
+
+def test_export_fija_estados_y_devoluciones_al_empezar(client):
+    """Test: estados, devoluciones, sanciones, fechas esperadas y bajas durante el recorrido no aparecen"""
+    copias = crear_copias(client, 4)
+    lector = client.post("/lectores/", json={"nombre": "Test Lector", "email": "test@example.com"}).json()
+    otro = client.post("/lectores/", json={"nombre": "Otro Lector", "email": "otro@example.com"}).json()
+    primero = client.post("/prestamos/", json={"lector_id": lector["id"], "copia_id": copias[0]["id"]}).json()
+    segundo = client.post("/prestamos/", json={"lector_id": lector["id"], "copia_id": copias[1]["id"]}).json()
+    suscripciones = [db.create_suscripcion(otro["id"], 1), db.create_suscripcion(lector["id"], 1)]
+
+    lotes_copias = db.exportar("copias", lote=2)
+    lotes_prestamos = db.exportar("prestamos", lote=1)
+    lotes_lectores = db.exportar("lectores", lote=1)
+    lotes_suscripciones = db.exportar("suscripciones", lote=1)
+    assert [c["estado"] for c in next(lotes_copias)] == ["prestada", "prestada"]
+    assert next(lotes_prestamos)[0]["id"] == primero["id"]
+    assert next(lotes_lectores)[0]["id"] == lector["id"]
+    assert next(lotes_suscripciones)[0]["id"] == suscripciones[0]["id"]
+    client.post("/prestamos/", json={"lector_id": lector["id"], "copia_id": copias[3]["id"]})
+    db.update_fecha_devolucion_esperada(segundo["id"], datetime(2000, 1, 1))
+    client.post(f"/prestamos/{segundo['id']}/devolver")
+    db.update_sancion_lector(otro["id"], 5)
+    db.delete_suscripcion(suscripciones[1]["id"])
+
+    assert [c["estado"] for lote in lotes_copias for c in lote] == ["en_biblioteca", "en_biblioteca"]
+    resto = [p for lote in lotes_prestamos for p in lote]
+    assert [(p["id"], p["fecha_devolucion_real"]) for p in resto] == [(segundo["id"], None)]
+    assert resto[0]["fecha_devolucion_esperada"].isoformat() == segundo["fecha_devolucion_esperada"]
+    assert [(l["id"], l["sancionado_hasta"], l["dias_sancion"]) for lote in lotes_lectores for l in lote] == [
+        (otro["id"], None, 0)
+    ]
+    assert [s["id"] for lote in lotes_suscripciones for s in lote] == [suscripciones[1]["id"]]
@@ -0,0 +1,98 @@
+import json
+from app.services.database import db
+
+
+def crear_libro(client):
+    """Helper para crear un autor con un libro"""
+    autor = client.post(
+        "/autores/",
+        json={"nombre": "Test Autor", "fecha_nacimiento": "1950-01-01"}
+    ).json()
+    return client.post(
+        "/libros/",
+        json={"nombre": "Test Libro", "anio": 2015, "autor_id": autor["id"]}
+    ).json()
+
+
+def test_importar_autores_json(client):
+    """Test importar autores como arreglo JSON"""
+    response = client.post("/autores/lote", json=[
+        {"nombre": "Ada Lovelace", "fecha_nacimiento": "1815-12-10"},
+        {"nombre": "Alan Turing", "fecha_nacimiento": "1912-06-23"}
+    ])
+    assert response.status_code == 201
+    assert response.json() == {"creados": 2, "primer_id": 1, "ultimo_id": 2}
+    assert client.get("/autores/2").json()["nombre"] == "Alan Turing"
+
+
+def test_importar_copias_ndjson(client):
+    """Test importar copias como NDJSON"""
+    libro = crear_libro(client)
+    cuerpo = "".join(json.dumps({"libro_id": libro["id"]}) + "\n" for _ in range(500))
+
+    response = client.post("/copias/lote", content=cuerpo, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 201
+    assert response.json() == {"creados": 500, "primer_id": 1, "ultimo_id": 500}
+    assert len(client.get(f"/copias/libro/{libro['id']}").json()) == 500
+
+
+def test_importar_lectores_csv(client):
+    """Test importar lectores como CSV con encabezado"""
+    cuerpo = "nombre,email\nAna,ana@example.com\n\"Pérez, Luis\",luis@example.com\n"
+
+    response = client.post("/lectores/lote", content=cuerpo.encode(), headers={"Content-Type": "text/csv"})
+    assert response.status_code == 201
+    assert response.json()["creados"] == 2
+    assert client.get("/lectores/2").json()["nombre"] == "Pérez, Luis"
+
+
+def test_importar_libros_autor_inexistente(client):
+    """Test: un autor inexistente rechaza todo el lote e indica las filas"""
+    autor = client.post(
+        "/autores/",
+        json={"nombre": "Test Autor", "fecha_nacimiento": "1950-01-01"}
+    ).json()
+
+    response = client.post("/libros/lote", json=[
+        {"nombre": "Uno", "anio": 2000, "autor_id": autor["id"]},
+        {"nombre": "Dos", "anio": 2001, "autor_id": 999},
+        {"nombre": "Tres", "anio": 2002, "autor_id": 999}
+    ])
+    assert response.status_code == 422
+    detalle = response.json()["detail"]
+    assert detalle["filas_con_error"] == 2
+    assert [e["fila"] for e in detalle["errores"]] == [2, 3]
+    assert detalle["errores"][0]["errores"] == [{"campo": "autor_id", "mensaje": "Autor no encontrado"}]
+    assert db.get_all_libros() == []
+
+
+def test_importar_errores_por_fila(client):
+    """Test: los errores de validación y de formato se informan por fila y no se crea nada"""
+    libro = crear_libro(client)
+    cuerpo = "\n".join([
+        json.dumps({"libro_id": libro["id"]}),
+        json.dumps({"libro_id": "abc"}),
+        "{no es json",
+        json.dumps({}),
+    ])
+
+    response = client.post("/copias/lote", content=cuerpo, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 422
+    errores = {e["fila"]: e["errores"] for e in response.json()["detail"]["errores"]}
+    assert sorted(errores) == [2, 3, 4]
+    assert errores[2][0]["campo"] == "libro_id"
+    assert errores[3] == [{"campo": None, "mensaje": "JSON inválido"}]
+    assert errores[4][0]["campo"] == "libro_id"
+    assert db.get_all_copias() == []
+
+
+def test_importar_formato_no_soportado(client):
+    """Test: un Content-Type desconocido devuelve 415"""
+    response = client.post("/autores/lote", content=b"<xml/>", headers={"Content-Type": "application/xml"})
+    assert response.status_code == 415
+
+
+def test_importar_json_que_no_es_arreglo(client):
+    """Test: un objeto JSON suelto en lugar de un arreglo devuelve 400"""
+    response = client.post("/autores/lote", json={"nombre": "Ada", "fecha_nacimiento": "1815-12-10"})
+    assert response.status_code == 400
@@ -68,3 +68,17 @@ def test_create_lector_email_invalido(client):
         }
     )
     assert response.status_code == 422  # Validation error
+
+
+def test_get_lectores_sancionados(client):
+    """Test: solo se listan los lectores con sanción vigente"""
+    from app.services.database import db
+    ana = client.post("/lectores/", json={"nombre": "Ana", "email": "ana@example.com"}).json()
+    client.post("/lectores/", json={"nombre": "Luis", "email": "luis@example.com"})
+    db.update_sancion_lector(ana["id"], 5)
+
+    response = client.get("/lectores/sancionados")
+    assert response.status_code == 200
+    assert [lector["id"] for lector in response.json()] == [ana["id"]]
+    assert response.json()[0]["dias_sancion"] == 5
+    assert response.json()[0]["sancionado_hasta"] is not None
@@ -128,3 +128,83 @@ def test_buscar_libros_por_autor_sin_resultados(client):
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 0
+
+
+def test_disponibilidad_libro(client):
+    """Test contar copias por estado de un libro"""
+    autor = client.post(
+        "/autores/",
+        json={"nombre": "Test Autor", "fecha_nacimiento": "1950-01-01"}
+    ).json()
+    libro = client.post(
+        "/libros/",
+        json={"nombre": "Test Libro", "anio": 2015, "autor_id": autor["id"]}
+    ).json()
+    copias = [client.post("/copias/", json={"libro_id": libro["id"]}).json() for _ in range(3)]
+    lector = client.post(
+        "/lectores/",
+        json={"nombre": "Test Lector", "email": "test@example.com"}
+    ).json()
+
+    client.post("/prestamos/", json={"lector_id": lector["id"], "copia_id": copias[0]["id"]})
+    client.put(f"/copias/{copias[1]['id']}/estado", params={"estado": "en_reparacion"})
+
+    response = client.get(f"/libros/{libro['id']}/disponibilidad")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["libro_id"] == libro["id"]
+    assert data["total"] == 3
+    assert data["por_estado"]["en_biblioteca"] == 1
+    assert data["por_estado"]["prestada"] == 1
+    assert data["por_estado"]["en_reparacion"] == 1
+    assert data["por_estado"]["reservada"] == 0
+
+
+def test_disponibilidad_libro_inexistente(client):
+    """Test disponibilidad de un libro que no existe"""
+    response = client.get("/libros/999/disponibilidad")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Libro no encontrado"
+
+
+def test_get_libros_condicional(client):
+    """Test: GET /libros responde 304 con el mismo ETag hasta que cambian libros o autores"""
+    autor = client.post("/autores/", json={"nombre": "Test Autor", "fecha_nacimiento": "1950-01-01"}).json()
+    client.post("/libros/", json={"nombre": "Libro 1", "anio": 2015, "autor_id": autor["id"]})
+    client.post("/libros/", json={"nombre": "Libro 2", "anio": 2016, "autor_id": autor["id"]})
+
+    primera = client.get("/libros/", params={"limit": 1})
+    etag = primera.headers["ETag"]
+    assert primera.json()[0]["autor"]["nombre"] == "Test Autor"
+    assert client.get("/libros/", params={"limit": 1}, headers={"If-None-Match": etag}).status_code == 304
+
+    # El cuerpo cacheado conserva el cursor de la página
+    repetida = client.get("/libros/", params={"limit": 1})
+    assert repetida.content == primera.content
+    assert repetida.headers["X-Next-Cursor"] == primera.headers["X-Next-Cursor"]
+
+    client.post("/autores/", json={"nombre": "Otro Autor", "fecha_nacimiento": "1960-01-01"})
+    cambiada = client.get("/libros/", params={"limit": 1}, headers={"If-None-Match": etag})
+    assert cambiada.status_code == 200
+    assert cambiada.headers["ETag"] != etag
+
+
+def test_vista_libros_equivale_a_libro_con_autor(client):
+    """Test: los fragmentos precalculados serializan igual que LibroConAutor y se rehacen al invalidar el autor"""
+    from app.models.schemas import LibroConAutor
+    from app.services.catalogo import vista_libros
+    from app.services.database import db
+
+    autor = client.post("/autores/", json={"nombre": "Ian Somerville", "fecha_nacimiento": "1951-02-23"}).json()
+    libro = client.post("/libros/", json={"nombre": "Software Engineering", "anio": 2015, "autor_id": autor["id"]}).json()
+    # Alta sin pasar por el router: el fragmento se arma al pedirlo
+    importado = db.create_libro("Requirements Engineering", 1997, autor["id"])
+
+    for libro_id in (libro["id"], importado["id"]):
+        esperado = LibroConAutor.model_validate({**db.get_libro(libro_id), "autor": db.get_autor(autor["id"])})
+        assert client.get(f"/libros/{libro_id}").content == esperado.model_dump_json().encode()
+
+    vista_libros.invalidar_autor(autor["id"])
+    esperado = LibroConAutor.model_validate({**db.get_libro(libro["id"]), "autor": db.get_autor(autor["id"])})
+    assert vista_libros.obtener(libro["id"]) == esperado.model_dump_json().encode()
+    assert client.get("/libros/buscar/somerville").json()[1]["nombre"] == "Requirements Engineering"
@@ -0,0 +1,85 @@
+import threading
+import pytest
+from app.services.database import db
+from app.services.metricas import Histograma
+
+
+def valor(texto, serie):
+    """Valor de una serie (nombre con etiquetas) en la salida de /metrics; 0 si no aparece"""
+    for linea in texto.splitlines():
+        if linea.startswith(serie + " "):
+            return float(linea.rsplit(" ", 1)[1])
+    return 0
+
+
+def crear_datos(client, copias=4):
+    autor = client.post("/autores/", json={"nombre": "Test Autor", "fecha_nacimiento": "1950-01-01"}).json()
+    libro = client.post("/libros/", json={"nombre": "Test Libro", "anio": 2015, "autor_id": autor["id"]}).json()
+    creadas = [client.post("/copias/", json={"libro_id": libro["id"]}).json() for _ in range(copias)]
+    lector = client.post("/lectores/", json={"nombre": "Test Lector", "email": "test@example.com"}).json()
+    return {"libro": libro, "copias": creadas, "lector": lector}
+
+
+def test_metrics_formato_prometheus(client):
+    """Test: /metrics responde texto de Prometheus con la latencia por plantilla de ruta"""
+    data = crear_datos(client, copias=1)
+    client.get(f"/libros/{data['libro']['id']}")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    serie = 'biblioteca_request_duracion_segundos_count{metodo="GET",ruta="/libros/{libro_id}"}'
+    assert valor(response.text, serie) >= 1
+    assert '# TYPE biblioteca_request_duracion_segundos histogram' in response.text
+    assert valor(response.text, 'biblioteca_coleccion_filas{coleccion="copias"}') == 1
+    assert valor(response.text, 'biblioteca_coleccion_filas{coleccion="lectores"}') == 1
+    assert 'biblioteca_bioalert_pendientes{estado="en_cola"}' in response.text
+
+
+def test_metrics_rechazos_por_motivo(client):
+    """Test: los préstamos y devoluciones rechazados se cuentan por motivo"""
+    data = crear_datos(client)
+    lector_id = data["lector"]["id"]
+    serie = 'biblioteca_rechazos_total{{operacion="{}",motivo="{}"}}'
+    antes = client.get("/metrics").text
+
+    prestamo = None
+    for copia in data["copias"][:3]:
+        prestamo = client.post("/prestamos/", json={"lector_id": lector_id, "copia_id": copia["id"]}).json()
+    assert client.post("/prestamos/", json={"lector_id": lector_id, "copia_id": data["copias"][3]["id"]}).status_code == 400
+    client.post(f"/prestamos/{prestamo['id']}/devolver")
+    client.post(f"/prestamos/{prestamo['id']}/devolver")
+    otro = client.post("/lectores/", json={"nombre": "Otro", "email": "otro@example.com"}).json()
+    client.post("/prestamos/", json={"lector_id": otro["id"], "copia_id": data["copias"][0]["id"]})
+    db.update_sancion_lector(otro["id"], 5)
+    client.post("/prestamos/", json={"lector_id": otro["id"], "copia_id": data["copias"][3]["id"]})
+
+    despues = client.get("/metrics").text
+    for operacion, motivo in [("prestamo", "limite_prestamos"), ("prestamo", "copia_no_disponible"),
+                              ("prestamo", "sancionado"), ("devolucion", "ya_devuelto")]:
+        nombre = serie.format(operacion, motivo)
+        assert valor(despues, nombre) - valor(antes, nombre) == 1, nombre
+
+
+def test_histograma_acumula_buckets_de_todos_los_hilos():
+    """Test: cada hilo registra en su propio fragmento y la exposición suma buckets acumulados"""
+    histograma = Histograma("prueba_segundos", "Prueba", ("ruta",), limites=(0.1, 1.0))
+
+    def registrar():
+        for _ in range(1000):
+            histograma.observar(0.05, "/a")
+            histograma.observar(0.5, "/a")
+            histograma.observar(5.0, "/a")
+
+    hilos = [threading.Thread(target=registrar) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    texto = "\n".join(histograma.exponer())
+    assert valor(texto, 'prueba_segundos_bucket{ruta="/a",le="0.1"}') == 4000
+    assert valor(texto, 'prueba_segundos_bucket{ruta="/a",le="1.0"}') == 8000
+    assert valor(texto, 'prueba_segundos_bucket{ruta="/a",le="+Inf"}') == 12000
+    assert valor(texto, 'prueba_segundos_count{ruta="/a"}') == 12000
+    assert valor(texto, 'prueba_segundos_sum{ruta="/a"}') == pytest.approx(4000 * 5.55)
@@ -0,0 +1,62 @@
+import sys
+import pytest
+from app.services.database import db
+from app.services.perfilado import perfilador
+
+
+@pytest.fixture
+def perfilado(monkeypatch):
+    """Habilita el perfilado solo por encabezado y descarta los perfiles de otros tests"""
+    monkeypatch.setattr(perfilador, "activo", True)
+    monkeypatch.setattr(perfilador, "muestreo", 0.0)
+    perfilador.reset()
+    yield
+    perfilador.reset()
+
+
+def prestar(client, headers=None):
+    autor = client.post("/autores/", json={"nombre": "Test Autor", "fecha_nacimiento": "1950-01-01"}).json()
+    libro = client.post("/libros/", json={"nombre": "Test Libro", "anio": 2015, "autor_id": autor["id"]}).json()
+    copia = client.post("/copias/", json={"libro_id": libro["id"]}).json()
+    lector = client.post("/lectores/", json={"nombre": "Test Lector", "email": "test@example.com"}).json()
+    return client.post("/prestamos/", json={"lector_id": lector["id"], "copia_id": copia["id"]}, headers=headers)
+
+
+def test_perfila_requests_con_encabezado(client, perfilado):
+    """Test: solo se perfilan los requests con X-Perfilar y las pilas llegan hasta el servicio"""
+    assert prestar(client, headers={"X-Perfilar": "1"}).status_code == 201
+    assert sys.getprofile() is None
+
+    rutas = client.get("/admin/perfiles/").json()["rutas"]
+    assert list(rutas) == ["POST /prestamos/"]
+    assert rutas["POST /prestamos/"]["requests"] == 1
+
+    colapsadas = client.get("/admin/perfiles/colapsadas", params={"ruta": "POST /prestamos/"}).text
+    lineas = colapsadas.splitlines()
+    assert lineas and all(linea.rsplit(" ", 1)[1].isdigit() for linea in lineas)
+    assert "app.services.prestamo_service:realizar_prestamos" in colapsadas
+    assert "app.services.perfilado:" not in colapsadas
+
+    todas = client.get("/admin/perfiles/colapsadas").text
+    assert all(linea.startswith("POST /prestamos/;") for linea in todas.splitlines())
+
+    assert client.delete("/admin/perfiles/").status_code == 204
+    assert client.get("/admin/perfiles/").json()["rutas"] == {}
+    assert client.get("/admin/perfiles/colapsadas", params={"ruta": "POST /prestamos/"}).status_code == 404
+
+
+def test_perfila_handler_en_el_pool_de_hilos(client, perfilado, monkeypatch):
+    """Test: con almacenamiento bloqueante el perfil sigue al handler al hilo del pool"""
+    monkeypatch.setattr(db, "bloqueante", True)
+    assert prestar(client, headers={"X-Perfilar": "1"}).status_code == 201
+    colapsadas = client.get("/admin/perfiles/colapsadas", params={"ruta": "POST /prestamos/"}).text
+    assert "app.services.prestamo_service:realizar_prestamos" in colapsadas
+    assert "app.services.perfilado:" not in colapsadas
+
+
+def test_perfilado_desactivado_ignora_encabezado(client, monkeypatch):
+    """Test: deshabilitado, el encabezado no activa el perfilado"""
+    monkeypatch.setattr(perfilador, "activo", False)
+    perfilador.reset()
+    assert prestar(client, headers={"X-Perfilar": "1"}).status_code == 201
+    assert client.get("/admin/perfiles/").json()["rutas"] == {}
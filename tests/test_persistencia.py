@@ -0,0 +1,151 @@
+import os
+import threading
+import pytest
+from datetime import date
+from app.models.schemas import EstadoCopia
+from app.services import persistencia
+from app.services.persistencia import MemoryDBPersistente
+
+
+@pytest.fixture
+def directorio(tmp_path):
+    return str(tmp_path / "wal")
+
+
+def abrir(directorio, **kwargs):
+    kwargs.setdefault("intervalo_fsync", 0)
+    return MemoryDBPersistente(directorio, **kwargs)
+
+
+def poblar(persistente):
+    """Helper para crear un préstamo con todas sus dependencias"""
+    autor = persistente.create_autor("Ian Somerville", date(1951, 2, 23))
+    libro = persistente.create_libro("Software Engineering", 2015, autor["id"])
+    copia = persistente.create_copia(libro["id"])
+    lector = persistente.create_lector("Juan Estudiante", "juan@example.com")
+    prestamo = persistente.create_prestamo(lector["id"], copia["id"])
+    persistente.update_estado_copia(copia["id"], EstadoCopia.PRESTADA)
+    return {"autor": autor, "libro": libro, "copia": copia, "lector": lector, "prestamo": prestamo}
+
+
+def test_recupera_desde_el_log(directorio):
+    """Test: tras reabrir se recuperan filas, índices y contadores"""
+    persistente = abrir(directorio)
+    data = poblar(persistente)
+    persistente.close()
+
+    recuperada = abrir(directorio)
+    assert recuperada.get_copia(data["copia"]["id"])["estado"] == EstadoCopia.PRESTADA
+    assert recuperada.get_prestamo(data["prestamo"]["id"]) == data["prestamo"]
+    assert len(recuperada.get_prestamos_activos_by_lector(data["lector"]["id"])) == 1
+    assert len(recuperada.get_libros_by_autor("somerville")) == 1
+    assert recuperada.create_copia(data["libro"]["id"])["id"] == data["copia"]["id"] + 1
+    recuperada.close()
+
+
+def test_recupera_snapshot_mas_log(directorio):
+    """Test: el snapshot trunca el log y los cambios posteriores se reaplican"""
+    persistente = abrir(directorio)
+    data = poblar(persistente)
+    persistente.crear_snapshot()
+    persistente.devolver_prestamo(data["prestamo"]["id"])
+    persistente.update_estado_copia(data["copia"]["id"], EstadoCopia.EN_BIBLIOTECA)
+    persistente.close()
+
+    archivos = sorted(os.listdir(directorio))
+    assert len([a for a in archivos if a.startswith("snapshot-")]) == 1
+    assert len([a for a in archivos if a.startswith("wal-")]) == 1
+
+    recuperada = abrir(directorio)
+    assert recuperada.get_prestamo(data["prestamo"]["id"])["fecha_devolucion_real"] is not None
+    assert recuperada.get_prestamos_activos_by_lector(data["lector"]["id"]) == []
+    assert recuperada.get_copia(data["copia"]["id"])["estado"] == EstadoCopia.EN_BIBLIOTECA
+    recuperada.close()
+
+
+def test_recupera_bajas(directorio):
+    """Test: una suscripción eliminada no reaparece ni se reutiliza su id"""
+    persistente = abrir(directorio)
+    data = poblar(persistente)
+    suscripcion = persistente.create_suscripcion(data["lector"]["id"], data["libro"]["id"])
+    persistente.delete_suscripcion(suscripcion["id"])
+    persistente.close()
+
+    recuperada = abrir(directorio)
+    assert recuperada.get_suscripciones_by_libro(data["libro"]["id"]) == []
+    nueva = recuperada.create_suscripcion(data["lector"]["id"], data["libro"]["id"])
+    assert nueva["id"] == suscripcion["id"] + 1
+    recuperada.close()
+
+
+def test_descarta_registro_incompleto(directorio):
+    """Test: un registro a medio escribir al final del log se ignora"""
+    persistente = abrir(directorio)
+    data = poblar(persistente)
+    persistente.close()
+
+    segmento = sorted(a for a in os.listdir(directorio) if a.startswith("wal-"))[-1]
+    ruta = os.path.join(directorio, segmento)
+    with open(ruta, "r+b") as f:
+        f.truncate(os.path.getsize(ruta) - 5)
+
+    recuperada = abrir(directorio)
+    # Se pierde solo el último cambio (copia a PRESTADA)
+    assert recuperada.get_copia(data["copia"]["id"])["estado"] == EstadoCopia.EN_BIBLIOTECA
+    assert recuperada.get_prestamo(data["prestamo"]["id"]) is not None
+    recuperada.close()
+
+
+def test_snapshot_automatico(directorio):
+    """Test: el hilo de mantenimiento hace snapshot al superar el umbral"""
+    persistente = abrir(directorio, intervalo_fsync=0.01, snapshot_cada=3)
+    poblar(persistente)
+    persistente._detener.wait(0.2)
+    persistente.close()
+
+    assert any(a.startswith("snapshot-") for a in os.listdir(directorio))
+
+
+def test_snapshot_no_bloquea_escrituras_durante_el_fsync(directorio, monkeypatch):
+    """Test: con fsync por lotes se puede escribir mientras el snapshot sincroniza el segmento anterior"""
+    persistente = abrir(directorio, intervalo_fsync=10)
+    data = poblar(persistente)
+    en_fsync, seguir = threading.Event(), threading.Event()
+    fsync = os.fsync
+
+    def fsync_lento(fd):
+        if threading.current_thread().name == "snapshot" and not en_fsync.is_set():
+            en_fsync.set()
+            seguir.wait(5)
+        fsync(fd)
+
+    monkeypatch.setattr(persistencia.os, "fsync", fsync_lento)
+    hilo = threading.Thread(target=persistente.crear_snapshot, name="snapshot")
+    hilo.start()
+    assert en_fsync.wait(5)
+    escritor = threading.Thread(target=persistente.devolver_prestamo, args=(data["prestamo"]["id"],))
+    escritor.start()
+    escritor.join(2)
+    terminada = not escritor.is_alive()
+    seguir.set()
+    escritor.join()
+    hilo.join()
+    persistente.close()
+    assert terminada
+
+    recuperada = abrir(directorio)
+    assert recuperada.get_prestamo(data["prestamo"]["id"])["fecha_devolucion_real"] is not None
+    recuperada.close()
+
+
+def test_reset_vacia_lo_persistido(directorio):
+    """Test: reset deja vacía también la copia en disco"""
+    persistente = abrir(directorio)
+    poblar(persistente)
+    persistente.reset()
+    persistente.close()
+
+    recuperada = abrir(directorio)
+    assert recuperada.get_all_autores() == []
+    assert recuperada.create_autor("Otro", date(1900, 1, 1))["id"] == 1
+    recuperada.close()
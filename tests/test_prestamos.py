@@ -1,6 +1,12 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from datetime import datetime, timedelta
+from typing import List
+from pydantic import TypeAdapter
+from app.models.schemas import Prestamo
+from app.models.serializacion import volcar
+from app.services.database import db
 
 
 def crear_prestamo_completo(client):
@@ -113,7 +119,6 @@ def test_create_prestamo_lector_con_sancion(client):
     data = crear_prestamo_completo(client)
 
     # Aplicar sanción al lector
-    from app.services.database import db
     db.update_sancion_lector(data["lector"]["id"], 10)
 
     response = client.post(
@@ -286,3 +291,122 @@ def test_devolver_prestamo_inexistente(client):
     response = client.post("/prestamos/999/devolver")
     assert response.status_code == 404
     assert response.json()["detail"] == "Préstamo no encontrado"
+
+
+def crear_copias_y_lector(client, cantidad):
+    """Helper para crear un libro con varias copias y un lector"""
+    data = crear_prestamo_completo(client)
+    copias = [data["copia"]["id"]] + [
+        client.post("/copias/", json={"libro_id": data["libro"]["id"]}).json()["id"]
+        for _ in range(cantidad - 1)
+    ]
+    return data["lector"]["id"], copias
+
+
+def test_create_prestamos_lote(client):
+    """Test prestar varias copias en una sola solicitud"""
+    lector_id, copias = crear_copias_y_lector(client, 3)
+
+    response = client.post("/prestamos/lote", json={"lector_id": lector_id, "copia_ids": copias})
+    assert response.status_code == 201
+    prestamos = response.json()
+    assert [p["copia_id"] for p in prestamos] == copias
+    assert all(client.get(f"/copias/{c}").json()["estado"] == "prestada" for c in copias)
+    assert len(client.get(f"/prestamos/lector/{lector_id}").json()) == 3
+
+
+def test_create_prestamos_lote_supera_limite(client):
+    """Test: si el lote supera los 3 libros no se presta ninguna copia"""
+    lector_id, copias = crear_copias_y_lector(client, 4)
+    client.post("/prestamos/", json={"lector_id": lector_id, "copia_id": copias[0]})
+
+    response = client.post("/prestamos/lote", json={"lector_id": lector_id, "copia_ids": copias[1:]})
+    assert response.status_code == 400
+    assert "solo puede pedir 2 más" in response.json()["detail"]
+    assert len(client.get(f"/prestamos/lector/{lector_id}").json()) == 1
+    assert all(client.get(f"/copias/{c}").json()["estado"] == "en_biblioteca" for c in copias[1:])
+
+
+def test_create_prestamos_lote_copia_no_disponible(client):
+    """Test: una copia no disponible hace fallar todo el lote"""
+    lector_id, copias = crear_copias_y_lector(client, 3)
+    client.put(f"/copias/{copias[2]}/estado", params={"estado": "en_reparacion"})
+
+    response = client.post("/prestamos/lote", json={"lector_id": lector_id, "copia_ids": copias})
+    assert response.status_code == 400
+    assert f"(copia {copias[2]})" in response.json()["detail"]
+    assert client.get(f"/prestamos/lector/{lector_id}").json() == []
+    assert client.get(f"/copias/{copias[0]}").json()["estado"] == "en_biblioteca"
+
+
+def test_create_prestamos_lote_invalido(client):
+    """Test: copias repetidas, lista vacía o copias inexistentes"""
+    lector_id, copias = crear_copias_y_lector(client, 2)
+
+    response = client.post("/prestamos/lote", json={"lector_id": lector_id, "copia_ids": [copias[0], copias[0]]})
+    assert response.status_code == 400
+
+    response = client.post("/prestamos/lote", json={"lector_id": lector_id, "copia_ids": []})
+    assert response.status_code == 422
+
+    response = client.post("/prestamos/lote", json={"lector_id": lector_id, "copia_ids": [copias[0], 999]})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Copia no encontrada (copia 999)"
+    assert client.get(f"/prestamos/lector/{lector_id}").json() == []
+
+
+def test_devolver_prestamos_lote(client):
+    """Test devolver varios préstamos con resultado por préstamo y sanción sumada por lector"""
+    lector_id, copias = crear_copias_y_lector(client, 3)
+    prestamos = client.post("/prestamos/lote", json={"lector_id": lector_id, "copia_ids": copias}).json()
+    db.update_fecha_devolucion_esperada(prestamos[0]["id"], datetime.now() - timedelta(days=2))
+    db.update_fecha_devolucion_esperada(prestamos[1]["id"], datetime.now() - timedelta(days=3))
+    client.post(f"/prestamos/{prestamos[2]['id']}/devolver")
+
+    ids = [p["id"] for p in prestamos] + [999]
+    response = client.post("/prestamos/lote/devolver", json={"prestamo_ids": ids})
+    assert response.status_code == 200
+    resultado = response.json()
+
+    assert [r["prestamo_id"] for r in resultado["resultados"]] == ids
+    assert [r["devuelto"] for r in resultado["resultados"]] == [True, True, False, False]
+    assert resultado["resultados"][2]["error"] == "El libro ya fue devuelto"
+    assert resultado["resultados"][3]["error"] == "Préstamo no encontrado"
+    assert [r["sancion_aplicada"] for r in resultado["resultados"]] == [4, 6, 0, 0]
+    assert resultado["sanciones"] == [{"lector_id": lector_id, "dias": 10}]
+    assert client.get(f"/lectores/{lector_id}").json()["dias_sancion"] == 10
+    assert all(client.get(f"/copias/{c}").json()["estado"] == "en_biblioteca" for c in copias)
+
+
+def test_devolver_prestamos_lote_una_notificacion_por_libro(client):
+    """Test: un suscriptor recibe un solo aviso por libro aunque vuelvan varias copias"""
+    lector_id, copias = crear_copias_y_lector(client, 3)
+    libro_id = client.get(f"/copias/{copias[0]}").json()["libro_id"]
+    suscriptor = client.post("/lectores/", json={"nombre": "Suscriptor", "email": "sus@example.com"}).json()
+    client.post("/bioalert/suscribir", json={"lector_id": suscriptor["id"], "libro_id": libro_id})
+    prestamos = client.post("/prestamos/lote", json={"lector_id": lector_id, "copia_ids": copias}).json()
+    antes = len(client.get("/bioalert/notificaciones").json()["notificaciones"])
+
+    response = client.post("/prestamos/lote/devolver", json={"prestamo_ids": [p["id"] for p in prestamos]})
+    assert response.json()["libros_notificados"] == 1
+
+    nuevas = client.get("/bioalert/notificaciones").json()["notificaciones"][antes:]
+    assert len(nuevas) == 1
+    assert nuevas[0]["email"] == "sus@example.com"
+    assert "disponible" in nuevas[0]["mensaje"]
+
+
+def test_listado_igual_a_response_model(client):
+    """Test: el listado sin validar produce los mismos bytes que response_model y omite campos extra"""
+    data = crear_prestamo_completo(client)
+    prestamo = client.post("/prestamos/", json={"lector_id": data["lector"]["id"], "copia_id": data["copia"]["id"]}).json()
+    client.post(f"/prestamos/{prestamo['id']}/devolver")
+    client.post("/prestamos/", json={"lector_id": data["lector"]["id"], "copia_id": data["copia"]["id"]})
+
+    esperado = TypeAdapter(List[Prestamo]).validate_python(db.get_all_prestamos(), from_attributes=True)
+    response = client.get("/prestamos/")
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == TypeAdapter(List[Prestamo]).dump_json(esperado)
+
+    fila = {**dict(db.get_prestamo(prestamo["id"])), "interno": "no se publica"}
+    assert json.loads(volcar(Prestamo, [fila]))[0].keys() == prestamo.keys()
@@ -148,7 +148,7 @@ class TestSistemaMultas:
 
         # Simular retraso modificando la fecha esperada de devolución
         # Hacer que la fecha esperada sea 5 días en el pasado
-        db.prestamos[prestamo["id"]]["fecha_devolucion_esperada"] = datetime.now() - timedelta(days=5)
+        db.update_fecha_devolucion_esperada(prestamo["id"], datetime.now() - timedelta(days=5))
 
         # Devolver con retraso
         response = client.post(f"/prestamos/{prestamo['id']}/devolver")
@@ -172,7 +172,7 @@ class TestSistemaMultas:
             "/prestamos/",
             json={"lector_id": data["lector"]["id"], "copia_id": copia1["id"]}
         ).json()
-        db.prestamos[prestamo1["id"]]["fecha_devolucion_esperada"] = datetime.now() - timedelta(days=10)
+        db.update_fecha_devolucion_esperada(prestamo1["id"], datetime.now() - timedelta(days=10))
         client.post(f"/prestamos/{prestamo1['id']}/devolver")
 
         # Verificar que tiene sanción
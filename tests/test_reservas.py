@@ -0,0 +1,163 @@
+import pytest
+from datetime import datetime, timedelta
+from app.services.bioalert import bioalert
+from app.services.reservas import reservas
+
+
+def crear_libro_prestado(client, lectores=3):
+    """Helper: un libro con una sola copia prestada al primero de varios lectores"""
+    autor = client.post("/autores/", json={"nombre": "Test Autor", "fecha_nacimiento": "1950-01-01"}).json()
+    libro = client.post("/libros/", json={"nombre": "Test Libro", "anio": 2015, "autor_id": autor["id"]}).json()
+    copia = client.post("/copias/", json={"libro_id": libro["id"]}).json()
+    creados = [
+        client.post("/lectores/", json={"nombre": f"Lector {i}", "email": f"lector{i}@example.com"}).json()
+        for i in range(lectores)
+    ]
+    prestamo = client.post("/prestamos/", json={"lector_id": creados[0]["id"], "copia_id": copia["id"]}).json()
+    return {"libro": libro, "copia": copia, "lectores": creados, "prestamo": prestamo}
+
+
+def reservar(client, lector, libro):
+    return client.post("/reservas/", json={"lector_id": lector["id"], "libro_id": libro["id"]})
+
+
+def test_reserva_con_copia_disponible_se_aparta(client):
+    """Test: si hay una copia en la biblioteca queda apartada en el acto para quien reserva"""
+    data = crear_libro_prestado(client)
+    otra = client.post("/copias/", json={"libro_id": data["libro"]["id"]}).json()
+    _, titular, intruso = data["lectores"]
+
+    response = reservar(client, titular, data["libro"])
+    assert response.status_code == 201
+    assert response.json()["estado"] == "lista"
+    assert response.json()["copia_id"] == otra["id"]
+    assert client.get(f"/copias/{otra['id']}").json()["estado"] == "reservada"
+
+    response = client.post("/prestamos/", json={"lector_id": intruso["id"], "copia_id": otra["id"]})
+    assert response.status_code == 400
+    response = client.post("/prestamos/", json={"lector_id": titular["id"], "copia_id": otra["id"]})
+    assert response.status_code == 201
+    assert client.get(f"/reservas/libro/{data['libro']['id']}").json() == []
+
+
+def test_devolucion_pasa_al_primero_en_espera(client):
+    """Test: la copia devuelta queda reservada para el primero de la cola, no para los suscriptores"""
+    data = crear_libro_prestado(client)
+    _, primero, segundo = data["lectores"]
+    client.post("/bioalert/suscribir", json={"lector_id": segundo["id"], "libro_id": data["libro"]["id"]})
+
+    assert reservar(client, primero, data["libro"]).json()["estado"] == "en_espera"
+    assert reservar(client, segundo, data["libro"]).json()["estado"] == "en_espera"
+    assert reservar(client, segundo, data["libro"]).status_code == 409
+
+    client.post(f"/prestamos/{data['prestamo']['id']}/devolver")
+
+    assert client.get(f"/copias/{data['copia']['id']}").json()["estado"] == "reservada"
+    cola = client.get(f"/reservas/libro/{data['libro']['id']}").json()
+    assert [(r["lector_id"], r["estado"]) for r in cola] == [(primero["id"], "lista"), (segundo["id"], "en_espera")]
+    bioalert.esperar()
+    assert any("está lista" in n["mensaje"] for n in bioalert.get_notificaciones(email="lector1@example.com"))
+    assert not any("ahora disponible" in n["mensaje"] for n in bioalert.get_notificaciones(email="lector2@example.com"))
+
+
+def test_reserva_vencida_pasa_al_siguiente(client):
+    """Test: si no se retira a tiempo la copia pasa al siguiente y, sin nadie más, vuelve al estante"""
+    data = crear_libro_prestado(client)
+    _, primero, segundo = data["lectores"]
+    reservar(client, primero, data["libro"])
+    reservar(client, segundo, data["libro"])
+    client.post(f"/prestamos/{data['prestamo']['id']}/devolver")
+
+    fecha_limite = reservas.consultar(primero["id"], data["libro"]["id"])["fecha_limite"]
+    assert reservas.procesar_vencidos(fecha_limite - timedelta(seconds=1)) == 0
+    assert reservas.procesar_vencidos(fecha_limite) == 1
+    assert reservas.titular(data["copia"]["id"]) == segundo["id"]
+
+    assert reservas.procesar_vencidos(datetime.now() + 3 * reservas.plazo_retiro) == 1
+    assert reservas.titular(data["copia"]["id"]) is None
+    assert client.get(f"/copias/{data['copia']['id']}").json()["estado"] == "en_biblioteca"
+
+
+def test_cancelar_reserva(client):
+    """Test: cancelar una reserva lista pasa la copia al siguiente; cancelar en espera solo sale de la cola"""
+    data = crear_libro_prestado(client, lectores=4)
+    _, primero, segundo, tercero = data["lectores"]
+    for lector in (primero, segundo, tercero):
+        reservar(client, lector, data["libro"])
+    client.post(f"/prestamos/{data['prestamo']['id']}/devolver")
+
+    assert client.delete(f"/reservas/libro/{data['libro']['id']}/lector/{segundo['id']}").status_code == 204
+    assert client.delete(f"/reservas/libro/{data['libro']['id']}/lector/{primero['id']}").status_code == 204
+    assert reservas.titular(data["copia"]["id"]) == tercero["id"]
+    assert client.delete(f"/reservas/libro/{data['libro']['id']}/lector/{primero['id']}").status_code == 404
+
+
+def test_prestamo_de_otra_copia_libera_la_reserva_lista(client):
+    """Test: si el lector se lleva otra copia del libro, la que tenía apartada vuelve al estante"""
+    data = crear_libro_prestado(client)
+    otro_prestador, titular, suscriptor = data["lectores"]
+    libro_id = data["libro"]["id"]
+    segunda = client.post("/copias/", json={"libro_id": libro_id}).json()
+    segundo_prestamo = client.post("/prestamos/", json={"lector_id": otro_prestador["id"], "copia_id": segunda["id"]}).json()
+    client.post("/bioalert/suscribir", json={"lector_id": suscriptor["id"], "libro_id": libro_id})
+
+    reservar(client, titular, data["libro"])
+    client.post(f"/prestamos/{data['prestamo']['id']}/devolver")
+    assert reservas.titular(data["copia"]["id"]) == titular["id"]
+    client.post(f"/prestamos/{segundo_prestamo['id']}/devolver")
+    assert client.get(f"/copias/{segunda['id']}").json()["estado"] == "en_biblioteca"
+    bioalert.esperar()
+    avisos = len(bioalert.get_notificaciones(email="lector2@example.com"))
+
+    # El titular se lleva la copia del estante y no queda nadie en espera
+    response = client.post("/prestamos/", json={"lector_id": titular["id"], "copia_id": segunda["id"]})
+    assert response.status_code == 201
+    assert reservas.titular(data["copia"]["id"]) is None
+    assert client.get(f"/copias/{data['copia']['id']}").json()["estado"] == "en_biblioteca"
+    assert client.get(f"/reservas/libro/{libro_id}").json() == []
+    bioalert.esperar()
+    assert len(bioalert.get_notificaciones(email="lector2@example.com")) == avisos + 1
+
+
+def test_prestamo_de_otra_copia_pasa_la_apartada_bajo_los_locks(client, monkeypatch):
+    """Test: la copia apartada que sobra pasa al siguiente en espera antes de soltar los locks del préstamo"""
+    from app.services.database import db
+
+    data = crear_libro_prestado(client)
+    _, titular, siguiente = data["lectores"]
+    reservar(client, titular, data["libro"])
+    reservar(client, siguiente, data["libro"])
+    client.post(f"/prestamos/{data['prestamo']['id']}/devolver")
+    assert reservas.titular(data["copia"]["id"]) == titular["id"]
+    # Alta sin pasar por el router: la copia queda en el estante aunque haya alguien en espera
+    otra = db.create_copia(data["libro"]["id"])
+
+    def soltar(copia_id, libro_id):
+        raise AssertionError("la copia sobrante quedó sin titular fuera de los locks")
+
+    monkeypatch.setattr(reservas, "soltar", soltar)
+    response = client.post("/prestamos/", json={"lector_id": titular["id"], "copia_id": otra["id"]})
+
+    assert response.status_code == 201
+    assert reservas.titular(data["copia"]["id"]) == siguiente["id"]
+    assert client.get(f"/copias/{data['copia']['id']}").json()["estado"] == "reservada"
+
+
+def test_devolucion_en_lote_con_reservas(client):
+    """Test: en un lote solo cuentan como disponibles los libros sin nadie en espera"""
+    data = crear_libro_prestado(client)
+    _, primero, _ = data["lectores"]
+    reservar(client, primero, data["libro"])
+
+    resultado = client.post("/prestamos/lote/devolver", json={"prestamo_ids": [data["prestamo"]["id"]]}).json()
+
+    assert resultado["resultados"][0]["devuelto"] is True
+    assert resultado["libros_notificados"] == 0
+    assert reservas.titular(data["copia"]["id"]) == primero["id"]
+
+
+def test_reserva_lector_inexistente(client):
+    """Test: reservar con un lector que no existe"""
+    data = crear_libro_prestado(client, lectores=1)
+    response = client.post("/reservas/", json={"lector_id": 999, "libro_id": data["libro"]["id"]})
+    assert response.status_code == 404
@@ -0,0 +1,102 @@
+import time
+import pytest
+from datetime import date, datetime, timedelta
+from app.models.schemas import EstadoCopia
+from app.services.bioalert import bioalert
+from app.services.database import db
+from app.services.prestamo_service import realizar_prestamo, devolver_libro
+from app.services.vencimientos import planificador
+
+
+@pytest.fixture(autouse=True)
+def sin_hilo_de_fondo():
+    """Los vencimientos se procesan a mano para que el hilo no se adelante al test"""
+    planificador.detener()
+    yield
+    planificador.iniciar()
+
+
+def crear_prestamo(email="lector@example.com"):
+    """Helper para prestar una copia nueva"""
+    autor = db.create_autor("Test Autor", date(1950, 1, 1))
+    libro = db.create_libro("Test Libro", 2015, autor["id"])
+    copia = db.create_copia(libro["id"])
+    lector = db.create_lector("Test Lector", email)
+    return realizar_prestamo(lector["id"], copia["id"])
+
+
+def vencer(prestamo, dias=1):
+    """Adelanta la fecha esperada (la base avisa al planificador, que la agenda)"""
+    return db.update_fecha_devolucion_esperada(prestamo["id"], datetime.now() - timedelta(days=dias))
+
+
+def test_prestamo_vencido_pasa_a_con_retraso():
+    """Test: al vencer el préstamo la copia pasa a CON_RETRASO y se envía un recordatorio"""
+    prestamo = vencer(crear_prestamo())
+
+    planificador.procesar_vencidos()
+
+    assert db.get_copia(prestamo["copia_id"])["estado"] == EstadoCopia.CON_RETRASO
+    bioalert.esperar()
+    recordatorios = [n for n in bioalert.get_notificaciones(email="lector@example.com") if "Venció" in n["mensaje"]]
+    assert len(recordatorios) == 1
+
+
+def test_prestamo_no_vencido_no_cambia():
+    """Test: un préstamo dentro del plazo no se marca"""
+    prestamo = crear_prestamo()
+
+    assert planificador.procesar_vencidos() == 0
+    assert db.get_copia(prestamo["copia_id"])["estado"] == EstadoCopia.PRESTADA
+
+
+def test_prestamo_devuelto_se_descarta():
+    """Test: un préstamo devuelto antes de vencer no se marca aunque siga en el heap"""
+    prestamo = vencer(crear_prestamo())
+    devolver_libro(prestamo["id"])
+
+    assert planificador.procesar_vencidos() == 0
+    assert db.get_copia(prestamo["copia_id"])["estado"] == EstadoCopia.EN_BIBLIOTECA
+
+
+def test_prestamo_prorrogado_se_reprograma():
+    """Test: si la fecha esperada se posterga, la entrada vieja se reagenda"""
+    prestamo = vencer(crear_prestamo())
+    db.update_fecha_devolucion_esperada(prestamo["id"], datetime.now() + timedelta(days=3))
+
+    assert planificador.procesar_vencidos() == 0
+    assert db.get_copia(prestamo["copia_id"])["estado"] == EstadoCopia.PRESTADA
+    # La entrada original a 30 días, la agendada al postergar y la que reprogramó la vencida
+    assert len(planificador) == 3
+
+
+def test_adelantar_fecha_esperada_se_agenda():
+    """Test: si la fecha esperada se adelanta, el vencimiento no espera a la entrada original"""
+    prestamo = crear_prestamo()
+    db.update_fecha_devolucion_esperada(prestamo["id"], datetime.now() - timedelta(hours=1))
+
+    assert planificador.procesar_vencidos() == 1
+    assert db.get_copia(prestamo["copia_id"])["estado"] == EstadoCopia.CON_RETRASO
+
+
+def test_devolver_copia_con_retraso():
+    """Test: una copia CON_RETRASO vuelve a la biblioteca y el lector queda sancionado"""
+    prestamo = vencer(crear_prestamo(), dias=2)
+    planificador.procesar_vencidos()
+
+    resultado = devolver_libro(prestamo["id"])
+
+    assert resultado["sancion_aplicada"] == 4
+    assert db.get_copia(prestamo["copia_id"])["estado"] == EstadoCopia.EN_BIBLIOTECA
+
+
+def test_hilo_despierta_en_el_vencimiento():
+    """Test: el hilo de fondo marca la copia cuando llega la fecha, sin intervención"""
+    planificador.iniciar()
+    prestamo = crear_prestamo()
+    prestamo = db.update_fecha_devolucion_esperada(prestamo["id"], datetime.now() + timedelta(milliseconds=50))
+
+    limite = time.monotonic() + 5
+    while db.get_copia(prestamo["copia_id"])["estado"] != EstadoCopia.CON_RETRASO and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert db.get_copia(prestamo["copia_id"])["estado"] == EstadoCopia.CON_RETRASO